@@ -2,8 +2,12 @@
 Movie Recommendation System - Main Application
 """
 from src.ui import create_gradio_app
+from src.ui.handlers import start_warm_start
+from src.utils.constants import UI_CONCURRENCY_LIMIT, WARM_START_ENABLED
 
 if __name__ == "__main__":
+    if WARM_START_ENABLED:
+        start_warm_start()  # Load the model in the background while the UI starts
     app = create_gradio_app()
-    app.queue()  # Enable queue for progress tracking
+    app.queue(default_concurrency_limit=UI_CONCURRENCY_LIMIT)  # Queue for progress tracking, parallel workers
     app.launch(share=False, server_name="127.0.0.1", server_port=7860, inbrowser=True)
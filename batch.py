@@ -0,0 +1,44 @@
+"""
+Movie Recommendation System - Batch Recommendations
+Headless scoring of many users (no Gradio)
+
+    python batch.py --output recommendations.csv                  # every user of the matrix
+    python batch.py --users 12,48,301 --output picks.jsonl --top-n 20
+    python batch.py --users-file users.txt --method factorization --processes 8 --output picks.csv
+"""
+import argparse
+from src.core.batch import BATCH_METHODS, run_batch
+
+
+def _read_user_ids(args):
+    if args.users:
+        return [int(user_id) for user_id in args.users.split(",") if user_id.strip()]
+    if args.users_file:
+        with open(args.users_file) as f:
+            return [int(line) for line in f if line.strip()]
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write recommendations for many users to CSV or JSON lines")
+    parser.add_argument("--output", required=True, help="Output file (.csv, or .jsonl for one JSON object per user)")
+    parser.add_argument("--users", help="Comma-separated user IDs (default: every user in the user-item matrix)")
+    parser.add_argument("--users-file", help="File with one user ID per line")
+    parser.add_argument("--top-n", type=int, default=10, help="Recommendations per user")
+    parser.add_argument("--method", choices=BATCH_METHODS, default="neighborhood",
+                        help="User-based collaborative filtering or the factor model")
+    parser.add_argument("--processes", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Output format (default: from the file extension)")
+    args = parser.parse_args(argv)
+    run_batch(
+        args.output,
+        user_ids=_read_user_ids(args),
+        top_n=args.top_n,
+        method=args.method,
+        processes=args.processes,
+        output_format=args.format
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Benchmarks on synthetic MovieLens-shaped data (run as python -m benchmarks.run)"""
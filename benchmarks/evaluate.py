@@ -0,0 +1,331 @@
+"""
+Offline evaluation
+Holds out each user's latest ratings, trains every engine on the rest and measures
+ranking quality (precision@k, recall@k, NDCG@k), rating error (RMSE) and latency
+
+    python -m benchmarks.evaluate --scale 1m
+    python -m benchmarks.evaluate --scale 1m --engines user_based --sweep-overlap 0.3,0.5,0.7 --sweep-corr 0.3,0.5
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import time
+import numpy as np
+from src.utils.data_utils import load_dataset, dataframe_reduction
+from src.core.recommender import create_user_item_matrix, user_based_recommendation, profile_similarity_thresholds
+from src.core.item_index import build_item_neighbor_index, aggregate_similar_items
+from src.core.user_index import build_user_lsh_index
+from src.core.factorization import train_factor_model
+from src.utils.constants import ITEM_NEIGHBOR_TOP_K
+from src.utils import instrumentation
+from benchmarks.run import REDUCTION_THRESHOLDS, BENCH_SEED
+from benchmarks.synthetic import SCALES, generate_movielens
+
+ENGINES = ["user_based", "user_based_ann", "item_based", "factorization", "popularity"]
+HOLDOUT_FRACTION = 0.2      # Latest share of each user's ratings held out for testing
+RELEVANT_RATING = 4.0       # Held-out ratings at or above this count as relevant
+EVAL_K = 10
+EVAL_USERS = 500            # Test users sampled per run (0 = all)
+EVAL_CHUNK_SIZE = 16        # Users per worker task
+
+
+# ===========================
+# SPLIT & TRAINING
+# ===========================
+
+def temporal_split(ratings, holdout_fraction=HOLDOUT_FRACTION):
+    """Split each user's ratings by time: the latest holdout_fraction go to the test set
+
+    Users keep at least one training rating. Returns (train, test) frames.
+    """
+    users = ratings["user_id"].to_numpy()
+    order = np.lexsort((ratings["timestamp"].to_numpy(), users))
+    sorted_users = users[order]
+    starts = np.flatnonzero(np.r_[True, sorted_users[1:] != sorted_users[:-1]])
+    counts = np.diff(np.r_[starts, len(order)])
+    rank = np.arange(len(order)) - np.repeat(starts, counts)
+    n_train = np.maximum(np.ceil(counts * (1 - holdout_fraction)).astype(np.int64), 1)
+    is_test = np.zeros(len(order), dtype=bool)
+    is_test[order] = rank >= np.repeat(n_train, counts)
+    return ratings[~is_test], ratings[is_test]
+
+
+def train_models(train, engines, user_threshold, item_threshold):
+    """Everything the engines need, fitted on the training ratings only"""
+    reduced = dataframe_reduction(train, user_rating_threshold=user_threshold, item_rated_threshold=item_threshold)
+    matrix = create_user_item_matrix(reduced)
+    model = {"user_item_matrix": matrix, "item_index": None, "user_index": None, "factor_model": None}
+    if "item_based" in engines:
+        model["item_index"] = build_item_neighbor_index(matrix)
+    if "user_based_ann" in engines:
+        model["user_index"] = build_user_lsh_index(matrix)
+    if "factorization" in engines:
+        model["factor_model"] = train_factor_model(matrix)
+    # Items by number of training ratings, most rated first
+    model["popularity"] = np.argsort(-np.diff(matrix.csc.indptr), kind="stable")
+    return model
+
+
+# ===========================
+# ENGINES
+# ===========================
+# Each engine returns (top-k item IDs, predicted ratings of the test items or None)
+
+def _rated_positions(matrix, user_id):
+    return matrix.csr[matrix.user_position(user_id)].indices
+
+
+def _user_based(model, user_id, test_items, k, params, ann=False):
+    matrix = model["user_item_matrix"]
+    if "overlap" in params:
+        perc, corr = params["overlap"], params["corr"]
+    else:
+        perc, corr = profile_similarity_thresholds(len(_rated_positions(matrix, user_id)))
+    result_df = user_based_recommendation(
+        matrix, None, user_id, perc_threshold_rated_same_products=perc, corr_threshold=corr,
+        user_index=model["user_index"] if ann else None
+    )
+    if result_df.empty:
+        return [], np.full(len(test_items), np.nan)
+    scores = result_df.mean(axis=1)
+    ranking = scores.sort_values(ascending=False).head(k).index.tolist()
+    return ranking, scores.reindex(test_items).to_numpy(dtype=float)
+
+
+def _item_based(model, user_id, test_items, k, params):
+    matrix = model["user_item_matrix"]
+    rated = matrix.columns[_rated_positions(matrix, user_id)]
+    scores = aggregate_similar_items(matrix, rated, k, model["item_index"], ITEM_NEIGHBOR_TOP_K, rated)
+    return scores.index.tolist(), None
+
+
+def _factorization(model, user_id, test_items, k, params):
+    factor_model, matrix = model["factor_model"], model["user_item_matrix"]
+    rated = matrix.columns[_rated_positions(matrix, user_id)]
+    ranking = factor_model.recommend_for_user(user_id, k, rated_items=rated).index.tolist()
+    pos = factor_model.user_ids.get_loc(user_id)
+    predictions = factor_model.scores(factor_model.user_factors[pos], factor_model.user_bias[pos])
+    return ranking, predictions[factor_model.item_ids.get_indexer(test_items)]
+
+
+def _popularity(model, user_id, test_items, k, params):
+    matrix = model["user_item_matrix"]
+    rated = np.zeros(matrix.shape[1], dtype=bool)
+    rated[_rated_positions(matrix, user_id)] = True
+    top = [pos for pos in model["popularity"][:k + int(rated.sum())] if not rated[pos]][:k]
+    return matrix.columns[top].tolist(), None
+
+
+_ENGINE_FUNCTIONS = {
+    "user_based": _user_based,
+    "user_based_ann": lambda *args: _user_based(*args, ann=True),
+    "item_based": _item_based,
+    "factorization": _factorization,
+    "popularity": _popularity,
+}
+
+
+# ===========================
+# METRICS
+# ===========================
+
+def ranking_metrics(ranking, relevant, k):
+    """precision@k, recall@k and NDCG@k (binary relevance) of one ranked list"""
+    hits = np.array([item in relevant for item in ranking[:k]], dtype=float)
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    ideal = discounts[:min(len(relevant), k)].sum()
+    return hits.sum() / k, hits.sum() / len(relevant), (hits * discounts[:len(hits)]).sum() / ideal
+
+
+_worker_state = {}
+
+
+def _init_worker(model, test, configs, k, quiet=True):
+    """Hand the trained model to a worker; quiet turns off debug logging and span timing
+    so the measured latency is the engine call alone"""
+    _worker_state.update(model=model, test=test, configs=configs, k=k)
+    if quiet:
+        instrumentation.configure(enabled=False, debug_logging=False)
+
+
+def _evaluate_chunk(user_ids):
+    """Per-config sums of the metrics and the per-user latencies for a chunk of users"""
+    model, test, configs, k = (_worker_state[key] for key in ("model", "test", "configs", "k"))
+    totals = {name: {"users": 0, "precision": 0.0, "recall": 0.0, "ndcg": 0.0,
+                     "squared_error": 0.0, "predicted": 0, "test_ratings": 0, "latencies": []}
+              for name, _, _ in configs}
+    for user_id in user_ids:
+        test_items, test_ratings = test[user_id]
+        relevant = set(test_items[test_ratings >= RELEVANT_RATING].tolist())
+        for name, engine, params in configs:
+            start = time.perf_counter()
+            ranking, predictions = _ENGINE_FUNCTIONS[engine](model, user_id, test_items, k, params)
+            elapsed = time.perf_counter() - start
+            total = totals[name]
+            total["latencies"].append(elapsed)
+            if relevant:
+                precision, recall, ndcg = ranking_metrics(ranking, relevant, k)
+                total["users"] += 1
+                total["precision"] += precision
+                total["recall"] += recall
+                total["ndcg"] += ndcg
+            if predictions is not None:
+                known = ~np.isnan(predictions)
+                total["squared_error"] += float(((predictions[known] - test_ratings[known]) ** 2).sum())
+                total["predicted"] += int(known.sum())
+                total["test_ratings"] += len(test_ratings)
+    return totals
+
+
+def _merge(totals, chunk_totals):
+    for name, chunk in chunk_totals.items():
+        total = totals.setdefault(name, {key: [] if key == "latencies" else 0 for key in chunk})
+        for key, value in chunk.items():
+            total[key] += value
+
+
+def _summarize(total):
+    users = max(total["users"], 1)
+    latencies = np.array(total["latencies"]) * 1000
+    return {
+        "users": total["users"],
+        "precision": total["precision"] / users,
+        "recall": total["recall"] / users,
+        "ndcg": total["ndcg"] / users,
+        "rmse": float(np.sqrt(total["squared_error"] / total["predicted"])) if total["predicted"] else None,
+        "coverage": total["predicted"] / total["test_ratings"] if total["test_ratings"] else None,
+        "mean_ms": float(latencies.mean()) if len(latencies) else 0.0,
+        "p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+    }
+
+
+# ===========================
+# HARNESS
+# ===========================
+
+def engine_configs(engines, sweep_overlap=None, sweep_corr=None):
+    """(name, engine, params) per evaluated configuration; a sweep replaces the default user_based"""
+    configs = []
+    for engine in engines:
+        if engine == "user_based" and (sweep_overlap or sweep_corr):
+            for overlap, corr in itertools.product(sweep_overlap or [0.7], sweep_corr or [0.5]):
+                configs.append((f"user_based[overlap={overlap:g},corr={corr:g}]", engine,
+                                {"overlap": overlap, "corr": corr}))
+        else:
+            configs.append((engine, engine, {}))
+    return configs
+
+
+def evaluate(ratings, engines=ENGINES, k=EVAL_K, n_users=EVAL_USERS, holdout_fraction=HOLDOUT_FRACTION,
+             user_threshold=20, item_threshold=20, processes=None, sweep_overlap=None, sweep_corr=None,
+             seed=BENCH_SEED, verbose=False):
+    """Quality and latency of every engine configuration on a temporal holdout of `ratings`
+
+    Test users are scored in parallel by `processes` workers (default: one per CPU); the
+    trained model is handed to each worker once when it starts. Unless verbose, the
+    workers run with debug logging and span timing off.
+    """
+    train, test = temporal_split(ratings, holdout_fraction)
+    print(f"✂️ Temporal split: {len(train):,} training / {len(test):,} held-out ratings")
+    model = train_models(train, engines, user_threshold, item_threshold)
+    matrix = model["user_item_matrix"]
+
+    # Only held-out ratings of users and movies the engines were trained on can be scored
+    test = test[test["user_id"].isin(matrix.index) & test["item_id"].isin(matrix.columns)]
+    test_by_user = {
+        user_id: (group["item_id"].to_numpy(), group["rating"].to_numpy(dtype=float))
+        for user_id, group in test.groupby("user_id")
+    }
+    user_ids = np.array(sorted(test_by_user))
+    if n_users and len(user_ids) > n_users:
+        user_ids = np.sort(np.random.default_rng(seed).choice(user_ids, n_users, replace=False))
+    test_by_user = {user_id: test_by_user[user_id] for user_id in user_ids}
+    configs = engine_configs(engines, sweep_overlap, sweep_corr)
+    processes = processes or os.cpu_count() or 1
+    print(f"🧪 Evaluating {len(configs)} configuration(s) on {len(user_ids):,} users with {processes} process(es)...")
+
+    chunks = [user_ids[start:start + EVAL_CHUNK_SIZE] for start in range(0, len(user_ids), EVAL_CHUNK_SIZE)]
+    totals = {}
+    if processes == 1:
+        enabled, debug_logging = instrumentation.timing_enabled(), instrumentation.debug_enabled()
+        _init_worker(model, test_by_user, configs, k, quiet=not verbose)
+        try:
+            for chunk in chunks:
+                _merge(totals, _evaluate_chunk(chunk))
+        finally:
+            instrumentation.configure(enabled=enabled, debug_logging=debug_logging)
+    else:
+        with multiprocessing.Pool(processes, initializer=_init_worker,
+                                  initargs=(model, test_by_user, configs, k, not verbose)) as pool:
+            for chunk_totals in pool.imap_unordered(_evaluate_chunk, chunks):
+                _merge(totals, chunk_totals)
+    return {
+        "k": k,
+        "holdout_fraction": holdout_fraction,
+        "relevant_rating": RELEVANT_RATING,
+        "train_matrix": list(matrix.shape),
+        "users": len(user_ids),
+        "engines": {name: _summarize(totals[name]) for name, _, _ in configs},
+    }
+
+
+def print_report(results):
+    k = results["k"]
+    print(f"\n{'engine':<40}{f'P@{k}':>8}{f'R@{k}':>8}{f'NDCG@{k}':>9}{'RMSE':>8}{'cover':>8}{'mean ms':>9}{'p95 ms':>9}")
+    for name, metrics in results["engines"].items():
+        rmse = f"{metrics['rmse']:.3f}" if metrics["rmse"] is not None else "-"
+        coverage = f"{metrics['coverage']:.0%}" if metrics["coverage"] is not None else "-"
+        print(f"{name:<40}{metrics['precision']:>8.3f}{metrics['recall']:>8.3f}{metrics['ndcg']:>9.3f}"
+              f"{rmse:>8}{coverage:>8}{metrics['mean_ms']:>9.1f}{metrics['p95_ms']:>9.1f}")
+
+
+def _floats(text):
+    return [float(value) for value in text.split(",")] if text else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline evaluation of the recommendation engines")
+    parser.add_argument("--scale", choices=list(SCALES), default="100k")
+    parser.add_argument("--data-dir", help="Directory with movies.csv/ratings.csv (default: benchmarks/data/<scale>, "
+                                           "generated when missing)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the generated dataset")
+    parser.add_argument("--engines", default=",".join(ENGINES), help=f"Comma-separated subset of {', '.join(ENGINES)}")
+    parser.add_argument("--k", type=int, default=EVAL_K)
+    parser.add_argument("--users", type=int, default=EVAL_USERS, help="Test users to sample (0 = all)")
+    parser.add_argument("--holdout", type=float, default=HOLDOUT_FRACTION)
+    parser.add_argument("--processes", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--sweep-overlap", help="Comma-separated overlap thresholds for user_based")
+    parser.add_argument("--sweep-corr", help="Comma-separated correlation thresholds for user_based")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Keep debug logging and span timing on while the engines are measured")
+    args = parser.parse_args(argv)
+
+    engines = [engine.strip() for engine in args.engines.split(",") if engine.strip()]
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        parser.error(f"Unknown engines: {', '.join(sorted(unknown))}")
+    data_dir = args.data_dir or os.path.join("benchmarks", "data", args.scale)
+    if not all(os.path.exists(os.path.join(data_dir, name)) for name in ("movies.csv", "ratings.csv")):
+        print(f"📦 No dataset in {data_dir}, generating the {args.scale} synthetic dataset...")
+        generate_movielens(data_dir, args.scale, args.seed)
+    ratings, _, _, _ = load_dataset(data_dir=data_dir)
+    user_threshold, item_threshold = REDUCTION_THRESHOLDS.get(args.scale, REDUCTION_THRESHOLDS["25m"])
+    results = evaluate(
+        ratings, engines, k=args.k, n_users=args.users, holdout_fraction=args.holdout,
+        user_threshold=user_threshold, item_threshold=item_threshold, processes=args.processes,
+        sweep_overlap=_floats(args.sweep_overlap), sweep_corr=_floats(args.sweep_corr), verbose=args.verbose
+    )
+    results["data_dir"] = data_dir
+    print_report(results)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
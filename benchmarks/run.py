@@ -0,0 +1,204 @@
+"""
+Benchmark runner
+Times the data pipeline and the recommendation paths on a synthetic (or real) dataset
+and compares the results against a stored baseline
+
+    python -m benchmarks.run --scale 1m --output benchmarks/results/1m.json
+    python -m benchmarks.run --scale 1m --baseline benchmarks/results/1m.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import scipy
+from src.utils.data_utils import load_dataset, dataframe_reduction
+from src.core.recommender import (
+    create_user_item_matrix,
+    search_item_names_with_keyword,
+    user_based_recommendation
+)
+from src.core.item_index import compute_similar_items
+from src.core.user_index import build_user_lsh_index, evaluate_user_index
+from src.core.catalog import MovieCatalog
+from src.utils.constants import USER_RATING_THRESHOLD, ITEM_RATED_THRESHOLD
+from benchmarks.synthetic import SCALES, generate_movielens
+
+# (user_rating_threshold, item_rated_threshold) per scale; 25m uses the app's own
+REDUCTION_THRESHOLDS = {
+    "100k": (20, 20),
+    "1m": (20, 100),
+    "25m": (USER_RATING_THRESHOLD, ITEM_RATED_THRESHOLD),
+}
+SEARCH_KEYWORDS = ["love", "the", "night 1", "amelie", "cafe", "star war", "xyz"]
+QUERIES_PER_CASE = 10          # Items / users queried by the recommendation cases
+REGRESSION_TOLERANCE = 0.2     # Allowed relative slowdown / memory growth vs the baseline
+MIN_REGRESSION_SECONDS = 0.005 # Ignore slowdowns smaller than this (timer noise)
+MIN_REGRESSION_MB = 1.0        # Ignore memory growth smaller than this
+BENCH_SEED = 0
+
+
+def _measure(func, repeat):
+    """Median / min wall time over `repeat` runs, then peak traced memory of one more run"""
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - start)
+    del result
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    case = {
+        "seconds": statistics.median(times),
+        "min_seconds": min(times),
+        "peak_mb": peak / 1024 ** 2,
+        "repeat": repeat,
+    }
+    return result, case
+
+
+def run_benchmarks(data_dir, scale="100k", repeat=5):
+    """Run every case in pipeline order; each case reuses the previous case's output
+
+    Wall time is measured without tracing; peak memory (Python + NumPy allocations,
+    via tracemalloc) comes from a separate traced run so it does not skew the timings.
+    """
+    user_threshold, item_threshold = REDUCTION_THRESHOLDS.get(scale, REDUCTION_THRESHOLDS["25m"])
+    rng = np.random.default_rng(BENCH_SEED)
+    cases = {}
+
+    def case(name, func):
+        print(f"⏱️  {name}...", end=" ", flush=True)
+        result, cases[name] = _measure(func, repeat)
+        print(f"{cases[name]['seconds'] * 1000:.1f} ms, peak {cases[name]['peak_mb']:.1f} MB")
+        return result
+
+    ratings, movies, user_counts, item_counts = case("load_dataset", lambda: load_dataset(data_dir=data_dir))
+    reduced_df = case("dataframe_reduction", lambda: dataframe_reduction(
+        ratings, user_rating_threshold=user_threshold, item_rated_threshold=item_threshold,
+        user_counts=user_counts, item_counts=item_counts
+    ))
+    matrix = case("create_user_item_matrix", lambda: create_user_item_matrix(reduced_df))
+    catalog = case("build_catalog", lambda: MovieCatalog.from_movies(movies, reduced_df))
+    case("search_item_names_with_keyword", lambda: [
+        search_item_names_with_keyword(None, searched_item_name=keyword, search_index=catalog.search_index)
+        for keyword in SEARCH_KEYWORDS
+    ])
+    item_ids = rng.choice(matrix.columns, min(QUERIES_PER_CASE, matrix.shape[1]), replace=False)
+    case("item_based_correlation", lambda: [compute_similar_items(matrix, item_id, 10) for item_id in item_ids])
+    user_ids = rng.choice(matrix.index, min(QUERIES_PER_CASE, matrix.shape[0]), replace=False)
+    case("user_based_recommendation", lambda: [
+        user_based_recommendation(matrix, reduced_df, user_id) for user_id in user_ids
+    ])
+    user_index = case("build_user_lsh_index", lambda: build_user_lsh_index(matrix))
+    case("user_based_recommendation_ann", lambda: [
+        user_based_recommendation(matrix, reduced_df, user_id, user_index=user_index) for user_id in user_ids
+    ])
+    # Candidate quality of the ANN path: a faster case is no gain if it finds other users
+    user_ann = evaluate_user_index(matrix, user_index, user_ids)
+    return {
+        "scale": scale,
+        "data_dir": data_dir,
+        "dataset": {
+            "ratings": len(ratings),
+            "users": len(user_counts),
+            "movies": len(movies),
+            "reduced_users": matrix.shape[0],
+            "reduced_movies": matrix.shape[1],
+            "reduced_ratings": matrix.nnz,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "scipy": scipy.__version__,
+            "platform": platform.platform(),
+        },
+        "cases": cases,
+        "user_ann": user_ann,
+    }
+
+
+def compare_results(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Regressions of `results` against `baseline` as a list of messages (empty = none)
+
+    A case regresses when its best time or peak memory grows by more than `tolerance`
+    (relative) and by more than the noise floor (MIN_REGRESSION_SECONDS / MIN_REGRESSION_MB),
+    and the user ANN path when its recall drops by more than `tolerance`.
+    The best of the repeated runs is compared since it is the least disturbed by other load.
+    """
+    regressions = []
+    print(f"\n{'case (best time)':<32}{'baseline ms':>14}{'current ms':>14}{'change':>10}{'baseline MB':>14}{'current MB':>14}")
+    for name, current in results["cases"].items():
+        before = baseline.get("cases", {}).get(name)
+        if before is None:
+            print(f"{name:<32}{'-':>14}{current['min_seconds'] * 1000:>14.1f}{'new':>10}")
+            continue
+        then, now = before["min_seconds"], current["min_seconds"]
+        change = now / then - 1 if then else 0.0
+        print(f"{name:<32}{then * 1000:>14.1f}{now * 1000:>14.1f}{change:>+10.0%}"
+              f"{before['peak_mb']:>14.1f}{current['peak_mb']:>14.1f}")
+        if change > tolerance and now - then > MIN_REGRESSION_SECONDS:
+            regressions.append(f"{name}: {then * 1000:.1f} ms -> {now * 1000:.1f} ms")
+        if (current["peak_mb"] > before["peak_mb"] * (1 + tolerance)
+                and current["peak_mb"] - before["peak_mb"] > MIN_REGRESSION_MB):
+            regressions.append(f"{name}: peak {before['peak_mb']:.1f} MB -> {current['peak_mb']:.1f} MB")
+    if "user_ann" in baseline and "user_ann" in results:
+        then, now = baseline["user_ann"]["recall"], results["user_ann"]["recall"]
+        print(f"{'user_ann recall':<32}{then:>14.3f}{now:>14.3f}{now - then:>+10.3f}")
+        if now < then * (1 - tolerance):
+            regressions.append(f"user_ann: recall {then:.3f} -> {now:.3f}")
+    if baseline.get("dataset") != results["dataset"]:
+        print("⚠️ Baseline was recorded on a different dataset, comparison is not like-for-like")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommender on a MovieLens-shaped dataset")
+    parser.add_argument("--scale", choices=list(SCALES), default="100k")
+    parser.add_argument("--data-dir", help="Directory with movies.csv/ratings.csv (default: benchmarks/data/<scale>, "
+                                           "generated when missing)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the generated dataset")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a results JSON file; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    data_dir = args.data_dir or os.path.join("benchmarks", "data", args.scale)
+    if not all(os.path.exists(os.path.join(data_dir, name)) for name in ("movies.csv", "ratings.csv")):
+        print(f"📦 No dataset in {data_dir}, generating the {args.scale} synthetic dataset...")
+        generate_movielens(data_dir, args.scale, args.seed)
+    results = run_benchmarks(data_dir, args.scale, args.repeat)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Regressions:")
+            for message in regressions:
+                print(f"   • {message}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
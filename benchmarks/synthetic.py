@@ -0,0 +1,173 @@
+"""
+Synthetic MovieLens-shaped dataset
+Seeded generator for movies.csv / ratings.csv with the size and long-tailed
+user activity / movie popularity of the MovieLens releases
+
+    python -m benchmarks.synthetic --scale 1m --out benchmarks/data/1m
+"""
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Users / movies / ratings of the MovieLens release each scale imitates
+SCALES = {
+    "100k": {"users": 610, "movies": 9_742, "ratings": 100_836},        # ml-latest-small
+    "1m": {"users": 6_040, "movies": 3_706, "ratings": 1_000_209},       # ml-1m
+    "25m": {"users": 162_541, "movies": 62_423, "ratings": 25_000_095},  # ml-25m
+}
+
+GENRES = [
+    "Action", "Adventure", "Animation", "Children", "Comedy", "Crime", "Documentary", "Drama",
+    "Fantasy", "Film-Noir", "Horror", "IMAX", "Musical", "Mystery", "Romance", "Sci-Fi",
+    "Thriller", "War", "Western",
+]
+TITLE_WORDS = [
+    "Love", "Night", "Man", "Day", "Life", "Story", "Girl", "Dead", "World", "Time", "House",
+    "Last", "King", "Star", "City", "Blood", "Dark", "Lost", "Return", "War", "Black", "Summer",
+    "Secret", "Dream", "Heart", "Wild", "Island", "Ghost", "Road", "Home", "Fire", "Moon",
+    "Amélie", "Café", "Señor", "Über",
+]
+
+MIN_USER_RATINGS = 20             # MovieLens only ships users with at least 20 ratings
+MAX_USER_SHARE = 0.5              # No user rates more than this share of the movies
+POPULARITY_EXPONENT = 1.0         # Zipf exponent of movie popularity by rank
+ACTIVITY_SIGMA = 1.2              # Log-normal spread of ratings per user above the minimum
+LATENT_FACTORS = 5
+RATINGS_PER_BLOCK = 2_000_000     # Ratings generated (and written) per batch of users
+MAX_TOP_UP_ROUNDS = 10
+FIRST_TIMESTAMP = 789_652_009     # 1995-01-09, first ml-25m rating
+LAST_TIMESTAMP = 1_574_327_703    # 2019-11-21, last ml-25m rating
+
+
+def _user_activity(rng, n_users, n_ratings, max_per_user):
+    """Ratings per user: MIN_USER_RATINGS plus a log-normal tail, summing to n_ratings
+
+    Users over max_per_user are capped and their surplus is spread over the others.
+    """
+    weights = rng.lognormal(0.0, ACTIVITY_SIGMA, n_users)
+    counts = np.full(n_users, MIN_USER_RATINGS, dtype=np.int64)
+    capped = np.zeros(n_users, dtype=bool)
+    budget = min(n_ratings, n_users * max_per_user) - counts.sum()
+    while budget > 0 and not capped.all():
+        share = np.where(capped, 0.0, weights) / weights[~capped].sum() * budget
+        extra = np.floor(share).astype(np.int64)
+        # Hand out the rounding remainder to the largest fractional parts
+        remainder = budget - extra.sum()
+        extra[np.argsort(extra - share, kind="stable")[:remainder]] += 1
+        counts += extra
+        surplus = np.maximum(counts - max_per_user, 0)
+        counts -= surplus
+        capped |= counts >= max_per_user
+        budget = int(surplus.sum())
+    return counts
+
+
+def _movie_table(rng, n_movies):
+    """movieId, title, genres of every movie; IDs are sparse and increasing like MovieLens"""
+    movie_ids = np.sort(rng.choice(np.arange(1, 3 * n_movies + 1), n_movies, replace=False))
+    words = rng.choice(TITLE_WORDS, size=(n_movies, 3))
+    lengths = rng.integers(1, 4, n_movies)
+    years = rng.integers(1920, 2020, n_movies)
+    titles = [f"{' '.join(w[:n])} {i} ({y})" for w, n, i, y in zip(words, lengths, range(1, n_movies + 1), years)]
+    genre_counts = rng.integers(1, 4, n_movies)
+    genres = ["|".join(rng.choice(GENRES, size=n, replace=False)) for n in genre_counts]
+    return pd.DataFrame({"movieId": movie_ids.astype(np.int32), "title": titles, "genres": genres})
+
+
+def _sample_items(rng, counts, popularity, n_movies):
+    """Distinct movies per user drawn by popularity; returns sorted (user, movie) positions
+
+    Movies are drawn with replacement, duplicates dropped, and the missing ratings drawn
+    again for the affected users, so the cost follows the number of ratings. Later rounds
+    blend in a uniform draw so very active users, who exhaust the popular movies, still
+    reach their count.
+    """
+    keys = np.zeros(0, dtype=np.int64)
+    missing = counts.copy()
+    for round_no in range(MAX_TOP_UP_ROUNDS):
+        users = np.repeat(np.arange(len(counts)), missing)
+        if len(users) == 0:
+            break
+        blend = round_no / (MAX_TOP_UP_ROUNDS - 1)
+        items = rng.choice(n_movies, size=len(users), p=(1 - blend) * popularity + blend / n_movies)
+        keys = np.sort(np.concatenate([keys, users * n_movies + items]))
+        keys = keys[np.r_[True, keys[1:] != keys[:-1]]]
+        missing = counts - np.bincount(keys // n_movies, minlength=len(counts))
+    return keys // n_movies, keys % n_movies
+
+
+def _ratings_block(rng, users, items, user_bias, item_bias, user_factors, item_factors):
+    """Half-star ratings from biases, latent taste and noise"""
+    taste = np.einsum("ij,ij->i", user_factors[users], item_factors[items])
+    scores = 3.5 + user_bias[users] + item_bias[items] + taste + rng.normal(0.0, 0.6, len(users))
+    return np.clip(np.round(scores * 2) / 2, 0.5, 5.0).astype(np.float32)
+
+
+def generate_movielens(out_dir, scale="100k", seed=42, users=None, movies=None, ratings=None):
+    """Write movies.csv and ratings.csv for a scale of SCALES (or explicit sizes) into out_dir
+
+    Movie popularity follows a Zipf law over a random ranking of the movies and user
+    activity a log-normal tail, so most movies get a handful of ratings while a few get
+    most of them, as in MovieLens. Ratings are half stars around per-user and per-movie
+    biases plus a low-rank taste component, so correlation-based neighbors exist.
+    The same seed and sizes always produce identical files.
+    """
+    sizes = dict(SCALES[scale])
+    sizes.update({k: v for k, v in {"users": users, "movies": movies, "ratings": ratings}.items() if v is not None})
+    n_users, n_movies = sizes["users"], sizes["movies"]
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    movie_table = _movie_table(rng, n_movies)
+    movie_table.to_csv(os.path.join(out_dir, "movies.csv"), index=False)
+
+    ranks = rng.permutation(n_movies)
+    popularity = 1.0 / (ranks + 1.0) ** POPULARITY_EXPONENT
+    popularity /= popularity.sum()
+    # Popular movies are rated a little higher on average, as in MovieLens
+    log_pop = np.log(popularity)
+    item_bias = rng.normal(0.0, 0.5, n_movies) + 0.15 * (log_pop - log_pop.mean()) / log_pop.std()
+    item_factors = rng.normal(0.0, 0.45, (n_movies, LATENT_FACTORS))
+    user_bias = rng.normal(0.0, 0.4, n_users)
+    user_factors = rng.normal(0.0, 0.45, (n_users, LATENT_FACTORS))
+    counts = _user_activity(rng, n_users, sizes["ratings"], max(int(n_movies * MAX_USER_SHARE), MIN_USER_RATINGS))
+
+    path = os.path.join(out_dir, "ratings.csv")
+    ends = np.searchsorted(np.cumsum(counts), np.arange(RATINGS_PER_BLOCK, counts.sum(), RATINGS_PER_BLOCK))
+    written = 0
+    for block_start, block_end in zip(np.r_[0, ends], np.r_[ends, n_users]):
+        if block_end <= block_start:
+            continue
+        users, items = _sample_items(rng, counts[block_start:block_end], popularity, n_movies)
+        users += block_start
+        block = pd.DataFrame({
+            "userId": (users + 1).astype(np.int32),
+            "movieId": movie_table["movieId"].to_numpy()[items],
+            "rating": _ratings_block(rng, users, items, user_bias, item_bias, user_factors, item_factors),
+            "timestamp": rng.integers(FIRST_TIMESTAMP, LAST_TIMESTAMP, len(users)),
+        })
+        block.to_csv(path, mode="w" if written == 0 else "a", header=written == 0, index=False, float_format="%.1f")
+        written += len(block)
+    print(f"✅ Synthetic dataset written to {out_dir}: {n_users:,} users × {n_movies:,} movies, "
+          f"{written:,} ratings ({time.perf_counter() - start:.1f}s)")
+    return {"users": n_users, "movies": n_movies, "ratings": written, "seed": seed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic MovieLens-shaped dataset")
+    parser.add_argument("--scale", choices=list(SCALES), default="100k")
+    parser.add_argument("--out", help="Output directory (default: benchmarks/data/<scale>)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, help="Override the number of users of the scale")
+    parser.add_argument("--movies", type=int, help="Override the number of movies of the scale")
+    parser.add_argument("--ratings", type=int, help="Override the number of ratings of the scale")
+    args = parser.parse_args(argv)
+    out_dir = args.out or os.path.join("benchmarks", "data", args.scale)
+    generate_movielens(out_dir, args.scale, args.seed, args.users, args.movies, args.ratings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Movie Recommendation System - JSON HTTP Service
+Recommendations for other services as JSON (no Gradio)
+
+    python serve.py                                        # model from dumps/ (built if stale)
+    python serve.py --data-dir benchmarks/data/100k --user-threshold 20 --item-threshold 20
+    curl 'http://127.0.0.1:8000/similar-items?item_id=1&top_n=5'
+"""
+import argparse
+from src.core.pipeline import build_or_load, build_in_memory
+from src.core.catalog import MovieCatalog
+from src.core.service import RecommendationService, create_server
+from src.utils.constants import SERVICE_HOST, SERVICE_PORT, USER_RATING_THRESHOLD, ITEM_RATED_THRESHOLD
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve recommendations as JSON over HTTP")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--data-dir", help="Build the model in memory from this dataset (movies.csv/ratings.csv) "
+                                           "instead of the dumps/ cache")
+    parser.add_argument("--user-threshold", type=int, default=USER_RATING_THRESHOLD)
+    parser.add_argument("--item-threshold", type=int, default=ITEM_RATED_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.data_dir:
+        artifacts = build_in_memory(args.data_dir, args.user_threshold, args.item_threshold)
+    else:
+        artifacts = build_or_load()
+    catalog = MovieCatalog.from_movies(artifacts.movies, artifacts.reduced_df)
+    service = RecommendationService.from_artifacts(artifacts, catalog)
+    del artifacts
+    server = create_server(service, args.host, args.port)
+    print(f"🌐 Serving recommendations on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
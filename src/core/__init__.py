@@ -2,18 +2,56 @@
 from .recommender import (
     create_user_item_matrix,
     search_item_names_with_keyword,
-    find_item_id_using_name,
-    find_item_name_using_id,
-    user_based_recommendation
+    user_based_recommendation,
+    find_similar_users,
+    profile_based_recommendation,
+    model_based_matrix_factorization
+)
+from .user_item_matrix import UserItemMatrix
+from .id_map import IdMap
+from .search_index import TitleSearchIndex
+from .catalog import MovieCatalog
+from .genre_index import GenreIndex, AlignedGenres
+from .item_index import (
+    ItemNeighborIndex, build_item_neighbor_index, update_item_neighbor_index, get_similar_items,
+    aggregate_similar_items
+)
+from .user_index import UserLSHIndex, build_user_lsh_index, evaluate_user_index
+from .factorization import FactorModel, train_factor_model
+from .ingest import ingest_ratings
+from .result_cache import ResultCache, profile_key
+from .cache_manager import (
+    save_dumps,
+    load_dumps,
+    dumps_exist
 )
-from .cache_manager import save_dumps, load_dumps, dumps_exist
 
 __all__ = [
     'create_user_item_matrix',
     'search_item_names_with_keyword',
-    'find_item_id_using_name',
-    'find_item_name_using_id',
     'user_based_recommendation',
+    'find_similar_users',
+    'profile_based_recommendation',
+    'model_based_matrix_factorization',
+    'UserItemMatrix',
+    'IdMap',
+    'TitleSearchIndex',
+    'MovieCatalog',
+    'GenreIndex',
+    'AlignedGenres',
+    'ItemNeighborIndex',
+    'build_item_neighbor_index',
+    'update_item_neighbor_index',
+    'get_similar_items',
+    'aggregate_similar_items',
+    'UserLSHIndex',
+    'build_user_lsh_index',
+    'evaluate_user_index',
+    'FactorModel',
+    'train_factor_model',
+    'ingest_ratings',
+    'ResultCache',
+    'profile_key',
     'save_dumps',
     'load_dumps',
     'dumps_exist'
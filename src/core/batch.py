@@ -0,0 +1,177 @@
+"""
+Batch recommendations
+Scores many users of the user-item matrix across a process pool and streams the
+results to CSV or JSON lines, without the UI (and without importing Gradio)
+
+Every worker memory-maps the cached artifacts from dumps/, so the model is shared
+read-only through the OS page cache instead of being copied into each process.
+"""
+import csv
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+import numpy as np
+from src.utils.constants import (
+    USER_ANN_ENABLED,
+    BATCH_CHUNK_SIZE,
+    BATCH_MAX_PENDING_CHUNKS,
+    BATCH_PROGRESS_SECONDS
+)
+from src.core.recommender import user_based_recommendation
+from src.core.pipeline import build_or_load
+from src.core.ingest import apply_pending_ratings, apply_pending_updates
+from src.core.cache_manager import load_artifact
+
+BATCH_METHODS = ["neighborhood", "factorization"]
+
+_worker_model = {}
+
+
+def _load_worker_model():
+    """Map the cached matrix, user index and factor model (once per process)"""
+    if not _worker_model:
+        reduced_df = load_artifact("reduced_df")
+        matrix = apply_pending_ratings(load_artifact("user_item_matrix"), reduced_df)
+        _worker_model["user_item_matrix"] = matrix
+        # Ratings ingested since the last save are replayed as in build_or_load()
+        _worker_model["user_index"] = (
+            apply_pending_updates("user_index", load_artifact("user_index"), matrix, reduced_df)
+            if USER_ANN_ENABLED else None
+        )
+        _worker_model["factor_model"] = apply_pending_updates(
+            "factor_model", load_artifact("factor_model"), matrix, reduced_df
+        )
+    return _worker_model
+
+
+def recommend_user(model, user_id, top_n, method="neighborhood"):
+    """Top-N (item_id, score) pairs for one user of the matrix, as in the user-based tab"""
+    matrix = model["user_item_matrix"]
+    if method == "factorization":
+        factor_model = model["factor_model"]
+        if user_id not in factor_model:
+            return []
+        rated = matrix.columns[matrix.csr[matrix.user_position(user_id)].indices]
+        scores = factor_model.recommend_for_user(user_id, top_n, rated_items=rated)
+    else:
+        result_df = user_based_recommendation(matrix, None, user_id, user_index=model["user_index"])
+        if result_df.empty:
+            return []
+        scores = result_df.mean(axis=1).sort_values(ascending=False).head(top_n)
+    return [(int(item_id), float(score)) for item_id, score in scores.items()]
+
+
+def _score_chunk(user_ids, top_n, method):
+    """Worker task: recommendations for a chunk of users"""
+    model = _load_worker_model()
+    return [(int(user_id), recommend_user(model, user_id, top_n, method)) for user_id in user_ids]
+
+
+class _ResultWriter:
+    """Stream per-user recommendations to a CSV (one row per item) or JSON-lines file"""
+
+    def __init__(self, path, output_format, titles):
+        self.file = open(path, "w", newline="")
+        self.format = output_format
+        self.titles = titles
+        if output_format == "csv":
+            self.csv = csv.writer(self.file)
+            self.csv.writerow(["user_id", "rank", "item_id", "title", "score"])
+
+    def write(self, user_id, recommendations):
+        if self.format == "csv":
+            self.csv.writerows(
+                (user_id, rank, item_id, self.titles.get(item_id, ""), f"{score:.4f}")
+                for rank, (item_id, score) in enumerate(recommendations, 1)
+            )
+        else:
+            self.file.write(json.dumps({
+                "user_id": user_id,
+                "recommendations": [
+                    {"item_id": item_id, "title": self.titles.get(item_id, ""), "score": round(score, 4)}
+                    for item_id, score in recommendations
+                ],
+            }) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+def _chunks(user_ids, chunk_size):
+    for start in range(0, len(user_ids), chunk_size):
+        yield user_ids[start:start + chunk_size]
+
+
+def run_batch(output_path, user_ids=None, top_n=10, method="neighborhood", processes=None,
+              output_format=None, chunk_size=BATCH_CHUNK_SIZE):
+    """Write recommendations for `user_ids` (default: every user of the matrix) to output_path
+
+    Users are scored in chunks by `processes` workers (default: one per CPU; 1 scores in
+    this process). At most BATCH_MAX_PENDING_CHUNKS chunks per worker are in flight, so
+    memory stays bounded however many users are scored. Unknown user IDs are skipped.
+    Returns {"users", "without_recommendations", "seconds", "users_per_second"}.
+    """
+    if method not in BATCH_METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of: {', '.join(BATCH_METHODS)}")
+    output_format = output_format or ("jsonl" if output_path.endswith((".jsonl", ".json")) else "csv")
+
+    # Bring the cached artifacts up to date; workers then only map them
+    artifacts = build_or_load()
+    matrix = artifacts.user_item_matrix
+    if user_ids is None:
+        user_ids = np.asarray(matrix.index)
+    else:
+        user_ids = np.asarray(user_ids)
+        known = matrix.index.get_indexer(user_ids) >= 0
+        if not known.all():
+            print(f"⚠️ Skipping {int((~known).sum())} user IDs that are not in the matrix")
+        user_ids = user_ids[known]
+    titles = dict(zip(artifacts.movies["item_id"].tolist(), artifacts.movies["item_name"].tolist()))
+    processes = processes or os.cpu_count() or 1
+    del artifacts
+
+    print(f"🚀 Scoring {len(user_ids):,} users ({method}, top {top_n}) with {processes} process(es)...")
+    writer = _ResultWriter(output_path, output_format, titles)
+    start = last_report = time.perf_counter()
+    done = empty = 0
+
+    def write_chunk(results):
+        nonlocal done, empty, last_report
+        for user_id, recommendations in results:
+            writer.write(user_id, recommendations)
+            empty += not recommendations
+        done += len(results)
+        now = time.perf_counter()
+        if now - last_report >= BATCH_PROGRESS_SECONDS:
+            last_report = now
+            print(f"⏱️  {done:,}/{len(user_ids):,} users, {done / (now - start):.1f} users/s")
+
+    try:
+        if processes == 1:
+            for chunk in _chunks(user_ids, chunk_size):
+                write_chunk(_score_chunk(chunk, top_n, method))
+        else:
+            # Spawned workers start clean (no inherited threads or locks) and map the dumps
+            with multiprocessing.get_context("spawn").Pool(processes) as pool:
+                pending = deque()
+                for chunk in _chunks(user_ids, chunk_size):
+                    if len(pending) >= processes * BATCH_MAX_PENDING_CHUNKS:
+                        write_chunk(pending.popleft().get())
+                    pending.append(pool.apply_async(_score_chunk, (chunk, top_n, method)))
+                while pending:
+                    write_chunk(pending.popleft().get())
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - start
+    summary = {
+        "users": done,
+        "without_recommendations": empty,
+        "seconds": seconds,
+        "users_per_second": done / seconds if seconds else 0.0,
+    }
+    print(f"✅ {done:,} users in {seconds:.1f}s ({summary['users_per_second']:.1f} users/s), "
+          f"{empty:,} without recommendations -> {output_path}")
+    return summary
@@ -1,39 +1,324 @@
 """
 Cache Management for Movie Recommendation System
 Handles loading and saving of processed data
+
+Artifacts are stored as raw columnar arrays (one .bin file per column/array) plus a
+small JSON manifest describing dtype and shape. Loading maps the files with
+numpy.memmap, so a warm start does not deserialize or copy anything: pages are
+faulted in only when a column is actually used.
 """
+import json
 import pickle
 import os
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from src.core.item_index import ItemNeighborIndex
+from src.core.user_item_matrix import UserItemMatrix
+from src.core.id_map import IdMap
+from src.core.user_index import UserLSHIndex
+from src.core.factorization import FactorModel
 
 DUMP_DIR = "dumps"
-DF_DUMP = os.path.join(DUMP_DIR, "df.pkl")
-REDUCED_DF_DUMP = os.path.join(DUMP_DIR, "reduced_df.pkl")
-MATRIX_DUMP = os.path.join(DUMP_DIR, "user_item_matrix.pkl")
+MANIFEST = os.path.join(DUMP_DIR, "manifest.json")
+FORMAT_VERSION = 1
+
+# Pickle dumps written by earlier versions, migrated once by load_dumps()
+LEGACY_DF_DUMP = os.path.join(DUMP_DIR, "df.pkl")
+LEGACY_REDUCED_DF_DUMP = os.path.join(DUMP_DIR, "reduced_df.pkl")
+LEGACY_MATRIX_DUMP = os.path.join(DUMP_DIR, "user_item_matrix.pkl")
+
+# ===========================
+# LOW-LEVEL ARRAY STORAGE
+# ===========================
+
+def _replace_file(file_name, write):
+    """Write to a temp file, then swap it in: readers still mapping the old file keep a valid view"""
+    path = os.path.join(DUMP_DIR, file_name)
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def _read_manifest():
+    if not os.path.exists(MANIFEST):
+        return {"format_version": FORMAT_VERSION, "artifacts": {}}
+    with open(MANIFEST) as f:
+        return json.load(f)
+
+def _write_json(path, content):
+    with open(path, "w") as f:
+        json.dump(content, f, indent=2)
+
+def _write_manifest(manifest):
+    # The manifest is the commit point of a save
+    _replace_file(os.path.basename(MANIFEST), lambda path: _write_json(path, manifest))
+
+def _write_array(file_name, array):
+    array = np.ascontiguousarray(array)
+    _replace_file(file_name, array.tofile)
+    return {"file": file_name, "dtype": array.dtype.str, "shape": list(array.shape)}
+
+def _map_array(entry):
+    shape = tuple(entry["shape"])
+    if 0 in shape:
+        return np.empty(shape, dtype=entry["dtype"])
+    return np.memmap(os.path.join(DUMP_DIR, entry["file"]), dtype=entry["dtype"], mode="r", shape=shape)
+
+def _write_frame(name, frame):
+    """Write each column as a raw array; string columns are dictionary-encoded"""
+    columns = {}
+    for column in frame.columns:
+        values = frame[column]
+        file_name = f"{name}.{column}"
+        if values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype):
+            categorical = pd.Categorical(values)
+            categories_file = f"{file_name}.categories.json"
+            _replace_file(categories_file, lambda path: _write_json(path, categorical.categories.tolist()))
+            entry = _write_array(f"{file_name}.codes.bin", categorical.codes)
+            entry["categories"] = categories_file
+        else:
+            entry = _write_array(f"{file_name}.bin", values.to_numpy())
+        columns[column] = entry
+    return {"kind": "frame", "length": len(frame), "columns": columns}
+
+def _map_frame(entry):
+    columns = {}
+    for column, column_entry in entry["columns"].items():
+        values = _map_array(column_entry)
+        if "categories" in column_entry:
+            with open(os.path.join(DUMP_DIR, column_entry["categories"])) as f:
+                categories = json.load(f)
+            values = pd.Categorical.from_codes(values, categories=categories)
+        columns[column] = values
+    return pd.DataFrame(columns, copy=False)
+
+def _id_lookups(users, items):
+    """ID -> position tables of the user and item IdMaps that have one"""
+    lookups = {"user_lookup": users.lookup, "item_lookup": items.lookup}
+    return {key: lookup for key, lookup in lookups.items() if lookup is not None}
+
+def _id_maps(arrays):
+    """User and item IdMaps from mapped arrays (tables are rebuilt for dumps written without them)"""
+    return IdMap(arrays["user_ids"], arrays.get("user_lookup")), IdMap(arrays["item_ids"], arrays.get("item_lookup"))
+
+def _write_matrix(name, user_item_matrix):
+    csr = user_item_matrix.csr
+    arrays = {
+        "data": csr.data,
+        "indices": csr.indices,
+        "indptr": csr.indptr,
+        "user_ids": np.asarray(user_item_matrix.index),
+        "item_ids": np.asarray(user_item_matrix.columns),
+        **_id_lookups(user_item_matrix.users, user_item_matrix.items),
+    }
+    return {
+        "kind": "csr",
+        "shape": list(csr.shape),
+        "arrays": {key: _write_array(f"{name}.{key}.bin", value) for key, value in arrays.items()}
+    }
+
+def _map_matrix(entry):
+    arrays = {key: _map_array(value) for key, value in entry["arrays"].items()}
+    csr = sparse.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=tuple(entry["shape"]))
+    return UserItemMatrix(csr, arrays["user_ids"], arrays["item_ids"], *_id_maps(arrays))
+
+def _write_item_index(name, item_index):
+    arrays = {
+        "item_ids": item_index.item_ids,
+        "neighbor_idx": item_index.neighbor_idx,
+        "neighbor_scores": item_index.neighbor_scores,
+    }
+    if item_index.items.lookup is not None:
+        arrays["item_lookup"] = item_index.items.lookup
+    return {
+        "kind": "item_index",
+        "arrays": {key: _write_array(f"{name}.{key}.bin", value) for key, value in arrays.items()}
+    }
+
+def _map_item_index(entry):
+    arrays = {key: _map_array(value) for key, value in entry["arrays"].items()}
+    return ItemNeighborIndex(arrays["item_ids"], arrays["neighbor_idx"], arrays["neighbor_scores"],
+                             IdMap(arrays["item_ids"], arrays.get("item_lookup")))
+
+def _write_user_index(name, user_index):
+    arrays = {
+        "projections": user_index.projections,
+        "keys": user_index.keys,
+        "sorted_keys": user_index.sorted_keys,
+        "order": user_index.order,
+    }
+    return {
+        "kind": "user_lsh",
+        "arrays": {key: _write_array(f"{name}.{key}.bin", value) for key, value in arrays.items()}
+    }
+
+def _map_user_index(entry):
+    arrays = {key: _map_array(value) for key, value in entry["arrays"].items()}
+    return UserLSHIndex(arrays["projections"], arrays["keys"], arrays["sorted_keys"], arrays["order"])
+
+def _write_factor_model(name, model):
+    arrays = {
+        "user_ids": np.asarray(model.user_ids),
+        "item_ids": np.asarray(model.item_ids),
+        "user_factors": model.user_factors,
+        "item_factors": model.item_factors,
+        "user_bias": model.user_bias,
+        "item_bias": model.item_bias,
+        **_id_lookups(model.users, model.items),
+    }
+    return {
+        "kind": "factor_model",
+        "global_mean": model.global_mean,
+        "regularization": model.regularization,
+        "arrays": {key: _write_array(f"{name}.{key}.bin", value) for key, value in arrays.items()}
+    }
+
+def _map_factor_model(entry):
+    arrays = {key: _map_array(value) for key, value in entry["arrays"].items()}
+    return FactorModel(
+        arrays["user_ids"], arrays["item_ids"], arrays["user_factors"], arrays["item_factors"],
+        arrays["user_bias"], arrays["item_bias"], entry["global_mean"], entry["regularization"],
+        *_id_maps(arrays)
+    )
+
+_READERS = {
+    "json": lambda entry: entry["content"],
+    "frame": _map_frame,
+    "csr": _map_matrix,
+    "item_index": _map_item_index,
+    "user_lsh": _map_user_index,
+    "factor_model": _map_factor_model,
+}
+
+# ===========================
+# ARTIFACT API
+# ===========================
+
+def save_artifact(name, value, fingerprint=None, meta=None):
+    """Write one artifact and record it (with the fingerprint of its inputs) in the manifest"""
+    os.makedirs(DUMP_DIR, exist_ok=True)
+    if isinstance(value, pd.DataFrame):
+        entry = _write_frame(name, value)
+    elif isinstance(value, UserItemMatrix):
+        entry = _write_matrix(name, value)
+    elif isinstance(value, ItemNeighborIndex):
+        entry = _write_item_index(name, value)
+    elif isinstance(value, UserLSHIndex):
+        entry = _write_user_index(name, value)
+    elif isinstance(value, FactorModel):
+        entry = _write_factor_model(name, value)
+    elif isinstance(value, dict):
+        # Small JSON documents (e.g. dataset statistics) live in the manifest itself
+        entry = {"kind": "json", "content": value}
+    else:
+        raise TypeError(f"Unsupported artifact type: {type(value).__name__}")
+    entry["fingerprint"] = fingerprint
+    if meta is not None:
+        entry["meta"] = meta
+    manifest = _read_manifest()
+    manifest["format_version"] = FORMAT_VERSION
+    manifest["artifacts"][name] = entry
+    _write_manifest(manifest)
+
+def load_artifact(name):
+    """Memory-map one artifact from the dumps directory"""
+    entry = _read_manifest()["artifacts"][name]
+    return _READERS[entry["kind"]](entry)
+
+def append_artifact(name, frame):
+    """Append rows to a cached frame in place; the cost depends on the new rows only
+
+    Column files are extended at their end, so readers still mapping the shorter files
+    keep a valid view. The manifest update commits the new length: bytes left behind
+    by an interrupted append are dropped by the next one.
+    """
+    manifest = _read_manifest()
+    entry = manifest["artifacts"].get(name)
+    if entry is None:
+        save_artifact(name, frame)
+        return
+    if entry["kind"] != "frame":
+        raise TypeError(f"Cannot append rows to {entry['kind']} artifact '{name}'")
+    if set(frame.columns) != set(entry["columns"]):
+        raise ValueError(f"Columns {list(frame.columns)} do not match artifact '{name}': {list(entry['columns'])}")
+    for column, column_entry in entry["columns"].items():
+        if "categories" in column_entry:
+            raise TypeError(f"Cannot append rows to dictionary-encoded column '{name}.{column}'")
+        values = np.ascontiguousarray(frame[column].to_numpy(), dtype=column_entry["dtype"])
+        committed = entry["length"] * values.dtype.itemsize
+        with open(os.path.join(DUMP_DIR, column_entry["file"]), "r+b") as f:
+            f.truncate(committed)
+            f.seek(committed)
+            f.write(values.tobytes())
+        column_entry["shape"] = [entry["length"] + len(frame)]
+    entry["length"] += len(frame)
+    _write_manifest(manifest)
+
+def artifact_exists(name):
+    return name in _read_manifest()["artifacts"]
+
+def artifact_fingerprint(name):
+    """Fingerprint recorded when the artifact was saved (None if missing or unknown)"""
+    entry = _read_manifest()["artifacts"].get(name)
+    return entry.get("fingerprint") if entry else None
+
+def artifact_meta(name):
+    """Extra metadata stored with the artifact (empty if none)"""
+    entry = _read_manifest()["artifacts"].get(name)
+    return entry.get("meta", {}) if entry else {}
+
+def load_source_hashes():
+    """{path: {size, mtime_ns, sha256}} of the source files seen by the last build"""
+    return _read_manifest().get("sources", {})
+
+def save_source_hashes(sources):
+    os.makedirs(DUMP_DIR, exist_ok=True)
+    manifest = _read_manifest()
+    manifest["sources"] = sources
+    _write_manifest(manifest)
+
+# ===========================
+# PUBLIC API
+# ===========================
 
 def save_dumps(df, reduced_df, user_item_matrix):
     """Save processed data to dump files"""
-    os.makedirs(DUMP_DIR, exist_ok=True)
-    with open(DF_DUMP, 'wb') as f:
-        pickle.dump(df, f)
-    with open(REDUCED_DF_DUMP, 'wb') as f:
-        pickle.dump(reduced_df, f)
-    with open(MATRIX_DUMP, 'wb') as f:
-        pickle.dump(user_item_matrix, f)
+    save_artifact("df", df)
+    save_artifact("reduced_df", reduced_df)
+    save_artifact("user_item_matrix", user_item_matrix)
     print("✅ Dumps saved successfully!")
 
-def load_dumps():
-    """Load processed data from dump files"""
-    with open(DF_DUMP, 'rb') as f:
+def legacy_dumps_exist():
+    """Check if pickle dumps from an earlier version exist"""
+    return (os.path.exists(LEGACY_DF_DUMP) and
+            os.path.exists(LEGACY_REDUCED_DF_DUMP) and
+            os.path.exists(LEGACY_MATRIX_DUMP))
+
+def migrate_legacy_dumps():
+    """One-time conversion of the pickle dumps into the memory-mapped format"""
+    print("ℹ️ Migrating pickle dumps to the memory-mapped format...")
+    with open(LEGACY_DF_DUMP, 'rb') as f:
         df = pickle.load(f)
-    with open(REDUCED_DF_DUMP, 'rb') as f:
+    with open(LEGACY_REDUCED_DF_DUMP, 'rb') as f:
         reduced_df = pickle.load(f)
-    with open(MATRIX_DUMP, 'rb') as f:
+    with open(LEGACY_MATRIX_DUMP, 'rb') as f:
         user_item_matrix = pickle.load(f)
+    if isinstance(user_item_matrix, pd.DataFrame):
+        # Dumps written before the sparse backend hold a dense pivot_table
+        user_item_matrix = UserItemMatrix.from_frame(user_item_matrix)
+    save_dumps(df, reduced_df, user_item_matrix)
+    print("ℹ️ Migration done, the .pkl files in dumps/ are no longer used and can be deleted")
+
+def load_dumps():
+    """Load processed data from dump files (memory-mapped, no copy)"""
+    if not all(artifact_exists(name) for name in ("df", "reduced_df", "user_item_matrix")):
+        migrate_legacy_dumps()
+    df = load_artifact("df")
+    reduced_df = load_artifact("reduced_df")
+    user_item_matrix = load_artifact("user_item_matrix")
     print("✅ Dumps loaded successfully!")
     return df, reduced_df, user_item_matrix
 
 def dumps_exist():
-    """Check if all dump files exist"""
-    return (os.path.exists(DF_DUMP) and 
-            os.path.exists(REDUCED_DF_DUMP) and 
-            os.path.exists(MATRIX_DUMP))
+    """Check if all dump files exist (current or legacy format)"""
+    return all(artifact_exists(name) for name in ("df", "reduced_df", "user_item_matrix")) or legacy_dumps_exist()
@@ -0,0 +1,99 @@
+"""
+Movie catalog
+O(1) lookup tables between movie IDs, titles and genres
+"""
+import copy
+import numpy as np
+import pandas as pd
+from src.core.search_index import TitleSearchIndex
+from src.core.genre_index import GenreIndex
+from src.utils.text_utils import normalize_str
+
+
+class MovieCatalog:
+    """Per-movie metadata built once from the ratings frame
+
+    titles         -> {item_id: title}
+    genres         -> {item_id: "Genre1|Genre2"}
+    ids_by_title   -> {normalized title: item_id}, the most rated movie wins on duplicates
+    search_index   -> TitleSearchIndex over the same titles
+    genre_index    -> GenreIndex, genres parsed once into per-movie bitmasks
+    """
+
+    def __init__(self, item_ids, titles, genres, popularity):
+        self.titles = dict(zip(item_ids, titles))
+        self.genres = dict(zip(item_ids, genres))
+        self.popularity = dict(zip(item_ids, popularity))
+        self.ids_by_title = {}
+        for item_id in sorted(self.titles, key=lambda i: -self.popularity[i]):
+            self.ids_by_title.setdefault(normalize_str(self.titles[item_id]), item_id)
+        self.search_index = TitleSearchIndex(titles, popularity)
+        self.genre_index = GenreIndex(item_ids, genres)
+
+    @classmethod
+    def from_dataframe(cls, dataframe, item_id_col="item_id", item_col_name="item_name", genres_col="genres"):
+        """Build the catalog from a ratings frame (one pass over item IDs, then per-movie work only)"""
+        rating_counts = dataframe[item_id_col].value_counts()
+        items = dataframe.drop_duplicates(subset=item_id_col)
+        item_ids = [int(item_id) for item_id in items[item_id_col]]
+        genres = items[genres_col].tolist() if genres_col in items else [""] * len(items)
+        popularity = rating_counts.reindex(items[item_id_col]).to_numpy()
+        return cls(item_ids, items[item_col_name].tolist(), genres, popularity)
+
+    @classmethod
+    def from_movies(cls, movies, ratings, item_id_col="item_id"):
+        """Build the catalog from the per-movie table, restricted to movies present in the ratings"""
+        rating_counts = ratings[item_id_col].value_counts()
+        items = movies[movies[item_id_col].isin(rating_counts.index)]
+        item_ids = [int(item_id) for item_id in items[item_id_col]]
+        popularity = rating_counts.reindex(items[item_id_col]).to_numpy()
+        return cls(item_ids, items["item_name"].tolist(), items["genres"].tolist(), popularity)
+
+    def with_ratings(self, item_ids):
+        """Copy of the catalog counting one more rating per occurrence of a movie in item_ids
+
+        Rating counts rank title search and break duplicate-title ties, so both are
+        re-ranked; titles and genres are shared with this catalog.
+        """
+        counts = pd.Series(np.asarray(item_ids)).value_counts()
+        counts = counts[[item_id in self.titles for item_id in counts.index]]
+        updated = copy.copy(self)
+        updated.popularity = dict(self.popularity)
+        updated.ids_by_title = dict(self.ids_by_title)
+        title_counts = {}
+        for item_id, count in counts.items():
+            updated.popularity[item_id] += int(count)
+            title = self.titles[item_id]
+            title_counts[title] = title_counts.get(title, 0) + int(count)
+        for item_id in counts.index:
+            key = normalize_str(self.titles[item_id])
+            if updated.popularity[item_id] > updated.popularity[updated.ids_by_title[key]]:
+                updated.ids_by_title[key] = item_id
+        updated.search_index = self.search_index.with_counts(title_counts)
+        return updated
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __contains__(self, item_id):
+        return item_id in self.titles
+
+    def title(self, item_id):
+        """Movie title for an ID"""
+        return self.titles[item_id]
+
+    def item_id(self, title):
+        """Movie ID for a title (normalized comparison)"""
+        return self.ids_by_title[normalize_str(title)]
+
+    def genres_of(self, item_id):
+        """Pipe-separated genres of a movie"""
+        return self.genres[item_id]
+
+    def genre_mask(self, item_ids, include=(), exclude=()):
+        """Boolean mask over item_ids for the genre filters (None without filters)"""
+        return self.genre_index.item_mask(item_ids, include, exclude)
+
+    def search(self, keyword, limit=None):
+        """Titles containing the keyword, most rated first"""
+        return self.search_index.search(keyword, limit=limit)
@@ -0,0 +1,113 @@
+"""
+Dataset statistics
+Summary of the raw ratings, the filtered ratings and the user-item matrix, computed
+once per build and stored in the artifact manifest so the stats tab never rescans data
+"""
+import numpy as np
+
+
+def _rating_histogram(ratings):
+    """{rating: count} over half-star steps"""
+    half_stars = np.rint(np.asarray(ratings, dtype=np.float64) * 2).astype(np.int64)
+    counts = np.bincount(half_stars) if len(half_stars) else np.zeros(0, dtype=np.int64)
+    return {f"{step / 2:g}": int(count) for step, count in enumerate(counts) if count}
+
+
+def _degree_distribution(degrees):
+    """Percentiles and a power-of-two bucket histogram of ratings per user or per movie"""
+    degrees = np.asarray(degrees)
+    degrees = degrees[degrees > 0]
+    if len(degrees) == 0:
+        return {"count": 0}
+    p10, median, p90, p99 = np.percentile(degrees, [10, 50, 90, 99])
+    buckets = np.floor(np.log2(degrees)).astype(np.int64)
+    histogram = [[2 ** bucket, 2 ** (bucket + 1) - 1, int(count)]
+                 for bucket, count in enumerate(np.bincount(buckets)) if count]
+    return {
+        "count": int(len(degrees)),
+        "min": int(degrees.min()),
+        "p10": float(p10),
+        "median": float(median),
+        "mean": float(degrees.mean()),
+        "p90": float(p90),
+        "p99": float(p99),
+        "max": int(degrees.max()),
+        "histogram": histogram,  # [low, high, number of users/movies with low..high ratings]
+    }
+
+
+def _reduced_rating_stats(reduced_ratings):
+    return {
+        "rating_mean": float(reduced_ratings.mean()) if len(reduced_ratings) else None,
+        "rating_median": float(np.median(reduced_ratings)) if len(reduced_ratings) else None,
+        "rating_std": float(reduced_ratings.std(ddof=1)) if len(reduced_ratings) > 1 else None,
+        "rating_histogram": _rating_histogram(reduced_ratings),
+    }
+
+
+def _matrix_stats(user_item_matrix):
+    n_users, n_items = user_item_matrix.shape
+    item_degrees = np.bincount(user_item_matrix.csr.indices, minlength=n_items)
+    return {
+        "users": int(n_users),
+        "movies": int(n_items),
+        "nnz": int(user_item_matrix.nnz),
+        "sparsity": 1 - user_item_matrix.nnz / (n_users * n_items) if n_users * n_items else 0.0,
+        "user_degrees": _degree_distribution(np.diff(user_item_matrix.csr.indptr)),
+        "item_degrees": _degree_distribution(item_degrees),
+    }
+
+
+def compute_dataset_stats(df, reduced_df, user_item_matrix):
+    """JSON-serializable statistics of one build"""
+    return {
+        "original": {
+            "ratings": int(len(df)),
+            "users": int(df["user_id"].nunique()),
+            "movies": int(df["item_id"].nunique()),
+            "min_timestamp": int(df["timestamp"].min()) if len(df) else None,
+            "max_timestamp": int(df["timestamp"].max()) if len(df) else None,
+            "rating_histogram": _rating_histogram(df["rating"].to_numpy()),
+        },
+        "reduced": {
+            "ratings": int(len(reduced_df)),
+            "users": int(reduced_df["user_id"].nunique()),
+            "movies": int(reduced_df["item_id"].nunique()),
+            **_reduced_rating_stats(reduced_df["rating"].to_numpy()),
+        },
+        "matrix": _matrix_stats(user_item_matrix),
+    }
+
+
+def update_dataset_stats(stats, events, df, reduced_df, user_item_matrix):
+    """Statistics after `events` were appended to df (and the known ones to reduced_df)
+
+    Same result as compute_dataset_stats() on the new data, without re-counting the
+    distinct IDs of the full history: only event IDs missing from the previous df add
+    a user or movie. Applied events only touch users and movies already in reduced_df.
+    """
+    original = dict(stats["original"])
+    previous = df.iloc[:len(df) - len(events)]
+    for column, key in (("user_id", "users"), ("item_id", "movies")):
+        ids = events[column].unique()
+        original[key] += int(len(ids) - np.isin(ids, previous[column].to_numpy()).sum())
+    histogram = dict(original["rating_histogram"])
+    for rating, count in _rating_histogram(events["rating"].to_numpy()).items():
+        histogram[rating] = histogram.get(rating, 0) + count
+    timestamps = [value for value in (original["min_timestamp"], original["max_timestamp"]) if value is not None]
+    timestamps += [int(events["timestamp"].min()), int(events["timestamp"].max())]
+    original.update(
+        ratings=int(len(df)),
+        min_timestamp=min(timestamps),
+        max_timestamp=max(timestamps),
+        rating_histogram={rating: histogram[rating] for rating in sorted(histogram, key=float)},
+    )
+    return {
+        "original": original,
+        "reduced": {
+            **stats["reduced"],
+            "ratings": int(len(reduced_df)),
+            **_reduced_rating_stats(reduced_df["rating"].to_numpy()),
+        },
+        "matrix": _matrix_stats(user_item_matrix),
+    }
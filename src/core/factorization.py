@@ -0,0 +1,191 @@
+"""
+Matrix factorization
+Biased ALS factorization of the user-item matrix, with fold-in for users outside the model
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from src.utils.constants import MF_FACTORS, MF_ITERATIONS, MF_REGULARIZATION, MF_BLOCK_SIZE
+from src.core.id_map import IdMap
+
+MF_SEED = 42
+
+
+class FactorModel:
+    """Latent factors learned from the ratings
+
+    user_ids / item_ids       -> row order of the factor matrices
+    users / items             -> IdMap from those IDs to rows
+    user_factors              -> (n_users, k) float32
+    item_factors              -> (n_items, k) float32
+    user_bias / item_bias     -> (n_users,) / (n_items,) float32
+    global_mean               -> mean of all training ratings
+
+    predicted rating = global_mean + user_bias[u] + item_bias[i] + user_factors[u] · item_factors[i]
+    """
+
+    def __init__(self, user_ids, item_ids, user_factors, item_factors, user_bias, item_bias,
+                 global_mean, regularization=MF_REGULARIZATION, users=None, items=None):
+        self.user_ids = pd.Index(user_ids, name="user_id")
+        self.item_ids = pd.Index(item_ids, name="item_id")
+        self.users = users if users is not None else IdMap(np.asarray(user_ids))
+        self.items = items if items is not None else IdMap(np.asarray(item_ids))
+        self.user_factors = np.asarray(user_factors, dtype=np.float32)
+        self.item_factors = np.asarray(item_factors, dtype=np.float32)
+        self.user_bias = np.asarray(user_bias, dtype=np.float32)
+        self.item_bias = np.asarray(item_bias, dtype=np.float32)
+        self.global_mean = float(global_mean)
+        self.regularization = float(regularization)
+
+    @property
+    def factors(self):
+        return self.item_factors.shape[1]
+
+    def __contains__(self, user_id):
+        return user_id in self.users
+
+    def fold_in(self, ratings):
+        """Factors and bias of an unseen user from {item_id: rating}, item factors fixed"""
+        positions = self.items.positions(list(ratings.keys())).astype(np.int64)
+        values = np.array(list(ratings.values()), dtype=np.float64)
+        known = positions >= 0
+        positions, values = positions[known], values[known]
+        fixed = _augment(self.item_factors[positions])
+        targets = values - self.global_mean - self.item_bias[positions]
+        gram = fixed.T @ fixed + self.regularization * max(len(positions), 1) * np.eye(fixed.shape[1])
+        solution = np.linalg.solve(gram, fixed.T @ targets)
+        return solution[:-1].astype(np.float32), float(solution[-1])
+
+    def scores(self, user_vector, user_bias):
+        """Predicted rating of every item for one user"""
+        return self.global_mean + user_bias + self.item_bias + self.item_factors @ user_vector
+
+    def _top_items(self, scores, top_n, exclude, item_mask=None):
+        excluded = self.items.positions(list(exclude))
+        scores[excluded[excluded >= 0]] = -np.inf
+        if item_mask is not None:
+            scores[~item_mask] = -np.inf
+        top_n = min(top_n, int(np.isfinite(scores).sum()))
+        if top_n <= 0:
+            return pd.Series(dtype=float)
+        top = np.argpartition(-scores, top_n - 1)[:top_n]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return pd.Series(scores[top].astype(float), index=self.item_ids[top])
+
+    def recommend(self, user_vector, user_bias, top_n, exclude=(), item_mask=None):
+        """Top-N items by predicted rating as a Series (item_id -> rating), skipping `exclude` item IDs
+
+        item_mask (bool per item of item_ids) leaves out the items where it is False.
+        """
+        return self._top_items(self.scores(user_vector, user_bias), top_n, exclude, item_mask)
+
+    def recommend_many(self, user_vectors, user_biases, top_n, excludes, item_masks=None):
+        """recommend() for several users at once: one (users × items) product for all of them
+
+        excludes holds one iterable of item IDs per user, item_masks one mask (or None)
+        per user. Returns a list of Series.
+        """
+        user_vectors = np.asarray(user_vectors, dtype=np.float32).reshape(-1, self.factors)
+        scores = (self.global_mean + np.asarray(user_biases, dtype=np.float32)[:, None]
+                  + self.item_bias + user_vectors @ self.item_factors.T)
+        item_masks = item_masks or [None] * len(scores)
+        return [self._top_items(row, top_n, exclude, item_mask)
+                for row, exclude, item_mask in zip(scores, excludes, item_masks)]
+
+    def recommend_for_user(self, user_id, top_n, rated_items=(), item_mask=None):
+        """Top-N items for a user of the model, skipping the items they rated"""
+        pos = self.users.position(user_id)
+        return self.recommend(self.user_factors[pos], self.user_bias[pos], top_n, exclude=rated_items,
+                              item_mask=item_mask)
+
+    def recommend_for_ratings(self, ratings, top_n, item_mask=None):
+        """Top-N items for an ad-hoc profile {item_id: rating}, without retraining"""
+        user_vector, user_bias = self.fold_in(ratings)
+        return self.recommend(user_vector, user_bias, top_n, exclude=ratings.keys(), item_mask=item_mask)
+
+    def with_users(self, user_item_matrix, user_positions):
+        """Copy of the model with some users refitted from their current matrix rows"""
+        user_positions = np.asarray(user_positions, dtype=np.int64)
+        user_factors, user_bias = self.user_factors.copy(), self.user_bias.copy()
+        rows = user_item_matrix.csr[user_positions]
+        solution = _als_half_step(rows, self.item_factors, self.item_bias, self.global_mean, self.regularization)
+        user_factors[user_positions], user_bias[user_positions] = solution[:, :-1], solution[:, -1]
+        return FactorModel(self.user_ids, self.item_ids, user_factors, self.item_factors, user_bias,
+                           self.item_bias, self.global_mean, self.regularization, self.users, self.items)
+
+
+def _augment(factors):
+    """Append a constant 1 column, so the bias is solved together with the factors"""
+    return np.hstack([factors, np.ones((factors.shape[0], 1), dtype=factors.dtype)]).astype(np.float64)
+
+
+def _als_half_step(ratings, fixed_factors, fixed_bias, global_mean, regularization, block_size=MF_BLOCK_SIZE):
+    """Solve [factors, bias] of every row of `ratings` (CSR) against the fixed side
+
+    Each row solves (Fᵀ F + λ·n·I) z = Fᵀ (r - global_mean - fixed_bias) over the n
+    columns it rated. The per-row Gram matrices Fᵀ F come from one sparse product
+    of the 0/1 rating mask with the column-wise outer products of the fixed factors.
+    """
+    fixed = _augment(fixed_factors)
+    dim = fixed.shape[1]
+    upper = np.triu_indices(dim)
+    outer = fixed[:, upper[0]] * fixed[:, upper[1]]  # (n_fixed, dim * (dim + 1) / 2)
+    ratings = sparse.csr_matrix(ratings)
+    solution = np.zeros((ratings.shape[0], dim), dtype=np.float32)
+    for start in range(0, ratings.shape[0], block_size):
+        block = ratings[start:start + block_size]
+        counts = np.diff(block.indptr)
+        mask = sparse.csr_matrix((np.ones(block.nnz), block.indices, block.indptr), shape=block.shape)
+        residual = sparse.csr_matrix(
+            (block.data - global_mean - fixed_bias[block.indices], block.indices, block.indptr), shape=block.shape
+        )
+        gram = np.zeros((block.shape[0], dim, dim))
+        gram[:, upper[0], upper[1]] = mask @ outer
+        gram[:, upper[1], upper[0]] = gram[:, upper[0], upper[1]]
+        gram += (regularization * np.maximum(counts, 1))[:, None, None] * np.eye(dim)
+        rhs = residual @ fixed
+        solution[start:start + block.shape[0]] = np.linalg.solve(gram, rhs[..., None])[..., 0]
+    return solution
+
+
+def train_factor_model(user_item_matrix, factors=MF_FACTORS, iterations=MF_ITERATIONS,
+                       regularization=MF_REGULARIZATION, seed=MF_SEED):
+    """Fit biased matrix factorization with alternating least squares"""
+    csr = user_item_matrix.csr
+    csc_t = user_item_matrix.csc.T.tocsr()  # items as rows
+    global_mean = float(csr.data.mean()) if csr.nnz else 0.0
+    rng = np.random.default_rng(seed)
+    item_factors = (rng.standard_normal((csr.shape[1], factors)) * 0.1).astype(np.float32)
+    item_bias = np.zeros(csr.shape[1], dtype=np.float32)
+    for iteration in range(iterations):
+        users = _als_half_step(csr, item_factors, item_bias, global_mean, regularization)
+        user_factors, user_bias = users[:, :-1], users[:, -1]
+        items = _als_half_step(csc_t, user_factors, user_bias, global_mean, regularization)
+        item_factors, item_bias = items[:, :-1], items[:, -1]
+        print(f"   • ALS iteration {iteration + 1}/{iterations}")
+    # Final user step so user factors match the last item factors
+    users = _als_half_step(csr, item_factors, item_bias, global_mean, regularization)
+    model = FactorModel(user_item_matrix.index, user_item_matrix.columns, users[:, :-1], item_factors,
+                        users[:, -1], item_bias, global_mean, regularization,
+                        user_item_matrix.users, user_item_matrix.items)
+    print(f"✅ Factor model trained: {csr.shape[0]} users × {csr.shape[1]} movies × {factors} factors, "
+          f"train RMSE {factor_model_rmse(model, user_item_matrix):.3f}")
+    return model
+
+
+def factor_model_rmse(model, user_item_matrix, block_size=MF_BLOCK_SIZE):
+    """Root mean squared error of the model on the stored ratings of a matrix"""
+    csr = user_item_matrix.csr
+    rows = model.users.positions(user_item_matrix.users.ids)
+    cols = model.items.positions(user_item_matrix.items.ids)
+    squared, count = 0.0, 0
+    for start in range(0, csr.shape[0], block_size):
+        block = csr[start:start + block_size].tocoo()
+        users, items = rows[start + block.row], cols[block.col]
+        known = (users >= 0) & (items >= 0)
+        users, items = users[known], items[known]
+        predicted = (model.global_mean + model.user_bias[users] + model.item_bias[items]
+                     + np.einsum("ij,ij->i", model.user_factors[users], model.item_factors[items]))
+        squared += float(((block.data[known] - predicted) ** 2).sum())
+        count += int(known.sum())
+    return np.sqrt(squared / count) if count else float("nan")
@@ -0,0 +1,93 @@
+"""
+Genre index
+Genres of every movie parsed once into a bitmask, so genre filters are a vectorized
+mask over the items of a model instead of string matching per movie
+"""
+import numpy as np
+import pandas as pd
+
+NO_GENRES = "(no genres listed)"
+
+
+def _parse_genres(genres):
+    """Genre names of a pipe-separated genres string"""
+    if not isinstance(genres, str):
+        return []
+    return [genre for genre in genres.split("|") if genre and genre != NO_GENRES]
+
+
+class GenreIndex:
+    """One uint64 bitmask per movie, bit i set when the movie has genres[i]
+
+    genres    -> genre names in bit order
+    item_ids  -> pd.Index of movie IDs, row order of bits
+    bits      -> (n_items,) uint64 genre bitmasks
+    """
+
+    def __init__(self, item_ids, genre_strings):
+        parsed = [_parse_genres(genres) for genres in genre_strings]
+        self.genres = sorted({genre for names in parsed for genre in names})
+        if len(self.genres) > 64:
+            raise ValueError(f"At most 64 genres fit in a bitmask, found {len(self.genres)}")
+        self.bit_of = {genre: 1 << bit for bit, genre in enumerate(self.genres)}
+        self.item_ids = pd.Index(item_ids, name="item_id")
+        self.bits = np.array([sum(self.bit_of[genre] for genre in set(names)) for names in parsed], dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.genres)
+
+    def genre_bits(self, genres):
+        """Bitmask of a list of genre names; genres no movie has contribute no bit"""
+        return np.uint64(sum(self.bit_of.get(genre, 0) for genre in set(genres)))
+
+    def bits_for(self, item_ids):
+        """Bitmasks aligned to item_ids (e.g. the matrix columns), 0 for unknown movies"""
+        positions = self.item_ids.get_indexer(pd.Index(item_ids))
+        return np.where(positions >= 0, self.bits[positions], np.uint64(0))
+
+    def aligned(self, item_ids):
+        """AlignedGenres over item_ids, to build once per model and filter many times"""
+        return AlignedGenres(self, item_ids)
+
+    def item_mask(self, item_ids, include=(), exclude=()):
+        """Boolean mask over item_ids: movies with any `include` genre and no `exclude` genre
+
+        Returns None without filters, so callers can skip masking entirely. Aligns the
+        bitmasks on every call; repeated filters over one model go through aligned().
+        """
+        if not include and not exclude:
+            return None
+        return self.aligned(item_ids).item_mask(include, exclude)
+
+
+class AlignedGenres:
+    """Genre bitmasks in the item order of one model (matrix columns or factor-model items)
+
+    Built when a model is published and read-only afterwards, so concurrent requests
+    filter by genre with two vectorized bit tests and no shared mutable state.
+
+    genre_index  -> GenreIndex the bitmasks come from
+    bits         -> (n_items,) uint64 genre bitmasks, 0 for movies without genres
+    """
+
+    def __init__(self, genre_index, item_ids):
+        self.genre_index = genre_index
+        self.bits = genre_index.bits_for(item_ids)
+
+    def __len__(self):
+        return len(self.bits)
+
+    def item_mask(self, include=(), exclude=()):
+        """Boolean mask over the items: any `include` genre and no `exclude` genre (None without filters)
+
+        A genre no movie has matches nothing: including only unknown genres keeps no
+        item, excluding one removes none.
+        """
+        if not include and not exclude:
+            return None
+        mask = np.ones(len(self.bits), dtype=bool)
+        if include:
+            mask &= (self.bits & self.genre_index.genre_bits(include)) != 0
+        if exclude:
+            mask &= (self.bits & self.genre_index.genre_bits(exclude)) == 0
+        return mask
@@ -0,0 +1,87 @@
+"""
+Dense ID mapping
+External user/movie IDs (sparse, up to the hundreds of thousands) to contiguous int32
+row/column positions and back, so hot paths index plain NumPy arrays
+"""
+import operator
+import numpy as np
+import pandas as pd
+from src.utils.constants import ID_MAP_MAX_TABLE_SIZE
+
+
+def _dense_lookup(ids):
+    """int32 table with the position of every ID (-1 = unknown), None when IDs do not fit one"""
+    if ids.dtype.kind not in "iu":
+        return None
+    if len(ids) == 0:
+        return np.zeros(0, dtype=np.int32)
+    if ids.min() < 0 or ids.max() >= ID_MAP_MAX_TABLE_SIZE:
+        return None
+    lookup = np.full(int(ids.max()) + 1, -1, dtype=np.int32)
+    lookup[ids] = np.arange(len(ids), dtype=np.int32)
+    return lookup
+
+
+class IdMap:
+    """Bidirectional mapping between external IDs and positions 0..n-1
+
+    ids     -> (n,) external IDs in position order (position -> ID)
+    lookup  -> (max_id + 1,) int32 direct-address table (ID -> position, -1 = unknown);
+               None for IDs that are not small non-negative integers, which then go
+               through a hash index instead
+    index   -> pd.Index of ids when lookup is None (built up front, so concurrent
+               lookups never race to build it), else None
+    """
+
+    def __init__(self, ids, lookup=None):
+        self.ids = np.asarray(ids)
+        self.lookup = _dense_lookup(self.ids) if lookup is None else np.asarray(lookup, dtype=np.int32)
+        self.index = pd.Index(self.ids) if self.lookup is None else None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["index"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.lookup is None:
+            self.index = pd.Index(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, external_id):
+        return self._position(external_id) >= 0
+
+    def _position(self, external_id):
+        if self.lookup is None:
+            return int(self.index.get_indexer([external_id])[0])
+        try:
+            external_id = operator.index(external_id)
+        except TypeError:
+            return -1
+        return self.lookup.item(external_id) if 0 <= external_id < len(self.lookup) else -1
+
+    def position(self, external_id):
+        """Position of one ID; KeyError when it is unknown"""
+        pos = self._position(external_id)
+        if pos < 0:
+            raise KeyError(external_id)
+        return pos
+
+    def positions(self, external_ids):
+        """int32 positions of many IDs at once, -1 for unknown IDs"""
+        external_ids = np.asarray(external_ids)
+        if len(external_ids) == 0:
+            return np.zeros(0, dtype=np.int32)
+        if self.lookup is None or external_ids.dtype.kind not in "iu":
+            return self.index.get_indexer(external_ids).astype(np.int32)
+        inside = (external_ids >= 0) & (external_ids < len(self.lookup))
+        positions = np.full(len(external_ids), -1, dtype=np.int32)
+        positions[inside] = self.lookup[external_ids[inside]]
+        return positions
+
+    def to_ids(self, positions):
+        """External IDs of positions"""
+        return self.ids[positions]
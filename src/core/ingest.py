@@ -0,0 +1,135 @@
+"""
+Incremental rating ingestion
+Applies a batch of new rating events to the loaded model and its cached artifacts
+"""
+import copy
+from src.utils.data_utils import ratings_frame
+from src.utils.constants import INGEST_COMPACTION_RATIO
+from src.core.item_index import update_item_neighbor_index
+from src.core.dataset_stats import update_dataset_stats
+from src.core.cache_manager import (
+    save_artifact,
+    load_artifact,
+    append_artifact,
+    artifact_fingerprint,
+    artifact_meta
+)
+
+# Append-only log of every ingested event, merged into the dataset whenever it is rebuilt
+INGEST_LOG = "ingested"
+# Artifacts updated by ingestion; their cached copies are rewritten only now and then and
+# the ratings ingested since are replayed when they are loaded
+INGESTED_ARTIFACTS = ("user_item_matrix", "item_index", "user_index", "factor_model")
+
+
+def ingest_ratings(artifacts, events, catalog=None):
+    """Append new rating events to the model and its cached artifacts, without a full rebuild
+
+    `artifacts` is a ModelArtifacts (or any object with the same attributes, such as the
+    UI state); `events` a DataFrame or iterable of (user_id, item_id, rating, timestamp).
+    Work grows with the batch, not with the rating history:
+    - every event is appended to the ingestion log and the cached dataset
+    - events of users and movies already in the matrix are appended to reduced_df,
+      written into the user-item matrix and used to refresh the item-neighbor index
+      rows of the rated movies and the LSH keys and latent factors of the users who
+      rated (movie factors are refitted at the next training)
+    - events of new users or movies reach the model at the next rebuild of reduced_df
+      (e.g. after a threshold change), when the filters see the full history
+    - the matrix, indexes and factor model are written to the cache only once the
+      ratings replayed on top of them at load exceed INGEST_COMPACTION_RATIO
+    - the dataset statistics are updated from the batch and written to the cache
+
+    A new rating of an already rated (user, movie) pair replaces the stored one, also
+    when the dataset is rebuilt (the newest rating by timestamp is kept); the events of
+    a batch apply in timestamp order.
+
+    Nothing passed in is modified, since it may be serving requests: returns
+    (artifacts, catalog, applied) with a copy of `artifacts` holding the updated
+    artifacts, a catalog with the new rating counts (None when none was given) and the
+    number of events applied to the model. Serve them by publishing a new snapshot,
+    as handlers.ingest_new_ratings() does.
+    """
+    events = ratings_frame(events).sort_values("timestamp", kind="stable", ignore_index=True)
+    updated = copy.copy(artifacts)
+    if events.empty:
+        return updated, catalog, 0
+    print(f"📥 Ingesting {len(events)} ratings...")
+    append_artifact(INGEST_LOG, events)
+    append_artifact("df", events)
+    updated.df = load_artifact("df")
+
+    matrix = artifacts.user_item_matrix
+    known = (matrix.user_positions(events["user_id"]) >= 0) & (matrix.item_positions(events["item_id"]) >= 0)
+    applied = events[known]
+    if not applied.empty:
+        append_artifact("reduced_df", applied)
+        updated.reduced_df = load_artifact("reduced_df")
+        updated.user_item_matrix = matrix.with_ratings(applied["user_id"], applied["item_id"], applied["rating"])
+        updated.item_index = update_item_neighbor_index(
+            artifacts.item_index, updated.user_item_matrix, applied["item_id"].unique()
+        )
+        users = updated.user_item_matrix.user_positions(applied["user_id"].unique())
+        if artifacts.user_index is not None:
+            updated.user_index = artifacts.user_index.with_users(updated.user_item_matrix, users)
+        if artifacts.factor_model is not None:
+            updated.factor_model = artifacts.factor_model.with_users(updated.user_item_matrix, users)
+        _save_if_due(updated)
+
+        if catalog is not None:
+            catalog = catalog.with_ratings(applied["item_id"])
+
+    if artifacts.stats is not None:
+        # Small enough to rewrite every time, so the stats tab and the next load agree
+        updated.stats = update_dataset_stats(
+            artifacts.stats, events, updated.df, updated.reduced_df, updated.user_item_matrix
+        )
+        save_artifact("stats", updated.stats, artifact_fingerprint("stats"),
+                      meta={"df_rows": len(updated.df), "reduced_rows": len(updated.reduced_df)})
+
+    print(f"✅ Ingested {len(events)} ratings: {len(applied)} applied, {len(events) - len(applied)} waiting for the next rebuild")
+    return updated, catalog, len(applied)
+
+
+def pending_rows(name, reduced_df):
+    """reduced_df rows ingested after the cached artifact `name` was written"""
+    applied_rows = artifact_meta(name).get("rows", len(reduced_df))
+    return reduced_df.iloc[applied_rows:]
+
+
+def apply_pending_ratings(user_item_matrix, reduced_df):
+    """Replay ingested ratings that the cached matrix does not contain yet"""
+    pending = pending_rows("user_item_matrix", reduced_df)
+    if pending.empty:
+        return user_item_matrix
+    return user_item_matrix.with_ratings(pending["user_id"], pending["item_id"], pending["rating"])
+
+
+def apply_pending_updates(name, artifact, user_item_matrix, reduced_df):
+    """Replay ingested ratings that a cached item_index, user_index or factor_model lacks
+
+    user_item_matrix must already contain them (see apply_pending_ratings()).
+    """
+    pending = pending_rows(name, reduced_df)
+    if pending.empty:
+        return artifact
+    print(f"📥 Replaying {len(pending)} ingested ratings into {name}...")
+    if name == "item_index":
+        return update_item_neighbor_index(artifact, user_item_matrix, pending["item_id"].unique())
+    return artifact.with_users(user_item_matrix, user_item_matrix.user_positions(pending["user_id"].unique()))
+
+
+def _save_if_due(artifacts):
+    """Rewrite cached artifacts once replaying the ingested rows at load costs too much
+
+    Artifacts cached without a row count (written before the deferred saves) are
+    rewritten at the first ingestion, so their replay starts from a known point.
+    """
+    for name in INGESTED_ARTIFACTS:
+        artifact = getattr(artifacts, name)
+        if artifact is None:
+            continue
+        applied_rows = artifact_meta(name).get("rows")
+        pending = len(artifacts.reduced_df) - (applied_rows or 0)
+        if applied_rows is None or pending > INGEST_COMPACTION_RATIO * artifacts.user_item_matrix.nnz:
+            print(f"💾 Writing {name} to the cache...")
+            save_artifact(name, artifact, artifact_fingerprint(name), meta={"rows": len(artifacts.reduced_df)})
@@ -0,0 +1,271 @@
+"""
+Item-neighbor index
+Precomputes the top-K most correlated items for every item of the user-item matrix
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from src.utils.constants import ITEM_NEIGHBOR_TOP_K, ITEM_NEIGHBOR_BLOCK_SIZE
+from src.core.id_map import IdMap
+
+
+class ItemNeighborIndex:
+    """Top-K neighbors per item stored as compact arrays
+
+    item_ids        -> (n_items,) item IDs, row order of the index
+    items           -> IdMap from item IDs to rows
+    neighbor_idx    -> (n_items, K) int32 positions into item_ids, -1 = empty slot
+    neighbor_scores -> (n_items, K) float32 Pearson correlations, sorted descending
+    """
+
+    def __init__(self, item_ids, neighbor_idx, neighbor_scores, items=None):
+        self.item_ids = np.asarray(item_ids)
+        self.neighbor_idx = np.asarray(neighbor_idx, dtype=np.int32)
+        self.neighbor_scores = np.asarray(neighbor_scores, dtype=np.float32)
+        self.items = items if items is not None else IdMap(self.item_ids)
+
+    @property
+    def top_k(self):
+        return self.neighbor_idx.shape[1]
+
+    def __contains__(self, item_id):
+        return item_id in self.items
+
+    def matches(self, user_item_matrix):
+        """Check that the index was built for the columns of this matrix"""
+        columns = np.asarray(user_item_matrix.columns)
+        return len(columns) == len(self.item_ids) and np.array_equal(columns, self.item_ids)
+
+    def lookup(self, item_id, top_n):
+        """Return the top_n neighbors of an item as a Series (item_id -> correlation)"""
+        pos = self.items.position(item_id)
+        idx = self.neighbor_idx[pos, :top_n]
+        valid = idx >= 0
+        return pd.Series(
+            self.neighbor_scores[pos, :top_n][valid].astype(float),
+            index=self.item_ids[idx[valid]]
+        )
+
+
+def _pearson_operands(ratings):
+    """Float64 CSC ratings, their 0/1 mask and squares for the Pearson kernel"""
+    values = sparse.csc_matrix(ratings, dtype=np.float64)
+    mask = values.copy()
+    mask.data[:] = 1.0
+    squares = values.copy()
+    squares.data **= 2
+    return values, mask, squares
+
+
+def _rater_operands(user_item_matrix, item_positions):
+    """Pearson operands over the users who rated one of the given items
+
+    Only these users contribute to correlations with the items, so the rest of the
+    matrix is never copied.
+    """
+    raters = np.unique(user_item_matrix.csc[:, np.asarray(item_positions, dtype=np.int64)].indices)
+    return _pearson_operands(user_item_matrix.csr[raters])
+
+
+def _pairwise_pearson_block(values, mask, squares, block):
+    """Pearson correlation of every column with the columns in `block`, using pairwise-complete users"""
+    m_b = mask[:, block]
+    y_b = values[:, block]
+    n = (mask.T @ m_b).toarray()
+    sum_x = (values.T @ m_b).toarray()
+    sum_y = (mask.T @ y_b).toarray()
+    sum_xx = (squares.T @ m_b).toarray()
+    sum_yy = (mask.T @ squares[:, block]).toarray()
+    sum_xy = (values.T @ y_b).toarray()
+    numerator = n * sum_xy - sum_x * sum_y
+    denominator = (n * sum_xx - sum_x * sum_x) * (n * sum_yy - sum_y * sum_y)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = numerator / np.sqrt(denominator)
+    corr[(denominator <= 0) | (n < 2)] = np.nan
+    return corr
+
+
+def _top_k(scores, candidates, k):
+    """Best k candidates per row, sorted by score (-inf = no correlation, stored as -1/NaN)"""
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    valid = np.isfinite(top_scores)
+    top_idx = np.take_along_axis(candidates, top, axis=1) if candidates.ndim == 2 else candidates[top]
+    return np.where(valid, top_idx, -1), np.where(valid, top_scores, np.nan)
+
+
+def _fill_rows(neighbor_idx, neighbor_scores, block_operands, rows, block_size):
+    """Compute the full neighbor lists of the given item positions, block by block
+
+    block_operands(block) returns Pearson operands covering every rater of the block.
+    """
+    n_items, k = neighbor_idx.shape
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        corr = _pairwise_pearson_block(*block_operands(block), block).T  # (block, n_items)
+        corr[np.arange(len(block)), block] = np.nan  # an item is not its own neighbor
+        scores = np.where(np.isnan(corr), -np.inf, corr)
+        neighbor_idx[block], neighbor_scores[block] = _top_k(scores, np.arange(n_items), k)
+
+
+def build_item_neighbor_index(user_item_matrix, top_k=ITEM_NEIGHBOR_TOP_K, block_size=ITEM_NEIGHBOR_BLOCK_SIZE):
+    """Build the top-K item-neighbor index from a user-item matrix"""
+    item_ids = np.asarray(user_item_matrix.columns)
+    n_items = len(item_ids)
+    k = min(top_k, max(n_items - 1, 0))
+    neighbor_idx = np.full((n_items, k), -1, dtype=np.int32)
+    neighbor_scores = np.full((n_items, k), np.nan, dtype=np.float32)
+    if k > 0:
+        operands = _pearson_operands(user_item_matrix.csc)
+        _fill_rows(neighbor_idx, neighbor_scores, lambda block: operands, np.arange(n_items), block_size)
+
+    print(f"✅ Item-neighbor index built: {n_items} items × top {k}")
+    return ItemNeighborIndex(item_ids, neighbor_idx, neighbor_scores)
+
+
+def update_item_neighbor_index(item_index, user_item_matrix, changed_item_ids, block_size=ITEM_NEIGHBOR_BLOCK_SIZE):
+    """Refresh the index after the ratings of some items changed
+
+    Only correlations involving a changed item can move, and only the users who rated
+    a changed item take part in them, so the Pearson operands cover those users only.
+    Rows of changed items are recomputed; rows correlated with a changed item (or
+    listing one) merge their new scores against the changed items into the stored
+    top-K, and the other rows are left as they are. A row is recomputed in full only
+    when a changed item dropped out of a full list, since the stored list cannot tell
+    which item takes its place.
+    """
+    if not item_index.matches(user_item_matrix):
+        raise ValueError("The item-neighbor index was built for different items, rebuild it")
+    changed = user_item_matrix.item_positions(np.unique(np.asarray(changed_item_ids)))
+    changed = changed[changed >= 0]
+    neighbor_idx = item_index.neighbor_idx.copy()
+    neighbor_scores = item_index.neighbor_scores.copy()
+    n_items, k = neighbor_idx.shape
+    if k == 0 or len(changed) == 0:
+        return ItemNeighborIndex(item_index.item_ids, neighbor_idx, neighbor_scores, item_index.items)
+
+    stale = np.zeros(n_items, dtype=bool)
+    stale[changed] = True
+    for start in range(0, len(changed), block_size):
+        block = changed[start:start + block_size]
+        corr = _pairwise_pearson_block(*_rater_operands(user_item_matrix, block), block)  # (n_items, block)
+        corr[block, np.arange(len(block))] = np.nan
+        in_block = np.isin(neighbor_idx, block)
+        rows = np.flatnonzero(~np.isnan(corr).all(axis=1) | in_block.any(axis=1))
+        row_idx, row_scores, in_block, corr = neighbor_idx[rows], neighbor_scores[rows], in_block[rows], corr[rows]
+        kept_scores = np.where((row_idx >= 0) & ~in_block, row_scores, -np.inf)
+        scores = np.hstack([kept_scores, np.where(np.isnan(corr), -np.inf, corr)])
+        candidates = np.hstack([row_idx, np.broadcast_to(block, (len(rows), len(block)))])
+        new_idx, new_scores = _top_k(scores, candidates, k)
+        # Items outside a full list score at most its last entry; the merged list is exact
+        # as long as it does not end below that bound
+        was_full = row_idx[:, -1] >= 0
+        old_floor = np.where(was_full, row_scores[:, -1], -np.inf)
+        new_floor = np.where(new_idx[:, -1] >= 0, new_scores[:, -1], -np.inf)
+        stale[rows] |= in_block.any(axis=1) & was_full & (new_floor < old_floor)
+        neighbor_idx[rows], neighbor_scores[rows] = new_idx, new_scores
+
+    _fill_rows(
+        neighbor_idx, neighbor_scores, lambda block: _rater_operands(user_item_matrix, block),
+        np.flatnonzero(stale), block_size
+    )
+    print(f"✅ Item-neighbor index updated: {len(changed)} changed items, {int(stale.sum())} rows recomputed")
+    return ItemNeighborIndex(item_index.item_ids, neighbor_idx, neighbor_scores, item_index.items)
+
+
+def compute_similar_items(user_item_matrix, item_id, top_n, item_mask=None):
+    """Live Pearson correlation of one item against every other item
+
+    item_mask (bool per matrix column) leaves out the items where it is False; only the
+    remaining columns are correlated.
+    """
+    pos = user_item_matrix.item_position(item_id)
+    # Only users who rated the selected item contribute to any of its correlations
+    raters = user_item_matrix.csc[:, pos].indices
+    ratings = user_item_matrix.csr[raters]
+    columns = user_item_matrix.columns
+    if item_mask is not None:
+        keep = item_mask.copy()
+        keep[pos] = True
+        ratings = ratings[:, keep]
+        columns = columns[keep]
+        pos = int(keep[:pos].sum())
+    values, mask, squares = _pearson_operands(ratings)
+    corr = pd.Series(_pairwise_pearson_block(values, mask, squares, [pos])[:, 0], index=columns)
+    correlated_items = corr.drop(index=item_id)
+    return correlated_items.dropna().sort_values(ascending=False).head(top_n)
+
+
+def aggregate_similar_items(user_item_matrix, seed_item_ids, top_n, item_index=None,
+                            top_k=ITEM_NEIGHBOR_TOP_K, exclude_item_ids=(), item_mask=None):
+    """Top-N items by their best correlation with any of the seed items
+
+    Each seed contributes its top_k neighbors: indexed seeds as one gather from the
+    index arrays, the others correlated against the matrix in one batch. The lists are
+    merged with a scatter-max over item positions and excluded items (and those where
+    item_mask is False) are masked out, so the cost barely grows with the number of seeds.
+    """
+    columns = user_item_matrix.columns
+    seed_item_ids = list(seed_item_ids)
+    indexed = [item_id for item_id in seed_item_ids
+               if item_index is not None and item_id in item_index and top_k <= item_index.top_k]
+    indexed_set = set(indexed)
+    live = [item_id for item_id in seed_item_ids if item_id not in indexed_set]
+    neighbor_positions, neighbor_scores = [], []
+    if indexed:
+        rows = item_index.items.positions(indexed)
+        idx = item_index.neighbor_idx[rows, :top_k]
+        valid = idx >= 0
+        idx = idx[valid]
+        if not item_index.matches(user_item_matrix):
+            idx = user_item_matrix.item_positions(item_index.item_ids[idx])
+        neighbor_positions.append(idx)
+        neighbor_scores.append(item_index.neighbor_scores[rows, :top_k][valid])
+    if live:
+        block = user_item_matrix.item_positions(live)
+        if (block < 0).any():
+            raise KeyError(live[int(np.argmax(block < 0))])
+        corr = _pairwise_pearson_block(*_rater_operands(user_item_matrix, block), block).T  # (seeds, n_items)
+        corr[np.arange(len(block)), block] = np.nan
+        k = min(top_k, max(len(columns) - 1, 0))
+        idx, scores = _top_k(np.where(np.isnan(corr), -np.inf, corr), np.arange(len(columns)), k)
+        valid = idx >= 0
+        neighbor_positions.append(idx[valid])
+        neighbor_scores.append(scores[valid])
+    if not neighbor_positions:
+        return pd.Series(dtype=float)
+
+    positions = np.concatenate(neighbor_positions)
+    scores = np.concatenate(neighbor_scores).astype(float)
+    known = positions >= 0
+    best = np.full(len(columns), -np.inf)
+    np.maximum.at(best, positions[known], scores[known])
+    excluded = user_item_matrix.item_positions(list(exclude_item_ids))
+    best[excluded[excluded >= 0]] = -np.inf
+    if item_mask is not None:
+        best[~item_mask] = -np.inf
+    candidates = np.flatnonzero(np.isfinite(best))
+    if len(candidates) > top_n:
+        candidates = candidates[np.argpartition(-best[candidates], top_n - 1)[:top_n]]
+    candidates = candidates[np.argsort(-best[candidates], kind="stable")]
+    return pd.Series(best[candidates], index=columns[candidates])
+
+
+def get_similar_items(user_item_matrix, item_id, top_n, item_index=None, item_mask=None):
+    """Top-N most correlated items, served from the index when possible
+
+    With an item_mask (bool per matrix column) the item's whole neighbor list is
+    filtered; only when fewer than top_n neighbors pass is it correlated live.
+    """
+    if item_index is not None and item_id in item_index and top_n <= item_index.top_k:
+        if item_mask is None:
+            return item_index.lookup(item_id, top_n)
+        if item_index.matches(user_item_matrix):
+            neighbors = item_index.lookup(item_id, item_index.top_k)
+            passed = item_mask[item_index.neighbor_idx[item_index.items.position(item_id), :len(neighbors)]]
+            if passed.sum() >= top_n or len(neighbors) < item_index.top_k:
+                return neighbors[passed].head(top_n)
+    return compute_similar_items(user_item_matrix, item_id, top_n, item_mask)
@@ -0,0 +1,353 @@
+"""
+Build pipeline for the recommendation model
+Brings each cached artifact up to date, rebuilding only the stages whose inputs changed
+
+Stages and their inputs:
+    df, movies        -> data/ratings.csv, data/movies.csv
+    reduced_df        -> df + USER_RATING_THRESHOLD / ITEM_RATED_THRESHOLD
+    user_item_matrix  -> reduced_df
+    item_index        -> user_item_matrix + ITEM_NEIGHBOR_TOP_K
+    user_index        -> user_item_matrix + USER_LSH_TABLES / USER_LSH_BITS (only with USER_ANN_ENABLED)
+    factor_model      -> user_item_matrix + MF_FACTORS / MF_ITERATIONS / MF_REGULARIZATION
+    stats             -> df + reduced_df + user_item_matrix (counts, histograms, degrees)
+
+Every artifact is saved with a fingerprint of its inputs (upstream fingerprint,
+parameters and the stage code version below). Tuning a threshold therefore only
+rebuilds reduced_df and what depends on it, without re-parsing the CSV.
+
+Ratings added with ingest_ratings() are appended to the cached df and reduced_df and
+kept in an ingestion log, which is merged back whenever df is rebuilt. The matrix,
+indexes and factor model record how many reduced_df rows they contain; the rows
+ingested after they were last written are replayed when they are loaded.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from src.utils.data_utils import load_dataset, dataframe_reduction, replaced_ratings
+from src.utils.constants import (
+    USER_RATING_THRESHOLD,
+    ITEM_RATED_THRESHOLD,
+    ITEM_NEIGHBOR_TOP_K,
+    USER_LSH_TABLES,
+    USER_LSH_BITS,
+    USER_ANN_ENABLED,
+    MF_FACTORS,
+    MF_ITERATIONS,
+    MF_REGULARIZATION
+)
+from src.core.recommender import create_user_item_matrix
+from src.core.item_index import build_item_neighbor_index
+from src.core.user_index import build_user_lsh_index
+from src.core.factorization import train_factor_model
+from src.core.dataset_stats import compute_dataset_stats
+from src.core.ingest import INGEST_LOG, apply_pending_ratings, apply_pending_updates
+from src.core.cache_manager import (
+    save_artifact,
+    load_artifact,
+    artifact_exists,
+    artifact_fingerprint,
+    artifact_meta,
+    load_source_hashes,
+    save_source_hashes,
+    legacy_dumps_exist,
+    migrate_legacy_dumps
+)
+
+SOURCE_FILES = ["data/ratings.csv", "data/movies.csv"]
+
+# Bump a stage version whenever its code changes the produced artifact
+STAGE_VERSIONS = {
+    "df": 2,
+    "reduced_df": 4,
+    "user_item_matrix": 2,
+    "item_index": 1,
+    "user_index": 1,
+    "factor_model": 1,
+    "stats": 1,
+}
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class ModelArtifacts:
+    """Outputs of the build pipeline"""
+
+    def __init__(self):
+        self.df = None
+        self.movies = None
+        self.reduced_df = None
+        self.user_item_matrix = None
+        self.item_index = None
+        self.user_index = None
+        self.factor_model = None
+        self.stats = None
+        self.rebuilt = []  # stages rebuilt during this run
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_hashes():
+    """Size, mtime and content hash of every source file
+
+    The content hash is reused from the last build when size and mtime are unchanged,
+    so an unchanged 25M-row CSV is not re-read on every start.
+    """
+    known = load_source_hashes()
+    sources = {}
+    for path in SOURCE_FILES:
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        record = known.get(path)
+        if record is None or record["size"] != stat.st_size or record["mtime_ns"] != stat.st_mtime_ns:
+            print(f"🔑 Hashing {path}...")
+            record = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _hash_file(path)}
+        sources[path] = record
+    return sources
+
+
+def fingerprint(stage, *inputs):
+    """Stable hash of a stage name, its code version and its inputs"""
+    payload = json.dumps([stage, STAGE_VERSIONS[stage], *inputs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def expected_fingerprints(sources):
+    """Fingerprint every stage should carry for the current sources and settings"""
+    if sources is None:
+        # Source files unavailable: the cached dataset cannot be checked, trust it as is
+        df_fp = artifact_fingerprint("df")
+    else:
+        df_fp = fingerprint("df", sorted((path, record["size"], record["sha256"]) for path, record in sources.items()))
+    reduced_fp = fingerprint("reduced_df", df_fp, USER_RATING_THRESHOLD, ITEM_RATED_THRESHOLD)
+    matrix_fp = fingerprint("user_item_matrix", reduced_fp)
+    index_fp = fingerprint("item_index", matrix_fp, ITEM_NEIGHBOR_TOP_K)
+    user_index_fp = fingerprint("user_index", matrix_fp, USER_LSH_TABLES, USER_LSH_BITS)
+    factor_fp = fingerprint("factor_model", matrix_fp, MF_FACTORS, MF_ITERATIONS, MF_REGULARIZATION)
+    stats_fp = fingerprint("stats", matrix_fp)
+    return {
+        "df": df_fp,
+        "reduced_df": reduced_fp,
+        "user_item_matrix": matrix_fp,
+        "item_index": index_fp,
+        "user_index": user_index_fp,
+        "factor_model": factor_fp,
+        "stats": stats_fp
+    }
+
+
+def _is_fresh(stage, expected):
+    return artifact_exists(stage) and artifact_fingerprint(stage) == expected[stage]
+
+
+def _movies_from_ratings(df):
+    """Per-movie table recovered from a cached dataset that still carries titles on every rating"""
+    movies = df[["item_id", "item_name", "genres"]].drop_duplicates(subset="item_id")
+    return movies.reset_index(drop=True)
+
+
+def _add_ingested(ratings, user_counts, item_counts):
+    """Append the ingestion log to freshly loaded ratings and their counts"""
+    if not artifact_exists(INGEST_LOG):
+        return ratings, user_counts, item_counts
+    ingested = load_artifact(INGEST_LOG)
+    print(f"📥 Adding {len(ingested)} ingested ratings...")
+    ratings = pd.concat([ratings, ingested], ignore_index=True)
+    user_counts = user_counts.add(ingested["user_id"].value_counts(), fill_value=0).astype(np.int64)
+    item_counts = item_counts.add(ingested["item_id"].value_counts(), fill_value=0).astype(np.int64)
+    return ratings, user_counts, item_counts
+
+
+def _report(report, step, message):
+    print(message)
+    if report is not None:
+        report(step, message)
+
+
+def _stage_done(on_stage, stage, artifacts):
+    if on_stage is not None:
+        on_stage(stage, artifacts)
+
+
+def build_or_load(report=None, on_stage=None):
+    """Load fresh artifacts from cache and rebuild the stale ones
+
+    report(step, message) is called before each stage; step is a PROGRESS_STEPS key.
+    on_stage(stage, artifacts) is called after each stage with the artifacts built so
+    far, so callers can start using them before the whole build is done.
+    """
+    if legacy_dumps_exist() and not artifact_exists("df"):
+        migrate_legacy_dumps()
+
+    sources = source_hashes()
+    if sources is None and not artifact_exists("df"):
+        raise FileNotFoundError(f"No cached data and missing source files: {', '.join(SOURCE_FILES)}")
+    expected = expected_fingerprints(sources)
+    artifacts = ModelArtifacts()
+
+    # Stage 1: raw dataset (ratings + per-movie table)
+    user_counts = item_counts = None
+    if sources is None or (_is_fresh("df", expected) and artifact_exists("movies")):
+        _report(report, "loading_dataset", "📦 Loading dataset from cache...")
+        artifacts.df = load_artifact("df")
+        if artifact_exists("movies"):
+            artifacts.movies = load_artifact("movies")
+        else:
+            # Dataset cached by an earlier version: split titles into their own table once
+            artifacts.movies = _movies_from_ratings(artifacts.df)
+            artifacts.df = artifacts.df[["user_id", "item_id", "rating", "timestamp"]]
+            save_artifact("movies", artifacts.movies, artifact_fingerprint("df"))
+            save_artifact("df", artifacts.df, artifact_fingerprint("df"))
+    else:
+        _report(report, "loading_dataset", "📂 Loading dataset...")
+        artifacts.df, artifacts.movies, user_counts, item_counts = load_dataset()
+        artifacts.df, user_counts, item_counts = _add_ingested(artifacts.df, user_counts, item_counts)
+        save_artifact("movies", artifacts.movies, expected["df"])
+        save_artifact("df", artifacts.df, expected["df"])
+        artifacts.rebuilt.append("df")
+    if sources is not None and sources != load_source_hashes():
+        save_source_hashes(sources)
+
+    _stage_done(on_stage, "df", artifacts)
+
+    # Stage 2: threshold filtering
+    if _is_fresh("reduced_df", expected):
+        _report(report, "filtering_data", "📦 Loading filtered data from cache...")
+        artifacts.reduced_df = load_artifact("reduced_df")
+    else:
+        _report(report, "filtering_data", "🔍 Filtering data...")
+        replaced = None
+        if artifact_exists(INGEST_LOG):
+            # Re-rated (user, movie) pairs keep only their newest rating
+            replaced = replaced_ratings(artifacts.df, load_artifact(INGEST_LOG)["user_id"].unique())
+        artifacts.reduced_df = dataframe_reduction(
+            artifacts.df,
+            user_col="user_id",
+            item_col="item_id",
+            user_rating_threshold=USER_RATING_THRESHOLD,
+            item_rated_threshold=ITEM_RATED_THRESHOLD,
+            user_counts=user_counts,
+            item_counts=item_counts,
+            drop_rows=replaced
+        )
+        save_artifact("reduced_df", artifacts.reduced_df, expected["reduced_df"])
+        artifacts.rebuilt.append("reduced_df")
+
+    _stage_done(on_stage, "reduced_df", artifacts)
+
+    # Stage 3: user-item matrix
+    if _is_fresh("user_item_matrix", expected):
+        _report(report, "creating_matrix", "📦 Loading user-item matrix from cache...")
+        artifacts.user_item_matrix = apply_pending_ratings(load_artifact("user_item_matrix"), artifacts.reduced_df)
+    else:
+        _report(report, "creating_matrix", "🔢 Creating user-item matrix...")
+        artifacts.user_item_matrix = create_user_item_matrix(
+            artifacts.reduced_df,
+            index_col="user_id",
+            columns_col="item_id",
+            values_col="rating"
+        )
+        save_artifact(
+            "user_item_matrix",
+            artifacts.user_item_matrix,
+            expected["user_item_matrix"],
+            meta={"rows": len(artifacts.reduced_df)}
+        )
+        artifacts.rebuilt.append("user_item_matrix")
+
+    _stage_done(on_stage, "user_item_matrix", artifacts)
+
+    # Stage 4: item-neighbor index
+    if _is_fresh("item_index", expected):
+        _report(report, "building_index", "📦 Loading item-neighbor index from cache...")
+        artifacts.item_index = apply_pending_updates(
+            "item_index", load_artifact("item_index"), artifacts.user_item_matrix, artifacts.reduced_df
+        )
+    else:
+        _report(report, "building_index", "🧭 Building item-neighbor index...")
+        artifacts.item_index = build_item_neighbor_index(artifacts.user_item_matrix)
+        save_artifact("item_index", artifacts.item_index, expected["item_index"], meta={"rows": len(artifacts.reduced_df)})
+        artifacts.rebuilt.append("item_index")
+
+    _stage_done(on_stage, "item_index", artifacts)
+
+    # Stage 5: user LSH index (skipped while the user ANN path is off; its cache is kept)
+    if not USER_ANN_ENABLED:
+        artifacts.user_index = None
+    elif _is_fresh("user_index", expected):
+        _report(report, "building_user_index", "📦 Loading user LSH index from cache...")
+        artifacts.user_index = apply_pending_updates(
+            "user_index", load_artifact("user_index"), artifacts.user_item_matrix, artifacts.reduced_df
+        )
+    else:
+        _report(report, "building_user_index", "🧭 Building user LSH index...")
+        artifacts.user_index = build_user_lsh_index(artifacts.user_item_matrix)
+        save_artifact("user_index", artifacts.user_index, expected["user_index"], meta={"rows": len(artifacts.reduced_df)})
+        artifacts.rebuilt.append("user_index")
+
+    _stage_done(on_stage, "user_index", artifacts)
+
+    # Stage 6: matrix factorization
+    if _is_fresh("factor_model", expected):
+        _report(report, "training_factors", "📦 Loading factor model from cache...")
+        artifacts.factor_model = apply_pending_updates(
+            "factor_model", load_artifact("factor_model"), artifacts.user_item_matrix, artifacts.reduced_df
+        )
+    else:
+        _report(report, "training_factors", "🧮 Training factor model...")
+        artifacts.factor_model = train_factor_model(artifacts.user_item_matrix)
+        save_artifact("factor_model", artifacts.factor_model, expected["factor_model"], meta={"rows": len(artifacts.reduced_df)})
+        artifacts.rebuilt.append("factor_model")
+
+    _stage_done(on_stage, "factor_model", artifacts)
+
+    # Stage 7: dataset statistics (ingestion keeps them current; recomputed when the row counts disagree)
+    rows = {"df_rows": len(artifacts.df), "reduced_rows": len(artifacts.reduced_df)}
+    if _is_fresh("stats", expected) and artifact_meta("stats") == rows:
+        _report(report, "computing_stats", "📦 Loading dataset statistics from cache...")
+        artifacts.stats = load_artifact("stats")
+    else:
+        _report(report, "computing_stats", "📊 Computing dataset statistics...")
+        artifacts.stats = compute_dataset_stats(artifacts.df, artifacts.reduced_df, artifacts.user_item_matrix)
+        save_artifact("stats", artifacts.stats, expected["stats"], meta=rows)
+        artifacts.rebuilt.append("stats")
+
+    _stage_done(on_stage, "stats", artifacts)
+
+    if artifacts.rebuilt:
+        print(f"✅ Rebuilt stages: {', '.join(artifacts.rebuilt)}")
+    else:
+        print("✅ All stages loaded from cache")
+    return artifacts
+
+
+def build_in_memory(data_dir, user_rating_threshold=USER_RATING_THRESHOLD, item_rated_threshold=ITEM_RATED_THRESHOLD):
+    """Build every stage from a dataset directory without reading or writing the dumps cache
+
+    Used to serve or test against another dataset, e.g. one from benchmarks/synthetic.py.
+    """
+    artifacts = ModelArtifacts()
+    artifacts.df, artifacts.movies, user_counts, item_counts = load_dataset(data_dir=data_dir)
+    artifacts.reduced_df = dataframe_reduction(
+        artifacts.df,
+        user_rating_threshold=user_rating_threshold,
+        item_rated_threshold=item_rated_threshold,
+        user_counts=user_counts,
+        item_counts=item_counts
+    )
+    artifacts.user_item_matrix = create_user_item_matrix(artifacts.reduced_df)
+    artifacts.item_index = build_item_neighbor_index(artifacts.user_item_matrix)
+    artifacts.user_index = build_user_lsh_index(artifacts.user_item_matrix) if USER_ANN_ENABLED else None
+    artifacts.factor_model = train_factor_model(artifacts.user_item_matrix)
+    artifacts.stats = compute_dataset_stats(artifacts.df, artifacts.reduced_df, artifacts.user_item_matrix)
+    artifacts.rebuilt = (["df", "reduced_df", "user_item_matrix", "item_index"]
+                         + (["user_index"] if USER_ANN_ENABLED else []) + ["factor_model", "stats"])
+    return artifacts
@@ -2,118 +2,234 @@
 Recommendation system functions
 """
 
+import numpy as np
 import pandas as pd
-# from surprise import Reader, Dataset, SVD
-import unicodedata
-try:
-    from unidecode import unidecode
-    def normalize_str(s):
-        return unidecode(str(s)).casefold()
-except ImportError:
-    def normalize_str(s):
-        return unicodedata.normalize('NFKD', str(s)).encode('ASCII', 'ignore').decode('utf-8').casefold()
-
-def find_item_name_using_id(dataframe, item_col_name="item_id", item_id=None):
-    """Find item name by ID"""
-    return dataframe[dataframe[item_col_name] == item_id]["item_name"].values[0]
-
-def find_item_id_using_name(dataframe, item_col_name="item_name", item_name=None):
-    """Find item ID by name"""
-    # Use normalized comparison for robust matching
-    norm_target = normalize_str(item_name)
-    for idx, row in dataframe.iterrows():
-        if normalize_str(row[item_col_name]) == norm_target:
-            return row["item_id"]
-    # fallback: try exact match (legacy)
-    return dataframe[dataframe[item_col_name] == item_name]["item_id"].values[0]
-
-def search_item_names_with_keyword(dataframe, item_col_name="item_name", searched_item_name=None):
-    """Search for items containing a keyword"""
-    item_names = []
-    norm_keyword = normalize_str(searched_item_name)
-    for name in dataframe[item_col_name]:
-        if norm_keyword in normalize_str(name) and name not in item_names:
-            item_names.append(name)
-    return item_names
-
-def create_user_item_matrix(dataframe, index_col="user_id", columns_col="item_id", values_col="rating"):
-    """Create user-item matrix for collaborative filtering"""
-    user_item_matrix = dataframe.pivot_table(index=index_col, columns=columns_col, values=values_col)
+from scipy import sparse
+from src.core.user_item_matrix import UserItemMatrix
+from src.core.item_index import compute_similar_items
+from src.core.factorization import train_factor_model
+from src.core.search_index import TitleSearchIndex
+from src.utils.instrumentation import span, debug
+from src.utils.constants import (
+    USER_ANN_CANDIDATES,
+    USER_ANN_POOL_FACTOR,
+    RATING_COUNT_BREAKPOINTS,
+    USER_SIMILARITY_OVERLAP_THRESHOLDS,
+    USER_CORRELATION_THRESHOLDS
+)
+
+def search_item_names_with_keyword(dataframe, item_col_name="item_name", searched_item_name=None, search_index=None):
+    """Search for items containing a keyword, most rated first"""
+    if search_index is None:
+        search_index = TitleSearchIndex.from_dataframe(dataframe, item_col_name=item_col_name)
+    return search_index.search(searched_item_name)
+
+def create_user_item_matrix(dataframe, index_col="user_id", columns_col="item_id", values_col="rating",
+                            timestamp_col="timestamp"):
+    """Create sparse user-item matrix for collaborative filtering (re-rated pairs keep their latest rating)"""
+    timestamps = dataframe[timestamp_col] if timestamp_col in dataframe else None
+    user_item_matrix = UserItemMatrix.from_ratings(
+        dataframe[index_col], dataframe[columns_col], dataframe[values_col], timestamps
+    )
     return user_item_matrix
 
-def item_based_recommendation(user_item_matrix, dataframe, selected_item_id, top_n=10):
-    """Generate item-based recommendations"""
-    selected_item = user_item_matrix.loc[:,selected_item_id]
-    correlated_items = user_item_matrix.corrwith(selected_item).sort_values(ascending=False)[1:top_n+1]
-    correlated_item_ids = correlated_items.index.to_list()
-    correlated_rates = correlated_items.to_list()
-    
-    print("*"*100)
-    print("'", find_item_name_using_id(dataframe, item_id=selected_item_id), "' - Recommendation List")
-    print("*"*100)
-    for no, item_id, rate in zip(range(1,top_n+1),correlated_item_ids, correlated_rates):
-        item_name = find_item_name_using_id(dataframe, item_id=item_id)
-        print(no,"-", item_name, "-"*(70 - len(item_name)-len(str(no))), " - ", round(rate*100,2),"%")
-    print("*"*100)
+def item_based_recommendation(user_item_matrix, catalog, selected_item_id, top_n=10):
+    """Generate item-based recommendations, titles resolved through the MovieCatalog"""
+    correlated_items = compute_similar_items(user_item_matrix, selected_item_id, top_n)
+
+    debug("*"*100)
+    debug("'", catalog.title(selected_item_id), "' - Recommendation List")
+    debug("*"*100)
+    for no, (item_id, rate) in enumerate(correlated_items.items(), 1):
+        item_name = catalog.title(item_id)
+        debug(no, "-", item_name, "-"*(70 - len(item_name)-len(str(no))), " - ", round(rate*100,2), "%")
+    debug("*"*100)
+    return correlated_items
+
+def masked_pearson(ratings, target):
+    """Pearson correlation of every row of `ratings` with `target`, over pairwise-complete columns (NaN = missing)
+
+    Uses raw moments so that, for ratings on the half-star grid, every sum is exact and
+    only the final division rounds: equal correlations compare equal.
+    """
+    mask = ~np.isnan(ratings) & ~np.isnan(target)
+    x = np.where(mask, ratings, 0.0)
+    y = np.where(mask, target, 0.0)
+    n = mask.sum(axis=1)
+    sum_x, sum_y = x.sum(axis=1), y.sum(axis=1)
+    numerator = n * (x * y).sum(axis=1) - sum_x * sum_y
+    denominator = (n * (x * x).sum(axis=1) - sum_x * sum_x) * (n * (y * y).sum(axis=1) - sum_y * sum_y)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = numerator / np.sqrt(denominator)
+    corr[(denominator <= 0) | (n < 2)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+def _similar_user_positions(user_item_matrix, target, perc_threshold_rated_same_products=0.7, corr_threshold=0.5,
+                            exclude_position=None, user_index=None, ann_candidates=USER_ANN_CANDIDATES):
+    """find_similar_users() on row positions, without going through user IDs
+
+    Returns (user positions, correlations) sorted by descending correlation, and rated_positions.
+    """
+    # 1. Filter by movies rated in the target (columns)
+    rated_positions = np.flatnonzero(~np.isnan(target))
+    debug(f"Step 1: User rated {len(rated_positions)} items")
+    debug(f"Rated item IDs: {user_item_matrix.columns[rated_positions[:10]].tolist()}...")
+    # 2. Find users who watched enough common movies
+    count_threshold = len(rated_positions) * perc_threshold_rated_same_products
+    with span("similar_users.candidate_filter"):
+        if user_index is None:
+            overlap_counts = user_item_matrix.overlap_counts(rated_positions)
+            candidate_positions = np.flatnonzero(overlap_counts > count_threshold)
+        else:
+            query_row = sparse.csr_matrix(
+                (target[rated_positions], (np.zeros(len(rated_positions), dtype=np.int64), rated_positions)),
+                shape=(1, user_item_matrix.shape[1])
+            )
+            ann_positions = user_index.query(user_item_matrix, query_row, ann_candidates * USER_ANN_POOL_FACTOR)
+            overlap_counts = user_item_matrix.overlap_counts(rated_positions, ann_positions)
+            candidate_positions = np.sort(ann_positions[overlap_counts > count_threshold][:ann_candidates])
+            debug(f"Step 2a: ANN index returned {len(ann_positions)} candidate users")
+    debug(f"Step 2: Need at least {count_threshold:.1f} overlapping items")
+    debug(f"Step 3: Found {len(candidate_positions)} users with enough overlap")
+    if len(candidate_positions) == 0:
+        debug("ERROR: No users found with sufficient overlap!")
+        return candidate_positions, np.zeros(0), rated_positions
+    # 3. Calculate correlation only between the target and these users
+    with span("similar_users.correlation"):
+        candidate_ratings = user_item_matrix.dense_rows(candidate_positions, rated_positions)
+        correlations = masked_pearson(candidate_ratings, target[rated_positions])
+        keep = correlations >= corr_threshold
+        if corr_threshold == 0.0:
+            keep |= np.isnan(correlations)
+        if exclude_position is not None:
+            keep &= candidate_positions != exclude_position
+        positions, correlations = candidate_positions[keep], correlations[keep]
+        # Stable descending sort (ties keep row order, NaN last)
+        order = np.argsort(-correlations, kind="stable")
+        positions, correlations = positions[order], correlations[order]
+    debug(f"Step 4: After correlation filter (>={corr_threshold}): {len(positions)} similar users")
+    if len(positions) == 0:
+        debug("ERROR: No users found with sufficient correlation!")
+    return positions, correlations, rated_positions
+
+def find_similar_users(user_item_matrix, target, perc_threshold_rated_same_products=0.7, corr_threshold=0.5,
+                       exclude_user_id=None, user_index=None, ann_candidates=USER_ANN_CANDIDATES):
+    """Users correlated with a target rating vector (n_items, NaN = not rated)
+
+    The target does not have to be a row of the matrix: an ad-hoc profile is scored
+    against the shared matrix as an external query, without copying it.
+    Returns (similar_users: Series user_id -> correlation, rated_positions).
+    """
+    exclude_position = None
+    if exclude_user_id is not None and exclude_user_id in user_item_matrix.users:
+        exclude_position = user_item_matrix.user_position(exclude_user_id)
+    positions, correlations, rated_positions = _similar_user_positions(
+        user_item_matrix, target, perc_threshold_rated_same_products, corr_threshold,
+        exclude_position=exclude_position, user_index=user_index, ann_candidates=ann_candidates
+    )
+    return pd.Series(correlations, index=user_item_matrix.index[positions]), rated_positions
 
 def user_based_recommendation(user_item_matrix, dataframe, selected_user_id, 
                                perc_threshold_rated_same_products=0.7, corr_threshold=0.5, 
-                               score_threshold=3, scores_count_to_show=5, return_corrs=False):
-    """Generate user-based recommendations. If return_corrs=True, also return dict of userId: corr."""
-    print(f"\n=== DEBUG: user_based_recommendation START ===")
-    print(f"Selected user ID: {selected_user_id}")
-    print(f"Thresholds - perc: {perc_threshold_rated_same_products}, corr: {corr_threshold}")
-    # 1. Filter by movies watched by the selected user (columns)
-    user_vector = user_item_matrix.loc[selected_user_id]
-    rated_items = user_vector[user_vector.notnull()].index.tolist()
-    print(f"Step 1: User rated {len(rated_items)} items")
-    print(f"Rated item IDs: {rated_items[:10]}...")
-    # 2. Find users who watched enough common movies
-    candidate_users = user_item_matrix[rated_items]
-    overlap_counts = candidate_users.notnull().sum(axis=1)
-    count_threshold = len(rated_items) * perc_threshold_rated_same_products
-    candidate_users = candidate_users[overlap_counts > count_threshold]
-    print(f"Step 2: Need at least {count_threshold:.1f} overlapping items")
-    print(f"Step 3: Found {len(candidate_users)} users with enough overlap")
-    if len(candidate_users) == 0:
-        print("ERROR: No users found with sufficient overlap!")
-        print("="*50)
-        return (pd.DataFrame(), {}) if return_corrs else pd.DataFrame()
-    # 3. Calculate correlation only between the selected user and these users
-    correlations = candidate_users.apply(lambda row: row.corr(user_vector), axis=1)
-    correlations = correlations.drop(index=selected_user_id, errors='ignore')
-    if corr_threshold == 0.0:
-        similar_users = correlations[(correlations >= corr_threshold) | (correlations.isna())].sort_values(ascending=False)
-    else:
-        similar_users = correlations[correlations >= corr_threshold].sort_values(ascending=False)
-    print(f"Step 4: After correlation filter (>={corr_threshold}): {len(similar_users)} similar users")
-    if len(similar_users) == 0:
-        print("ERROR: No users found with sufficient correlation!")
-        print("="*50)
+                               score_threshold=3, scores_count_to_show=5, return_corrs=False,
+                               user_index=None, ann_candidates=USER_ANN_CANDIDATES, item_mask=None):
+    """Generate user-based recommendations. If return_corrs=True, also return dict of userId: corr.
+
+    With a user_index (UserLSHIndex), only its ann_candidates closest users are checked
+    for overlap and correlation instead of every user in the matrix. Items where
+    item_mask (bool per matrix column) is False are left out.
+    """
+    debug(f"\n=== DEBUG: user_based_recommendation START ===")
+    debug(f"Selected user ID: {selected_user_id}")
+    debug(f"Thresholds - perc: {perc_threshold_rated_same_products}, corr: {corr_threshold}")
+    selected_position = user_item_matrix.user_position(selected_user_id)
+    positions, correlations, rated_positions = _similar_user_positions(
+        user_item_matrix,
+        user_item_matrix.dense_rows([selected_position])[0],
+        perc_threshold_rated_same_products,
+        corr_threshold,
+        exclude_position=selected_position,
+        user_index=user_index,
+        ann_candidates=ann_candidates
+    )
+    if len(positions) == 0:
+        debug("="*50)
         return (pd.DataFrame(), {}) if return_corrs else pd.DataFrame()
-    user_corr_dict = similar_users.to_dict()
-    list_users_to_filter = list(similar_users.index)
+    # Back to user IDs only for the returned frame and correlations
+    list_users_to_filter = user_item_matrix.users.to_ids(positions)
+    user_corr_dict = dict(zip(list_users_to_filter.tolist(), correlations.tolist()))
     # 4. Recommend movies watched by these users that the selected user hasn't seen
-    final_rec_df = user_item_matrix.loc[list_users_to_filter, :]
-    final_rec_excluded_selected_user_items_df = final_rec_df.T
-    final_rec_excluded_selected_user_items_df = final_rec_excluded_selected_user_items_df[
-        ~final_rec_excluded_selected_user_items_df.index.isin(rated_items)]
-    final_rec_excluded_selected_user_items_df = final_rec_excluded_selected_user_items_df.loc[
-        ~final_rec_excluded_selected_user_items_df.apply(lambda row: row.isnull().all(), axis=1), :]
-    print(f"Step 5: Final recommendations: {final_rec_excluded_selected_user_items_df.shape[0]} items")
-    print("="*50)
+    with span("user_based.exclusion"):
+        final_rec = user_item_matrix.dense_rows(positions)
+        keep_items = ~np.isnan(final_rec).all(axis=0)
+        keep_items[rated_positions] = False
+        if item_mask is not None:
+            keep_items &= item_mask
+        final_rec_excluded_selected_user_items_df = pd.DataFrame(
+            final_rec[:, keep_items].T,
+            index=user_item_matrix.columns[keep_items],
+            columns=list_users_to_filter
+        )
+    debug(f"Step 5: Final recommendations: {final_rec_excluded_selected_user_items_df.shape[0]} items")
+    debug("="*50)
     if return_corrs:
         return final_rec_excluded_selected_user_items_df, user_corr_dict
     else:
         return final_rec_excluded_selected_user_items_df
 
+def profile_similarity_thresholds(num_ratings):
+    """(overlap, correlation) thresholds for a profile with num_ratings ratings (looser for small profiles)"""
+    if num_ratings <= RATING_COUNT_BREAKPOINTS["low"]:
+        level = "low"
+    elif num_ratings <= RATING_COUNT_BREAKPOINTS["medium"]:
+        level = "medium"
+    else:
+        level = "high"
+    return USER_SIMILARITY_OVERLAP_THRESHOLDS[level], USER_CORRELATION_THRESHOLDS[level]
+
+def profile_based_recommendation(user_item_matrix, ratings, perc_threshold_rated_same_products=0.7, corr_threshold=0.5,
+                                 top_n=None, user_index=None, ann_candidates=USER_ANN_CANDIDATES, item_mask=None):
+    """Correlation-weighted ratings of similar users for an ad-hoc profile {item_id: rating}
+
+    The profile is an external query against the shared matrix (nothing is copied),
+    and the weighted average over similar users is one sparse matrix-vector product:
+    score(item) = Σ corr(u) · rating(u, item) / Σ corr(u), over users who rated the item
+    in the numerator and all similar users in the denominator. Unrated movies of the
+    profile that no similar user rated, and items where item_mask (bool per matrix
+    column) is False, are left out.
+    Returns (scores: Series item_id -> score sorted descending, user_corr_dict).
+    """
+    target = np.full(user_item_matrix.shape[1], np.nan)
+    item_positions = user_item_matrix.item_positions(list(ratings.keys()))
+    known = item_positions >= 0
+    target[item_positions[known]] = np.array(list(ratings.values()), dtype=np.float64)[known]
+    positions, correlations, rated_positions = _similar_user_positions(
+        user_item_matrix,
+        target,
+        perc_threshold_rated_same_products,
+        corr_threshold,
+        user_index=user_index,
+        ann_candidates=ann_candidates
+    )
+    if len(positions) == 0:
+        return pd.Series(dtype=float), {}
+    with span("profile.scoring"):
+        weights = np.nan_to_num(correlations, nan=0.0)
+        neighbors = user_item_matrix.csr[positions]
+        total_weight = weights.sum()
+        weighted_sums = neighbors.T @ weights
+        scores = weighted_sums / total_weight if total_weight > 0 else np.zeros_like(weighted_sums)
+    with span("profile.exclusion"):
+        keep_items = np.bincount(neighbors.indices, minlength=user_item_matrix.shape[1]) > 0
+        keep_items[rated_positions] = False
+        if item_mask is not None:
+            keep_items &= item_mask
+        scores = pd.Series(scores[keep_items], index=user_item_matrix.columns[keep_items]).sort_values(ascending=False, kind="stable")
+        if top_n is not None:
+            scores = scores.head(top_n)
+    return scores, dict(zip(user_item_matrix.users.to_ids(positions).tolist(), correlations.tolist()))
+
 def model_based_matrix_factorization(dataframe, index_col="user_id", columns_col="item_id", values_col="rating"):
-    """Train SVD model for matrix factorization"""
-    scale = Reader(rating_scale=(dataframe[values_col].min(),dataframe[values_col].max()))
-    mf_data = Dataset.load_from_df(dataframe[[index_col,columns_col,values_col]], scale)
-    
-    mf_data_final = mf_data.build_full_trainset()
-    svd_model_final = SVD()
-    svd_model_final.fit(mf_data_final)
-    
-    return svd_model_final
+    """Train a biased ALS matrix factorization model (FactorModel) on a ratings frame"""
+    user_item_matrix = create_user_item_matrix(dataframe, index_col=index_col, columns_col=columns_col, values_col=values_col)
+    return train_factor_model(user_item_matrix)
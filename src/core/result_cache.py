@@ -0,0 +1,121 @@
+"""
+Result cache
+Memory-bounded LRU cache of ranked recommendation results, with single-flight
+de-duplication of concurrent identical requests
+"""
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+import pandas as pd
+from src.utils.constants import RESULT_CACHE_MAX_BYTES
+
+
+def profile_key(ratings):
+    """Canonical hash of a {item_id: rating} profile (independent of insertion order)"""
+    canonical = ",".join(f"{int(item_id)}:{float(rating):g}" for item_id, rating in sorted(ratings.items()))
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def _result_size(value):
+    """Approximate bytes held by a cached result"""
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=False))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    return sys.getsizeof(value)
+
+
+class _Flight:
+    """A computation in progress that identical requests wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    """LRU cache bounded by the approximate size of its results
+
+    get_or_compute(key, compute) returns the cached result for `key` or runs
+    `compute()`. While one request computes a key, identical requests wait for its
+    result instead of computing it again (single flight). Results are shared between
+    callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None:
+                    self._put(key, flight.value)
+                del self._in_flight[key]
+            flight.done.set()
+        return flight.value
+
+    def _put(self, key, value):
+        size = _result_size(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every cached result (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,97 @@
+"""
+Title search index
+Trigram inverted index over normalized movie titles for fast substring search
+"""
+import copy
+import numpy as np
+from src.utils.text_utils import normalize_str
+
+NGRAM_SIZE = 3
+
+
+def _ngrams(text):
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class TitleSearchIndex:
+    """One normalized entry per distinct title, ordered by popularity
+
+    Entries are sorted by rating count (descending), so entry positions double as
+    the popularity rank and matches only need to be sorted by position.
+    """
+
+    def __init__(self, titles, popularity):
+        totals = {}
+        for title, count in zip(titles, popularity):
+            if isinstance(title, str):
+                totals[title] = totals.get(title, 0) + count
+        titles, popularity = list(totals), np.array(list(totals.values()))
+        order = np.argsort(-popularity, kind="stable")
+        self.titles = [titles[i] for i in order]
+        self.popularity = popularity[order]
+        self.normalized = [normalize_str(title) for title in self.titles]
+        postings = {}
+        for pos, text in enumerate(self.normalized):
+            for gram in _ngrams(text):
+                postings.setdefault(gram, []).append(pos)
+        self.postings = {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()}
+
+    @classmethod
+    def from_dataframe(cls, dataframe, item_col_name="item_name", item_id_col="item_id"):
+        """Build the index from a ratings frame; popularity is the number of ratings per title"""
+        rating_counts = dataframe[item_id_col].value_counts()
+        items = dataframe.drop_duplicates(subset=item_id_col)
+        return cls(items[item_col_name].tolist(), rating_counts.reindex(items[item_id_col]).to_numpy())
+
+    def with_counts(self, counts):
+        """Copy of the index with extra ratings added ({title: count}), re-ranked
+
+        The n-gram postings are remapped to the new positions instead of being rebuilt.
+        """
+        positions = {title: pos for pos, title in enumerate(self.titles)}
+        popularity = self.popularity.copy()
+        for title, count in counts.items():
+            if title in positions:
+                popularity[positions[title]] += count
+        order = np.argsort(-popularity, kind="stable")
+        rank = np.empty(len(order), dtype=np.int32)
+        rank[order] = np.arange(len(order), dtype=np.int32)
+        updated = copy.copy(self)
+        updated.titles = [self.titles[i] for i in order]
+        updated.popularity = popularity[order]
+        updated.normalized = [self.normalized[i] for i in order]
+        updated.postings = {gram: np.sort(rank[positions]) for gram, positions in self.postings.items()}
+        return updated
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _candidates(self, keyword):
+        """Entry positions that contain every n-gram of the keyword"""
+        grams = _ngrams(keyword)
+        if not grams:
+            return range(len(self.titles))
+        lists = []
+        for gram in grams:
+            positions = self.postings.get(gram)
+            if positions is None:
+                return []
+            lists.append(positions)
+        lists.sort(key=len)
+        candidates = lists[0]
+        for positions in lists[1:]:
+            candidates = np.intersect1d(candidates, positions, assume_unique=True)
+            if len(candidates) == 0:
+                break
+        return candidates
+
+    def search(self, keyword, limit=None):
+        """Titles containing the keyword (normalized substring match), most rated first"""
+        norm_keyword = normalize_str(keyword)
+        matches = []
+        for pos in self._candidates(norm_keyword):
+            if norm_keyword in self.normalized[pos]:
+                matches.append(self.titles[pos])
+                if limit is not None and len(matches) >= limit:
+                    break
+        return matches
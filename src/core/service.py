@@ -0,0 +1,361 @@
+"""
+JSON HTTP service
+Item-similar, user-based and profile-based recommendations as plain JSON for other
+services, built on the core functions (no Gradio)
+
+    GET  /health
+    GET  /stats                                       per-endpoint latency and batch sizes
+    GET  /similar-items?item_id=1&top_n=10&genres=Comedy,Romance&exclude_genres=Horror
+    GET  /user-recommendations?user_id=1&top_n=10&method=factorization
+    POST /profile-recommendations  {"ratings": {"1": 5, "50": 4}, "top_n": 10, "method": "factorization",
+                                    "genres": ["Comedy"], "exclude_genres": []}
+
+Every recommendation endpoint accepts `genres` (keep movies with any of them) and
+`exclude_genres` (drop movies with any of them).
+
+Concurrent requests arriving within SERVICE_BATCH_WINDOW_SECONDS are micro-batched:
+item lookups become one gather from the neighbor index and factor-model requests one
+(users × items) matrix product. method=neighborhood requests are not batched: each one
+filters and correlates its own candidate users, which requests cannot share, so they
+are scored on their request thread.
+"""
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from src.utils.constants import (
+    USER_ANN_ENABLED,
+    SERVICE_HOST,
+    SERVICE_PORT,
+    SERVICE_LISTEN_BACKLOG,
+    SERVICE_BATCH_WINDOW_SECONDS,
+    SERVICE_MAX_BATCH_SIZE,
+    SERVICE_MAX_TOP_N
+)
+from src.utils.instrumentation import span, debug, latency_summary
+from src.core.recommender import (
+    user_based_recommendation,
+    profile_based_recommendation,
+    profile_similarity_thresholds
+)
+from src.core.item_index import get_similar_items
+
+SERVICE_METHODS = ["factorization", "neighborhood"]
+
+
+class _Pending:
+    __slots__ = ("request", "done", "result", "error")
+
+    def __init__(self, request):
+        self.request = request
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Collects requests that arrive within `window` seconds and scores them in one call
+
+    score_batch(requests) returns one result per request; a result that is an
+    Exception is raised to that request's caller only.
+    """
+
+    def __init__(self, score_batch, window=SERVICE_BATCH_WINDOW_SECONDS, max_batch=SERVICE_MAX_BATCH_SIZE):
+        self.score_batch = score_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name="micro-batcher", daemon=True).start()
+
+    def submit(self, request):
+        pending = _Pending(request)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self.score_batch([pending.request for pending in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            self.batches += 1
+            self.requests += len(batch)
+            for pending, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    pending.error = result
+                else:
+                    pending.result = result
+                pending.done.set()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+        }
+
+
+class RecommendationService:
+    """Endpoint logic over a read-only model (matrix, indexes, factor model, catalog)"""
+
+    def __init__(self, user_item_matrix, item_index=None, user_index=None, factor_model=None, catalog=None):
+        self.user_item_matrix = user_item_matrix
+        self.item_index = item_index
+        self.user_index = user_index if USER_ANN_ENABLED else None
+        self.factor_model = factor_model
+        self.catalog = catalog
+        # Genre bitmasks in the item order of each model, aligned once for every request
+        self.matrix_genres = catalog.genre_index.aligned(user_item_matrix.columns) if catalog is not None else None
+        self.factor_genres = (catalog.genre_index.aligned(factor_model.item_ids)
+                              if catalog is not None and factor_model is not None else None)
+        self.batchers = {
+            "similar-items": MicroBatcher(self._similar_items_batch),
+            "user-recommendations": MicroBatcher(self._user_factor_batch),
+            "profile-recommendations": MicroBatcher(self._profile_factor_batch),
+        }
+
+    @classmethod
+    def from_artifacts(cls, artifacts, catalog=None):
+        return cls(artifacts.user_item_matrix, artifacts.item_index, artifacts.user_index,
+                   artifacts.factor_model, catalog)
+
+    # ===========================
+    # RESPONSE HELPERS
+    # ===========================
+
+    def _items(self, scores):
+        """[{item_id, title, score}] from a Series / dict item_id -> score"""
+        return [
+            {
+                "item_id": int(item_id),
+                "title": self.catalog.title(item_id) if self.catalog is not None and item_id in self.catalog else None,
+                "score": round(float(score), 4),
+            }
+            for item_id, score in scores.items()
+        ]
+
+    def _method(self, method):
+        method = method or ("factorization" if self.factor_model is not None else "neighborhood")
+        if method not in SERVICE_METHODS:
+            raise ValueError(f"Unknown method '{method}', expected one of: {', '.join(SERVICE_METHODS)}")
+        if method == "factorization" and self.factor_model is None:
+            raise ValueError("No factor model loaded, use method=neighborhood")
+        return method
+
+    def _genre_mask(self, aligned_genres, include, exclude):
+        """Mask over a model's items (matrix_genres / factor_genres) for the genre filters, None without filters"""
+        if not include and not exclude:
+            return None
+        if aligned_genres is None:
+            raise ValueError("Genre filters need the movie catalog")
+        return aligned_genres.item_mask(include, exclude)
+
+    # ===========================
+    # BATCH SCORING
+    # ===========================
+
+    def _similar_items_batch(self, requests):
+        """Neighbor lists of every indexed item in one gather; genre-filtered and unindexed items one by one"""
+        results = [None] * len(requests)
+        index = self.item_index
+        indexed = [i for i, (item_id, top_n, item_mask) in enumerate(requests)
+                   if index is not None and item_id in index and top_n <= index.top_k and item_mask is None]
+        if indexed:
+            rows = index.items.positions([requests[i][0] for i in indexed])
+            width = max(requests[i][1] for i in indexed)
+            neighbor_idx = index.neighbor_idx[rows, :width]
+            neighbor_scores = index.neighbor_scores[rows, :width]
+            for row, i in enumerate(indexed):
+                top_n = requests[i][1]
+                valid = neighbor_idx[row, :top_n] >= 0
+                results[i] = dict(zip(index.item_ids[neighbor_idx[row, :top_n][valid]].tolist(),
+                                      neighbor_scores[row, :top_n][valid].astype(float).tolist()))
+        for i, (item_id, top_n, item_mask) in enumerate(requests):
+            if results[i] is None:
+                try:
+                    results[i] = get_similar_items(self.user_item_matrix, item_id, top_n, index, item_mask).to_dict()
+                except KeyError:
+                    results[i] = KeyError(f"Movie ID {item_id} not found")
+        return results
+
+    def _user_factor_batch(self, requests):
+        """Factor-model recommendations for several matrix users in one matrix product"""
+        model = self.factor_model
+        positions = model.users.positions([user_id for user_id, _, _ in requests])
+        known = [i for i, pos in enumerate(positions) if pos >= 0]
+        results = [KeyError(f"User ID {user_id} not found") for user_id, _, _ in requests]
+        if not known:
+            return results
+        matrix = self.user_item_matrix
+        excludes = [matrix.columns[matrix.csr[matrix.user_position(requests[i][0])].indices] for i in known]
+        width = max(requests[i][1] for i in known)
+        recommendations = model.recommend_many(
+            model.user_factors[positions[known]], model.user_bias[positions[known]], width, excludes,
+            [requests[i][2] for i in known]
+        )
+        for i, scores in zip(known, recommendations):
+            results[i] = scores.head(requests[i][1])
+        return results
+
+    def _profile_factor_batch(self, requests):
+        """Fold in every profile, then score them all in one matrix product"""
+        model = self.factor_model
+        folded = [model.fold_in(ratings) for ratings, _, _ in requests]
+        width = max(top_n for _, top_n, _ in requests)
+        recommendations = model.recommend_many(
+            [vector for vector, _ in folded], [bias for _, bias in folded], width,
+            [ratings.keys() for ratings, _, _ in requests], [item_mask for _, _, item_mask in requests]
+        )
+        return [scores.head(top_n) for scores, (_, top_n, _) in zip(recommendations, requests)]
+
+    # ===========================
+    # ENDPOINTS
+    # ===========================
+
+    def similar_items(self, item_id, top_n=10, genres=(), exclude_genres=()):
+        item_mask = self._genre_mask(self.matrix_genres, genres, exclude_genres)
+        scores = self.batchers["similar-items"].submit((item_id, top_n, item_mask))
+        return {"item_id": item_id, "recommendations": self._items(scores)}
+
+    def user_recommendations(self, user_id, top_n=10, method=None, genres=(), exclude_genres=()):
+        method = self._method(method)
+        if user_id not in self.user_item_matrix.users:
+            raise KeyError(f"User ID {user_id} not found")
+        if method == "factorization":
+            item_mask = self._genre_mask(self.factor_genres, genres, exclude_genres)
+            scores = self.batchers["user-recommendations"].submit((user_id, top_n, item_mask))
+        else:
+            item_mask = self._genre_mask(self.matrix_genres, genres, exclude_genres)
+            result_df = user_based_recommendation(self.user_item_matrix, None, user_id, user_index=self.user_index,
+                                                  item_mask=item_mask)
+            scores = {} if result_df.empty else result_df.mean(axis=1).sort_values(ascending=False).head(top_n)
+        return {"user_id": user_id, "method": method, "recommendations": self._items(scores)}
+
+    def profile_recommendations(self, ratings, top_n=10, method=None, genres=(), exclude_genres=()):
+        method = self._method(method)
+        if not ratings:
+            raise ValueError("'ratings' must map at least one movie ID to a rating")
+        if method == "factorization":
+            item_mask = self._genre_mask(self.factor_genres, genres, exclude_genres)
+            scores = self.batchers["profile-recommendations"].submit((ratings, top_n, item_mask))
+        else:
+            perc_threshold, corr_threshold = profile_similarity_thresholds(len(ratings))
+            scores, _ = profile_based_recommendation(
+                self.user_item_matrix, ratings, perc_threshold, corr_threshold,
+                top_n=top_n, user_index=self.user_index,
+                item_mask=self._genre_mask(self.matrix_genres, genres, exclude_genres)
+            )
+        return {"method": method, "recommendations": self._items(scores)}
+
+    def stats(self):
+        latency = {name[len("service."):]: stats for name, stats in latency_summary().items()
+                   if name.startswith("service.")}
+        return {"latency": latency, "batching": {name: batcher.stats() for name, batcher in self.batchers.items()}}
+
+    # ===========================
+    # ROUTING
+    # ===========================
+
+    def handle(self, method, path, body=None):
+        """Route one request; returns (HTTP status, JSON-serializable payload)"""
+        url = urlparse(path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        endpoint = url.path.strip("/")
+        with span(f"service.{endpoint}" if endpoint in self.batchers else "service.other"):
+            try:
+                top_n = int(params.get("top_n", (body or {}).get("top_n", 10)))
+                genres = _genre_list(params.get("genres", (body or {}).get("genres")))
+                exclude_genres = _genre_list(params.get("exclude_genres", (body or {}).get("exclude_genres")))
+                if not 1 <= top_n <= SERVICE_MAX_TOP_N:
+                    raise ValueError(f"top_n must be between 1 and {SERVICE_MAX_TOP_N}")
+                if method == "GET" and endpoint == "health":
+                    return 200, {"status": "ok", "users": self.user_item_matrix.shape[0],
+                                 "movies": self.user_item_matrix.shape[1]}
+                if method == "GET" and endpoint == "stats":
+                    return 200, self.stats()
+                if method == "GET" and endpoint == "similar-items":
+                    return 200, self.similar_items(int(params["item_id"]), top_n, genres, exclude_genres)
+                if method == "GET" and endpoint == "user-recommendations":
+                    return 200, self.user_recommendations(int(params["user_id"]), top_n, params.get("method"),
+                                                          genres, exclude_genres)
+                if method == "POST" and endpoint == "profile-recommendations":
+                    body = body or {}
+                    ratings = {int(item_id): float(rating) for item_id, rating in body.get("ratings", {}).items()}
+                    return 200, self.profile_recommendations(ratings, top_n, body.get("method"), genres, exclude_genres)
+                return 404, {"error": f"No endpoint {method} /{endpoint}"}
+            except KeyError as e:
+                missing = e.args[0] if e.args else e
+                if isinstance(missing, str) and missing in ("item_id", "user_id"):
+                    return 400, {"error": f"Missing parameter '{missing}'"}
+                return 404, {"error": str(missing)}
+            except (ValueError, TypeError, AttributeError) as e:
+                return 400, {"error": str(e)}
+            except Exception as e:
+                return 500, {"error": str(e)}
+
+
+def _genre_list(value):
+    """Genre names from a comma-separated query value or a JSON list"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [genre.strip() for genre in value if genre.strip()]
+
+
+def create_server(service, host=SERVICE_HOST, port=SERVICE_PORT):
+    """ThreadingHTTPServer answering with service.handle(); call serve_forever() to run it"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _respond(self, method):
+            body = None
+            if method == "POST":
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError as e:
+                    return self._send(400, {"error": f"Invalid JSON body: {e}"})
+            self._send(*service.handle(method, self.path, body))
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._respond("GET")
+
+        def do_POST(self):
+            self._respond("POST")
+
+        def log_message(self, format, *args):
+            debug(f"🌐 {self.address_string()} {format % args}")
+
+    class Server(ThreadingHTTPServer):
+        request_queue_size = SERVICE_LISTEN_BACKLOG
+
+    return Server((host, port), Handler)
@@ -0,0 +1,178 @@
+"""
+User LSH index
+Random-projection locality-sensitive hashing over mean-centered user rating vectors,
+used to fetch candidate neighbors for user-based recommendations without scanning every user
+"""
+import itertools
+import time
+import numpy as np
+from scipy import sparse
+from src.utils.constants import USER_LSH_TABLES, USER_LSH_BITS, USER_ANN_CANDIDATES
+
+LSH_SEED = 42
+PROJECTION_BLOCK_SIZE = 65536
+MAX_PROBE_RADIUS = 2
+
+
+class UserLSHIndex:
+    """Sign-of-random-projection bucket keys of every user, one per hash table
+
+    projections -> (n_items, tables * bits) float32 random hyperplanes
+    keys        -> (n_users, tables) uint32 bucket key of each user in each table
+    sorted_keys -> (tables, n_users) uint32 bucket keys, ascending per table
+    order       -> (tables, n_users) int32 user positions in sorted_keys order
+
+    Users whose mean-centered rating vectors point in similar directions (the angle
+    Pearson correlation measures) share sign bits, hence buckets, with high probability.
+    """
+
+    def __init__(self, projections, keys, sorted_keys, order):
+        self.projections = np.asarray(projections, dtype=np.float32)
+        self.keys = np.asarray(keys, dtype=np.uint32)
+        self.sorted_keys = np.asarray(sorted_keys, dtype=np.uint32)
+        self.order = np.asarray(order, dtype=np.int32)
+
+    @property
+    def tables(self):
+        return self.keys.shape[1]
+
+    @property
+    def bits(self):
+        return self.projections.shape[1] // self.tables
+
+    @property
+    def n_users(self):
+        return self.keys.shape[0]
+
+    def matches(self, user_item_matrix):
+        """Check that the index covers the users (as a prefix) and items of this matrix"""
+        return self.projections.shape[0] == user_item_matrix.shape[1] and self.n_users <= user_item_matrix.shape[0]
+
+    def _buckets(self, table, keys):
+        """User positions in the given buckets of one table"""
+        starts = np.searchsorted(self.sorted_keys[table], keys, side="left")
+        ends = np.searchsorted(self.sorted_keys[table], keys, side="right")
+        sizes = ends - starts
+        offsets = np.repeat(starts - np.cumsum(sizes) + sizes, sizes)
+        return self.order[table, offsets + np.arange(sizes.sum())]
+
+    def query(self, user_item_matrix, ratings_row, max_candidates=USER_ANN_CANDIDATES):
+        """Positions of up to max_candidates users closest to a 1 × n_items rating row, closest first
+
+        The query's own bucket in every table is read first; while that yields too few
+        users, buckets one then two bits away are probed as well. The fetched users are
+        ranked by the cosine of their mean-centered ratings with the query's, so the
+        work grows with the number of fetched users, not with the user count.
+        """
+        keys = _bucket_keys(_sign_bits(ratings_row, self.projections), self.tables)[0]
+        found = []
+        for radius in range(MAX_PROBE_RADIUS + 1):
+            masks = np.array(
+                [sum(1 << j for j in flipped) for flipped in itertools.combinations(range(self.bits), radius)],
+                dtype=np.uint32
+            )
+            found.extend(self._buckets(t, keys[t] ^ masks) for t in range(self.tables))
+            candidates = np.unique(np.concatenate(found))
+            if len(candidates) >= max_candidates:
+                break
+        query = _center(ratings_row)
+        pool = _center(user_item_matrix.csr[candidates])
+        rows = np.repeat(np.arange(pool.shape[0]), np.diff(pool.indptr))
+        norms = np.sqrt(np.bincount(rows, weights=pool.data.astype(np.float64) ** 2, minlength=pool.shape[0]))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cosine = (pool @ query.T).toarray().ravel() / norms
+        cosine = np.nan_to_num(cosine, nan=-np.inf)
+        return candidates[np.argsort(-cosine, kind="stable")[:max_candidates]]
+
+    def with_users(self, user_item_matrix, user_positions):
+        """Copy of the index with the bucket keys of some users recomputed from the matrix"""
+        user_positions = np.asarray(user_positions, dtype=np.int64)
+        user_positions = user_positions[user_positions < self.n_users]
+        keys = self.keys.copy()
+        if len(user_positions):
+            keys[user_positions] = _bucket_keys(
+                _sign_bits(user_item_matrix.csr[user_positions], self.projections), self.tables
+            )
+        return UserLSHIndex(self.projections, keys, *_sort_buckets(keys))
+
+
+def _center(ratings):
+    """Subtract each user's mean rating from their stored ratings"""
+    ratings = sparse.csr_matrix(ratings, dtype=np.float32, copy=True)
+    counts = np.diff(ratings.indptr)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.asarray(ratings.sum(axis=1)).ravel() / counts
+    ratings.data -= np.repeat(means, counts).astype(np.float32)
+    return ratings
+
+
+def _sign_bits(ratings, projections):
+    """(n_rows, tables * bits) bool sign pattern of the centered rows against the hyperplanes"""
+    ratings = sparse.csr_matrix(ratings)
+    bits = np.empty((ratings.shape[0], projections.shape[1]), dtype=bool)
+    for start in range(0, ratings.shape[0], PROJECTION_BLOCK_SIZE):
+        block = slice(start, start + PROJECTION_BLOCK_SIZE)
+        bits[block] = (_center(ratings[block]) @ projections) >= 0
+    return bits
+
+
+def _bucket_keys(bits, tables):
+    """(n_rows, tables) uint32 bucket key per table from the sign bits"""
+    bits = bits.reshape(bits.shape[0], tables, bits.shape[1] // tables).astype(np.uint32)
+    weights = np.left_shift(np.uint32(1), np.arange(bits.shape[2], dtype=np.uint32))
+    return (bits * weights).sum(axis=2, dtype=np.uint32)
+
+
+def _sort_buckets(keys):
+    order = np.argsort(keys, axis=0, kind="stable").T.astype(np.int32)
+    sorted_keys = np.take_along_axis(keys, order.T, axis=0).T
+    return sorted_keys, order
+
+
+def build_user_lsh_index(user_item_matrix, tables=USER_LSH_TABLES, bits=USER_LSH_BITS, seed=LSH_SEED):
+    """Hash every user of the matrix into `tables` LSH tables of 2**bits buckets (none for an empty matrix)"""
+    if bits > 32:
+        raise ValueError("USER_LSH_BITS must be at most 32")
+    rng = np.random.default_rng(seed)
+    projections = rng.standard_normal((user_item_matrix.shape[1], tables * bits)).astype(np.float32)
+    keys = _bucket_keys(_sign_bits(user_item_matrix.csr, projections), tables)
+    print(f"✅ User LSH index built: {keys.shape[0]} users × {tables} tables of {bits} bits")
+    return UserLSHIndex(projections, keys, *_sort_buckets(keys))
+
+
+def evaluate_user_index(user_item_matrix, user_index, user_ids, max_candidates=USER_ANN_CANDIDATES, verbose=True, **kwargs):
+    """Recall and latency of ANN candidate generation against the exact path
+
+    Recall is recall@k: the share of the exact path's k most correlated similar users
+    (after the overlap and correlation filters, k = min(max_candidates, found)) that the
+    ANN path also returns. Extra keyword arguments go to user_based_recommendation().
+    Nothing is redirected, so it can run next to threads serving requests: the
+    recommendation path only logs through debug(), and verbose=False also leaves out
+    the summary line.
+    """
+    from src.core.recommender import user_based_recommendation
+    found = expected = 0
+    exact_time = ann_time = 0.0
+    for user_id in user_ids:
+        start = time.perf_counter()
+        _, exact = user_based_recommendation(user_item_matrix, None, user_id, return_corrs=True, **kwargs)
+        exact_time += time.perf_counter() - start
+        start = time.perf_counter()
+        _, approx = user_based_recommendation(
+            user_item_matrix, None, user_id, return_corrs=True,
+            user_index=user_index, ann_candidates=max_candidates, **kwargs
+        )
+        ann_time += time.perf_counter() - start
+        top_exact = sorted(exact, key=lambda u: -np.nan_to_num(exact[u], nan=-np.inf))[:max_candidates]
+        expected += len(top_exact)
+        found += len(approx.keys() & set(top_exact))
+    n = max(len(user_ids), 1)
+    report = {
+        "recall": found / expected if expected else 1.0,
+        "exact_ms": exact_time / n * 1000,
+        "ann_ms": ann_time / n * 1000,
+    }
+    if verbose:
+        print(f"📏 User ANN (M={max_candidates}): recall {report['recall']:.3f}, "
+              f"{report['exact_ms']:.1f} ms exact vs {report['ann_ms']:.1f} ms ANN per user")
+    return report
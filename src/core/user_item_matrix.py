@@ -0,0 +1,198 @@
+"""
+Sparse user-item matrix
+Ratings stored in CSR/CSC layout with integer-indexed rows (users) and columns (items)
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from src.core.id_map import IdMap
+
+
+class UserItemMatrix:
+    """Sparse user-item rating matrix
+
+    Only observed ratings are stored, so memory grows with the number of ratings
+    instead of users × items. Rows are kept in CSR layout (fast user access), a CSC
+    copy for fast item access is built on first use. `index`/`columns` hold the user
+    and item IDs in row/column order, mirroring the old pivot_table DataFrame;
+    `users`/`items` (IdMap) turn IDs into row/column positions without pandas.
+    """
+
+    def __init__(self, csr, user_ids, item_ids, users=None, items=None):
+        self.csr = sparse.csr_matrix(csr, dtype=np.float32)
+        self.index = pd.Index(user_ids, name="user_id")
+        self.columns = pd.Index(item_ids, name="item_id")
+        self.users = users if users is not None else IdMap(user_ids)
+        self.items = items if items is not None else IdMap(item_ids)
+        self._csc = None
+
+    @classmethod
+    def from_ratings(cls, user_ids, item_ids, ratings, timestamps=None):
+        """Build the matrix from rating triplets
+
+        A (user, item) pair rated more than once keeps its latest rating: the one with the
+        latest timestamp, or the later row on ties and when no timestamps are given.
+        """
+        user_codes, user_index = pd.factorize(np.asarray(user_ids), sort=True)
+        item_codes, item_index = pd.factorize(np.asarray(item_ids), sort=True)
+        shape = (len(user_index), len(item_index))
+        ratings = np.asarray(ratings, dtype=np.float64)
+        csr = sparse.csr_matrix((ratings, (user_codes, item_codes)), shape=shape)
+        if csr.nnz < len(ratings):
+            # Re-rated cells were summed: rebuild them from the latest row of every cell
+            order = np.arange(len(ratings)) if timestamps is None else np.argsort(np.asarray(timestamps), kind="stable")
+            cells = user_codes[order].astype(np.int64) * shape[1] + item_codes[order]
+            _, last = np.unique(cells[::-1], return_index=True)
+            latest = order[len(order) - 1 - last]
+            csr = sparse.csr_matrix((ratings[latest], (user_codes[latest], item_codes[latest])), shape=shape)
+        return cls(csr, np.asarray(user_index), np.asarray(item_index))
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Convert a dense pivot_table DataFrame (NaN = not rated) into a sparse matrix"""
+        values = frame.to_numpy(dtype=np.float64)
+        rows, cols = np.nonzero(~np.isnan(values))
+        csr = sparse.csr_matrix((values[rows, cols], (rows, cols)), shape=values.shape)
+        return cls(csr, np.asarray(frame.index), np.asarray(frame.columns))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_csc"] = None
+        return state
+
+    @property
+    def shape(self):
+        return self.csr.shape
+
+    @property
+    def nnz(self):
+        return self.csr.nnz
+
+    @property
+    def csc(self):
+        if self._csc is None:
+            self._csc = self.csr.tocsc()
+        return self._csc
+
+    def user_position(self, user_id):
+        return self.users.position(user_id)
+
+    def item_position(self, item_id):
+        return self.items.position(item_id)
+
+    def user_positions(self, user_ids):
+        """Row positions of many users (-1 = not in the matrix)"""
+        return self.users.positions(user_ids)
+
+    def item_positions(self, item_ids):
+        """Column positions of many items (-1 = not in the matrix)"""
+        return self.items.positions(item_ids)
+
+    def user_vector(self, user_id):
+        """Dense ratings of one user over all items (NaN = not rated)"""
+        return self.dense_rows([self.user_position(user_id)])[0]
+
+    def item_vector(self, item_id):
+        """Dense ratings of one item over all users (NaN = not rated)"""
+        pos = self.item_position(item_id)
+        column = np.full(self.shape[0], np.nan)
+        start, end = self.csc.indptr[pos], self.csc.indptr[pos + 1]
+        column[self.csc.indices[start:end]] = self.csc.data[start:end]
+        return column
+
+    def dense_rows(self, user_positions, item_positions=None):
+        """Dense (NaN-filled) block for the given user rows and, optionally, item columns"""
+        block = self.csr[np.asarray(user_positions, dtype=np.int64)]
+        if item_positions is not None:
+            block = block[:, np.asarray(item_positions, dtype=np.int64)]
+        block = block.tocoo()
+        dense = np.full(block.shape, np.nan)
+        dense[block.row, block.col] = block.data
+        return dense
+
+    def to_frame(self, user_ids=None):
+        """Dense DataFrame view of some (or all) users, shaped like the old pivot_table"""
+        if user_ids is None:
+            positions = np.arange(self.shape[0])
+        else:
+            positions = self.user_positions(user_ids)
+        return pd.DataFrame(self.dense_rows(positions), index=self.index[positions], columns=self.columns)
+
+    def overlap_counts(self, item_positions, user_positions=None):
+        """Number of the given items rated by each user (or by the given users only)"""
+        if user_positions is not None:
+            block = self.csr[np.asarray(user_positions, dtype=np.int64)]
+            return block[:, np.asarray(item_positions, dtype=np.int64)].getnnz(axis=1)
+        block = self.csc[:, np.asarray(item_positions, dtype=np.int64)]
+        return np.bincount(block.indices, minlength=self.shape[0])
+
+    def with_user(self, user_id, ratings):
+        """Copy of the matrix with one extra user row built from {item_id: rating}"""
+        cols = self.item_positions(list(ratings.keys())).astype(np.int64)
+        data = np.array(list(ratings.values()), dtype=np.float32)
+        known = cols >= 0
+        cols, data = cols[known], data[known]
+        row = sparse.csr_matrix((data, (np.zeros(len(cols), dtype=np.int64), cols)), shape=(1, self.shape[1]))
+        csr = sparse.vstack([self.csr, row], format="csr")
+        return UserItemMatrix(csr, np.append(np.asarray(self.index), user_id), np.asarray(self.columns))
+
+    def with_ratings(self, user_ids, item_ids, ratings):
+        """Copy of the matrix with the given cells set; users and items must already exist
+
+        Later ratings of the same (user, item) pair replace earlier ones, within the
+        batch and against the stored matrix. The CSR arrays (and the CSC copy, when it
+        was built) are patched rather than recomputed: stored cells are overwritten
+        and new ones inserted, so no sparse arithmetic or CSC conversion runs over the
+        whole matrix.
+        """
+        rows = self.user_positions(user_ids)
+        cols = self.item_positions(item_ids)
+        if (rows < 0).any() or (cols < 0).any():
+            raise KeyError("with_ratings() only updates users and items already in the matrix")
+        ratings = np.asarray(ratings, dtype=np.float32)
+        # Keep the last occurrence of every cell
+        cells = rows.astype(np.int64) * self.shape[1] + cols
+        _, last = np.unique(cells[::-1], return_index=True)
+        last = len(cells) - 1 - last
+        rows, cols, ratings = rows[last], cols[last], ratings[last]
+        csr = sparse.csr_matrix(_set_cells(self.csr, rows, cols, ratings), shape=self.shape)
+        updated = UserItemMatrix(csr, self.index, self.columns, self.users, self.items)
+        if self._csc is not None:
+            updated._csc = sparse.csc_matrix(_set_cells(self._csc, cols, rows, ratings), shape=self.shape)
+        return updated
+
+
+def _set_cells(compressed, major, minor, values):
+    """(data, indices, indptr) of a sorted CSR/CSC matrix with distinct cells set to values
+
+    major/minor are row/column positions for CSR and column/row positions for CSC.
+    Stored cells are overwritten in a copy of data; new cells are inserted in order,
+    and the index arrays are shared with the input when there are none.
+    """
+    indptr, indices = compressed.indptr, compressed.indices
+    # Stored (major, minor) keys of the touched rows, in storage order (hence sorted)
+    touched = np.unique(major)
+    lengths = indptr[touched + 1] - indptr[touched]
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    slots = np.arange(offsets[-1]) + np.repeat(indptr[touched] - offsets[:-1], lengths)
+    n_minor = compressed.shape[1] if compressed.format == "csr" else compressed.shape[0]
+    stored_keys = np.repeat(touched.astype(np.int64), lengths) * n_minor + indices[slots]
+    keys = major.astype(np.int64) * n_minor + minor
+    found_at = np.searchsorted(stored_keys, keys)
+    found = found_at < len(stored_keys)
+    found[found] = stored_keys[found_at[found]] == keys[found]
+
+    data = np.array(compressed.data)
+    data[slots[found_at[found]]] = values[found]
+    new = ~found
+    if not new.any():
+        return data, indices, indptr
+    # Insertion point: row start plus the stored entries of the row before the new column
+    row_offsets = offsets[np.searchsorted(touched, major[new])]
+    insert_at = indptr[major[new]] + (found_at[new] - row_offsets)
+    order = np.lexsort((minor[new], major[new]))
+    data = np.insert(data, insert_at[order], values[new][order])
+    indices = np.insert(indices, insert_at[order], minor[new][order].astype(indices.dtype))
+    added = np.bincount(major[new], minlength=len(indptr) - 1)
+    indptr = indptr + np.concatenate([[0], np.cumsum(added)]).astype(indptr.dtype)
+    return data, indices, indptr
@@ -3,9 +3,10 @@ Gradio UI for Movie Recommendation System
 Clean interface definition - business logic in handlers.py
 """
 import gradio as gr
-from src.utils.constants import MAX_SIMILAR_MOVIES_TO_SHOW
+from src.utils.constants import MAX_SIMILAR_MOVIES_TO_SHOW, WARM_START_POLL_SECONDS, MOVIE_GENRES
 from src.ui.handlers import (
     initialize_system,
+    get_initialization_status,
     search_movies,
     get_item_based_recommendations,
     get_system_info_handler,
@@ -33,7 +34,11 @@ def create_gradio_app():
         
         # Initialize button
         init_btn = gr.Button("🚀 Click to Initialize System", variant="primary", size="lg")
-        init_btn.click(fn=initialize_system, outputs=init_btn)
+        init_btn.click(fn=initialize_system, outputs=init_btn, concurrency_limit=1)
+        # Follow the background warm start: stage progress on the button until it is ready
+        init_timer = gr.Timer(WARM_START_POLL_SECONDS)
+        init_timer.tick(fn=get_initialization_status, outputs=[init_btn, init_timer], show_progress="hidden")
+        app.load(fn=get_initialization_status, outputs=[init_btn, init_timer], show_progress="hidden")
         
         # Tabs
         with gr.Tabs():
@@ -84,6 +89,9 @@ Item-based recommendations are fast and stable. They’re great for finding movi
                         label="Number of Recommendations"
                     )
                     item_rec_btn = gr.Button("✨ Get Recommendations", variant="primary")
+                with gr.Row():
+                    include_genres_item = gr.Dropdown(MOVIE_GENRES, multiselect=True, label="Only these genres (optional)")
+                    exclude_genres_item = gr.Dropdown(MOVIE_GENRES, multiselect=True, label="Exclude these genres (optional)")
                 
                 item_rec_output = gr.Dataframe(label="Recommendations", interactive=False)
                 
@@ -91,7 +99,7 @@ Item-based recommendations are fast and stable. They’re great for finding movi
                 search_btn.click(fn=search_movies, inputs=search_input, outputs=search_output)
                 item_rec_btn.click(
                     fn=get_item_based_recommendations,
-                    inputs=[search_output, top_n_item],
+                    inputs=[search_output, top_n_item, include_genres_item, exclude_genres_item],
                     outputs=item_rec_output
                 )
             
@@ -165,11 +173,16 @@ User-based recommendations are more personal and can introduce you to unexpected
                 with gr.Row():
                     top_n_personalized = gr.Slider(minimum=5, maximum=20, value=10, step=1, label="Number of Recommendations")
                     rec_btn = gr.Button("✨ Get My Recommendations", variant="primary", size="lg")
+                with gr.Row():
+                    include_genres_personalized = gr.Dropdown(MOVIE_GENRES, multiselect=True, label="Only these genres (optional)")
+                    exclude_genres_personalized = gr.Dropdown(MOVIE_GENRES, multiselect=True, label="Exclude these genres (optional)")
                 
                 personalized_output = gr.Dataframe(label="Your Personalized Recommendations", interactive=False)
                 
                 # Hidden state to store similar movie IDs
                 similar_ids = [gr.State(None) for _ in range(MAX_SIMILAR_MOVIES_TO_SHOW)]
+                # This session's {movie_id: rating} profile
+                user_ratings = gr.State({})
                 
                 # Collect all outputs for similar movies display
                 similar_outputs = [profile_output, profile_warning]
@@ -178,6 +191,7 @@ User-based recommendations are more personal and can introduce you to unexpected
                     similar_outputs.append(info)
                 for state_id in similar_ids:
                     similar_outputs.append(state_id)
+                similar_outputs.append(user_ratings)
                 
                 # Event handlers
                 # Show search results after search
@@ -217,21 +231,25 @@ User-based recommendations are more personal and can introduce you to unexpected
                 rate_btn5.click(fn=update_rating_buttons, inputs=[gr.Number(value=5)], outputs=[rate_btn1, rate_btn2, rate_btn3, rate_btn4, rate_btn5])
 
                 # Connect rating logic to recommendation
-                rate_btn1.click(fn=add_movie_and_show_similar, inputs=[search_results_user, gr.Number(value=1, visible=False)], outputs=similar_outputs)
-                rate_btn2.click(fn=add_movie_and_show_similar, inputs=[search_results_user, gr.Number(value=2, visible=False)], outputs=similar_outputs)
-                rate_btn3.click(fn=add_movie_and_show_similar, inputs=[search_results_user, gr.Number(value=3, visible=False)], outputs=similar_outputs)
-                rate_btn4.click(fn=add_movie_and_show_similar, inputs=[search_results_user, gr.Number(value=4, visible=False)], outputs=similar_outputs)
-                rate_btn5.click(fn=add_movie_and_show_similar, inputs=[search_results_user, gr.Number(value=5, visible=False)], outputs=similar_outputs)
+                rate_btn1.click(fn=add_movie_and_show_similar, inputs=[search_results_user, gr.Number(value=1, visible=False), user_ratings], outputs=similar_outputs)
+                rate_btn2.click(fn=add_movie_and_show_similar, inputs=[search_results_user, gr.Number(value=2, visible=False), user_ratings], outputs=similar_outputs)
+                rate_btn3.click(fn=add_movie_and_show_similar, inputs=[search_results_user, gr.Number(value=3, visible=False), user_ratings], outputs=similar_outputs)
+                rate_btn4.click(fn=add_movie_and_show_similar, inputs=[search_results_user, gr.Number(value=4, visible=False), user_ratings], outputs=similar_outputs)
+                rate_btn5.click(fn=add_movie_and_show_similar, inputs=[search_results_user, gr.Number(value=5, visible=False), user_ratings], outputs=similar_outputs)
                 for i, (row, info, btn1, btn2, btn3, btn4, btn5) in enumerate(similar_movies):
                     for rating, btn in enumerate([btn1, btn2, btn3, btn4, btn5], 1):
                         btn.click(
-                            fn=lambda movie_id, r=rating: add_similar_movie(movie_id, r),
-                            inputs=[similar_ids[i]],
+                            fn=lambda movie_id, ratings, r=rating: add_similar_movie(movie_id, r, ratings),
+                            inputs=[similar_ids[i], user_ratings],
                             outputs=similar_outputs
                         )
                 
-                clear_btn.click(fn=clear_user_profile_handler, outputs=[profile_output, profile_warning] + [row for row, *_ in similar_movies])
-                rec_btn.click(fn=generate_personalized_recommendations, inputs=top_n_personalized, outputs=personalized_output)
+                clear_btn.click(fn=clear_user_profile_handler, outputs=[profile_output, profile_warning] + [row for row, *_ in similar_movies] + [user_ratings])
+                rec_btn.click(
+                    fn=generate_personalized_recommendations,
+                    inputs=[top_n_personalized, user_ratings, include_genres_personalized, exclude_genres_personalized],
+                    outputs=personalized_output
+                )
             
             # Stats & Info Tab
             with gr.Tab("📊 System Stats & Info"):
@@ -265,7 +283,8 @@ View technical details about the dataset and how the recommendation system works
         gr.Markdown(
             """
             ---
-            **Tip:** First run processes and saves data to `dumps/` folder. Next runs load from cache instantly.  
+            **Tip:** The model loads in the background at startup; search works as soon as the catalog is ready.
+            First run processes and saves data to `dumps/` folder. Next runs load from cache instantly.  
             Check terminal for detailed progress.
             """
         )
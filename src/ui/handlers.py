@@ -2,9 +2,10 @@
 UI Handlers for Gradio Application
 Business logic for recommendation operations
 """
+import itertools
+import threading
 import gradio as gr
 import pandas as pd
-from src.utils.data_utils import load_dataset, dataframe_reduction
 from src.utils.constants import (
     USER_RATING_THRESHOLD,
     ITEM_RATED_THRESHOLD,
@@ -12,96 +13,211 @@ from src.utils.constants import (
     MIN_SIMILARITY_THRESHOLD,
     MAX_SIMILAR_MOVIES_TO_SHOW,
     MIN_RATED_MOVIES_FOR_RECOMMENDATIONS,
-    USER_SIMILARITY_OVERLAP_THRESHOLDS,
-    USER_CORRELATION_THRESHOLDS,
-    RATING_COUNT_BREAKPOINTS,
     SIMILARITY_BADGES,
-    PROGRESS_STEPS
+    PROGRESS_STEPS,
+    ITEM_NEIGHBOR_TOP_K,
+    USER_ANN_ENABLED,
+    PERSONALIZED_RECOMMENDER
 )
 from src.core.recommender import (
-    create_user_item_matrix,
     search_item_names_with_keyword,
-    find_item_id_using_name,
-    find_item_name_using_id,
-    user_based_recommendation
+    user_based_recommendation,
+    profile_based_recommendation,
+    profile_similarity_thresholds
 )
-from src.core.cache_manager import save_dumps, load_dumps, dumps_exist
+from src.core.item_index import get_similar_items, aggregate_similar_items
+from src.core.catalog import MovieCatalog
+from src.core.pipeline import build_or_load
+from src.core.ingest import ingest_ratings
+from src.core.result_cache import ResultCache, profile_key
 # New modules
 from src.ui.helpers.profile_manager import get_user_profile, get_profile_warning, clear_user_profile
 from src.ui.helpers.stats import get_system_info
+from src.utils.instrumentation import span, timed, debug
 
-# Global state
+# Shared model
 class AppState:
-    """Global state container"""
-    df = None
+    """Read-only model shared by every session
+
+    Handlers never modify it: each one reads `state` once into a local and works on
+    that snapshot, and initialization swaps in a new AppState (one per stage during
+    the first start, so early stages are usable before the rest is loaded). Per-user
+    data (the {movie_id: rating} profile) lives in each session's gr.State instead,
+    so concurrent sessions can be served in parallel. `version` changes with every
+    initialization and is part of every result cache key.
+    """
+    version = 0
+    movies = None
     user_item_matrix = None
     reduced_df = None
-    user_ratings = {}  # {movie_id: rating} - User's movie ratings for profile
+    item_index = None
+    user_index = None
+    factor_model = None
+    catalog = None
+    matrix_genres = None  # AlignedGenres over the matrix columns
+    factor_genres = None  # AlignedGenres over the factor-model items
+    stats = None  # Build-time dataset statistics (the raw ratings are not kept in memory)
 
 state = AppState()
+_init_lock = threading.Lock()
+# Progress of the current / last initialization, shown on the init button
+status = {"stage": None, "message": "Not initialized", "progress": 0.0, "loading": False, "ready": False, "error": None}
+_model_versions = itertools.count(1)
+# Ranked results shared by all sessions, keyed on the request and the model version
+result_cache = ResultCache()
+
+def _genre_filters(include_genres=None, exclude_genres=None):
+    """Order-independent (include, exclude) genre tuples, part of the result cache keys"""
+    return tuple(sorted(include_genres or ())), tuple(sorted(exclude_genres or ()))
+
+def _genre_mask(aligned_genres, genres):
+    """Mask over a model's items for (include, exclude) genre filters, None when there are none"""
+    return aligned_genres.item_mask(*genres)
+
+def _cached_similar_items(model, item_id, top_n, genres=((), ())):
+    """get_similar_items() through the result cache"""
+    return result_cache.get_or_compute(
+        ("similar_items", item_id, top_n, genres, model.version),
+        lambda: get_similar_items(
+            model.user_item_matrix, item_id, top_n, model.item_index,
+            item_mask=_genre_mask(model.matrix_genres, genres)
+        )
+    )
+
+def _publish(artifacts, catalog):
+    """Swap in a new AppState holding every artifact built so far"""
+    global state
+    model = AppState()
+    model.movies = artifacts.movies
+    model.reduced_df = artifacts.reduced_df
+    model.user_item_matrix = artifacts.user_item_matrix
+    model.item_index = artifacts.item_index
+    model.user_index = artifacts.user_index
+    model.factor_model = artifacts.factor_model
+    model.stats = artifacts.stats
+    model.catalog = catalog
+    model.version = next(_model_versions)
+    if model.user_item_matrix is not None:
+        # Build the lazy CSC copy now rather than racing to build it in parallel requests
+        model.user_item_matrix.csc
+        # Genre bitmasks in each model's item order, aligned once instead of per request
+        model.matrix_genres = catalog.genre_index.aligned(model.user_item_matrix.columns)
+    if model.factor_model is not None:
+        model.factor_genres = catalog.genre_index.aligned(model.factor_model.item_ids)
+    state = model
+    # Results of the previous model can no longer be hit (their keys carry its version)
+    result_cache.clear()
+    return model
+
+def _build_model(report=None):
+    """Build or load the model and swap it in
+
+    Until the system has been ready once, each stage is published as soon as it is
+    done (title search after filtering, item-based results after the matrix, ...).
+    A re-initialization keeps serving the previous complete model until the swap.
+    """
+    def on_report(step, message):
+        status.update(stage=step, message=message, progress=PROGRESS_STEPS[step])
+        if report is not None:
+            report(step, message)
+
+    catalog = None
+    def on_stage(stage, artifacts):
+        nonlocal catalog
+        if stage == "reduced_df":
+            catalog = MovieCatalog.from_movies(artifacts.movies, artifacts.reduced_df)
+        if catalog is not None and not status["ready"] and stage != "stats":
+            _publish(artifacts, catalog)
+
+    # One build at a time; requests keep using the previous model until the swap
+    with _init_lock:
+        status.update(loading=True, error=None, progress=0.0, message="⏳ Initializing...")
+        try:
+            artifacts = build_or_load(report=on_report, on_stage=on_stage)
+            model = _publish(artifacts, catalog)
+        except Exception as e:
+            status.update(loading=False, error=str(e), message=f"❌ Error: {e}")
+            raise
+        status.update(loading=False, ready=True, stage="complete", progress=PROGRESS_STEPS["complete"],
+                      message=f"✅ Ready! {model.user_item_matrix.shape[0]} users, {model.user_item_matrix.shape[1]} movies")
+    return artifacts
+
+def ingest_new_ratings(events):
+    """Add rating events to the model and swap in the updated snapshot
+
+    Requests in flight keep the snapshot they started with; the new one gets a new
+    version, so cached results of the old ratings are not served. Runs under the
+    initialization lock, so an ingestion never races a rebuild or another ingestion.
+    Returns the number of events applied to the model.
+    """
+    with _init_lock:
+        model = state
+        if not status["ready"]:
+            raise RuntimeError(_not_ready_message())
+        artifacts, catalog, applied = ingest_ratings(model, events, model.catalog)
+        _publish(artifacts, catalog)
+    return applied
+
+def _warm_start():
+    try:
+        artifacts = _build_model()
+        print(f"✅ Warm start complete ({', '.join(artifacts.rebuilt) or 'all stages'} {'rebuilt' if artifacts.rebuilt else 'loaded from cache'})")
+    except Exception as e:
+        print(f"❌ Warm start failed: {e}")
+
+def start_warm_start():
+    """Load or build the model in a background thread so the UI is usable right away"""
+    status.update(loading=True, message="⏳ Initializing...")
+    thread = threading.Thread(target=_warm_start, name="warm-start", daemon=True)
+    thread.start()
+    return thread
+
+def _not_ready_message():
+    if status["loading"]:
+        return f"⏳ System is still starting up ({status['message']}), please try again in a moment"
+    return "⚠️ Please initialize the system first!"
+
+def get_initialization_status():
+    """Init button reflecting the warm start; the polling timer stops once it is done"""
+    if status["loading"]:
+        button = gr.Button(value=f"{status['message']} ({status['progress'] * 100:.0f}%)", interactive=False)
+    elif status["error"] is not None:
+        button = gr.Button(value=f"❌ Error: {status['error']} (click to retry)", interactive=True)
+    elif status["ready"]:
+        button = gr.Button(value=status["message"], interactive=False)
+    else:
+        button = gr.Button(value="🚀 Click to Initialize System", interactive=True)
+    return button, gr.Timer(active=status["loading"])
 
 def initialize_system(progress=gr.Progress()):
-    """Initialize the recommendation system"""
+    """Initialize the recommendation system (stages with unchanged inputs load from cache)"""
     gr.Info("⏳ Initializing system, please wait...")
     
-    if dumps_exist():
-        try:
-            progress(0, desc="📦 Loading from cache...")
-            gr.Info("📦 Loading from cache...")
-            state.df, state.reduced_df, state.user_item_matrix = load_dumps()
-            gr.Info("✅ System loaded successfully from cache!")
-            return gr.Button(value="✅ System Ready", interactive=False)
-        except Exception as e:
-            gr.Error(f"❌ Failed to load from cache: {str(e)}")
-            return gr.Button(value=f"❌ Error: {str(e)}", interactive=True)
+    def report(step, message):
+        progress(PROGRESS_STEPS[step], desc=message)
+        gr.Info(message)
     
     try:
         progress(0, desc="⏳ Initializing...")
-        gr.Info("⏳ Starting data initialization...")
-        
-        progress(PROGRESS_STEPS["loading_dataset"], desc="📂 Loading dataset...")
-        gr.Info("📂 Loading dataset...")
-        state.df = load_dataset()
-        state.df.columns = ["user_id", "item_id", "rating", "timestamp", "item_name", "genres"]
-        
-        progress(PROGRESS_STEPS["filtering_data"], desc="🔍 Filtering data...")
-        gr.Info("🔍 Filtering data...")
-        state.reduced_df = dataframe_reduction(
-            state.df, 
-            user_col="user_id", 
-            item_col="item_id",
-            user_rating_threshold=USER_RATING_THRESHOLD, 
-            item_rated_threshold=ITEM_RATED_THRESHOLD
-        )
-        
-        progress(PROGRESS_STEPS["creating_matrix"], desc="🔢 Creating matrix...")
-        gr.Info("🔢 Creating user-item matrix...")
-        state.user_item_matrix = create_user_item_matrix(
-            state.reduced_df,
-            index_col="user_id",
-            columns_col="item_id",
-            values_col="rating"
-        )
-        
-        progress(PROGRESS_STEPS["saving_cache"], desc="💾 Saving to cache...")
-        gr.Info("💾 Saving processed data to cache...")
-        save_dumps(state.df, state.reduced_df, state.user_item_matrix)
+        artifacts = _build_model(report=report)
         
         progress(PROGRESS_STEPS["complete"], desc="✅ Complete!")
-        gr.Info("✅ Initialization complete!")
-        return gr.Button(
-            value=f"✅ Ready! {state.user_item_matrix.shape[0]} users, {state.user_item_matrix.shape[1]} movies",
-            interactive=False
-        )
+        if artifacts.rebuilt:
+            gr.Info(f"✅ Initialization complete! Rebuilt: {', '.join(artifacts.rebuilt)}")
+        else:
+            gr.Info("✅ System loaded successfully from cache!")
+        return gr.Button(value=status["message"], interactive=False)
         
     except Exception as e:
         return gr.Button(value=f"❌ Error: {str(e)}", interactive=True)
 
+@timed("handler.search_movies")
 def search_movies(keyword):
     """Search for movies by keyword or ID"""
-    if state.df is None:
-        gr.Warning("⚠️ Please initialize the system first!")
-        return gr.Radio(choices=[], label="⚠️ Please initialize the system first!")
+    model = state
+    if model.catalog is None:
+        gr.Warning(_not_ready_message())
+        return gr.Radio(choices=[], label=_not_ready_message())
     
     if not keyword or not keyword.strip():
         gr.Warning("⚠️ Please enter a movie name or ID")
@@ -112,9 +228,8 @@ def search_movies(keyword):
     try:
         # Try to parse as ID
         movie_id = int(keyword)
-        movie_data = state.reduced_df[state.reduced_df["item_id"] == movie_id]
-        if not movie_data.empty:
-            movie_name = movie_data["item_name"].values[0]
+        if movie_id in model.catalog:
+            movie_name = model.catalog.title(movie_id)
             gr.Info(f"✅ Found movie: {movie_name}")
             choices = [(movie_name, str(movie_id))]
             return gr.Radio(choices=choices, label="Search Results", value=str(movie_id))
@@ -124,9 +239,10 @@ def search_movies(keyword):
     except ValueError:
         # Search by name
         movies = search_item_names_with_keyword(
-            state.reduced_df,
+            model.reduced_df,
             item_col_name="item_name",
-            searched_item_name=keyword
+            searched_item_name=keyword,
+            search_index=model.catalog.search_index
         )
         if not movies:
             gr.Warning("⚠️ No movies found matching your search")
@@ -135,11 +251,7 @@ def search_movies(keyword):
         gr.Info(f"🎬 Found {len(movies[:MAX_SEARCH_RESULTS])} movies matching '{keyword}'")
         choices = []
         for movie_name in movies[:MAX_SEARCH_RESULTS]:
-            movie_id = find_item_id_using_name(
-                state.reduced_df,
-                item_col_name="item_name",
-                item_name=movie_name
-            )
+            movie_id = model.catalog.item_id(movie_name)
             choices.append((movie_name, str(movie_id)))
         
         return gr.Radio(
@@ -148,11 +260,13 @@ def search_movies(keyword):
             value=None
         )
 
-def get_item_based_recommendations(movie_input, top_n):
-    """Get item-based recommendations for a movie"""
-    if state.user_item_matrix is None:
-        gr.Warning("⚠️ System not initialized yet")
-        return pd.DataFrame({"Error": ["⚠️ Please initialize the system first!"]})
+@timed("handler.get_item_based_recommendations")
+def get_item_based_recommendations(movie_input, top_n, include_genres=None, exclude_genres=None):
+    """Get item-based recommendations for a movie, optionally restricted by genre"""
+    model = state
+    if model.user_item_matrix is None:
+        gr.Warning(_not_ready_message())
+        return pd.DataFrame({"Error": [_not_ready_message()]})
     
     if not movie_input:
         gr.Warning("⚠️ Please select a movie first")
@@ -163,31 +277,29 @@ def get_item_based_recommendations(movie_input, top_n):
         # Parse movie ID
         try:
             item_id = int(movie_input)
-            movie_name = find_item_name_using_id(state.reduced_df, item_id=item_id)
+            movie_name = model.catalog.title(item_id)
         except (ValueError, TypeError):
             movie_name = movie_input
-            item_id = find_item_id_using_name(
-                state.reduced_df,
-                item_col_name="item_name",
-                item_name=movie_name
-            )
+            item_id = model.catalog.item_id(movie_name)
         
-        # Calculate correlations
-        selected_item = state.user_item_matrix.loc[:, item_id]
-        correlated_items = state.user_item_matrix.corrwith(selected_item).sort_values(ascending=False)[1:top_n+1]
+        # Look up correlations (precomputed index, live fallback)
+        with span("item_based.scoring"):
+            genres = _genre_filters(include_genres, exclude_genres)
+            correlated_items = _cached_similar_items(model, item_id, int(top_n), genres)
         
         # Build results
         ids = []
         names = []
         scores = []
         
-        for rec_item_id, corr_rate in correlated_items.items():
-            rec_item_name = find_item_name_using_id(state.reduced_df, item_id=rec_item_id)
-            ids.append(rec_item_id)
-            names.append(rec_item_name)
-            scores.append(f"{corr_rate*100:.2f}%")
+        with span("item_based.name_lookup"):
+            for rec_item_id, corr_rate in correlated_items.items():
+                rec_item_name = model.catalog.title(rec_item_id)
+                ids.append(rec_item_id)
+                names.append(rec_item_name)
+                scores.append(f"{corr_rate*100:.2f}%")
         
-        selected_name = find_item_name_using_id(state.reduced_df, item_id=item_id)
+        selected_name = model.catalog.title(item_id)
         gr.Info(f"✅ Found {len(ids)} similar movies to '{selected_name}'")
         return pd.DataFrame({"ID": ids, "Movie Name": names, "Score": scores})
     
@@ -195,36 +307,49 @@ def get_item_based_recommendations(movie_input, top_n):
         gr.Error(f"❌ Failed to get recommendations: {str(e)}")
         return pd.DataFrame({"Error": [f"❌ {str(e)}\nSelect a movie from search results."]})
 
-def get_user_based_recommendations(user_id, top_n):
-    """Get user-based recommendations for a user"""
-    if state.user_item_matrix is None:
-        gr.Warning("⚠️ System not initialized yet")
-        return pd.DataFrame({"Error": ["⚠️ Please initialize the system first!"]})
+@timed("handler.get_user_based_recommendations")
+def get_user_based_recommendations(user_id, top_n, include_genres=None, exclude_genres=None):
+    """Get user-based recommendations for a user, optionally restricted by genre"""
+    model = state
+    if model.user_item_matrix is None:
+        gr.Warning(_not_ready_message())
+        return pd.DataFrame({"Error": [_not_ready_message()]})
     
     gr.Info(f"🔍 Finding recommendations for User {user_id}...")
     try:
         user_id = int(user_id)
-        if user_id not in state.user_item_matrix.index:
+        if user_id not in model.user_item_matrix.users:
             gr.Warning(f"⚠️ User ID {user_id} not found in the system")
             return pd.DataFrame({"Error": [f"❌ User ID {user_id} not found."]})
 
         # Get recommendations
-        result_df = user_based_recommendation(state.user_item_matrix, state.reduced_df, user_id)
-        weighted_scores = result_df.mean(axis=1).sort_values(ascending=False).head(top_n)
+        genres = _genre_filters(include_genres, exclude_genres)
+        def compute():
+            result_df = user_based_recommendation(
+                model.user_item_matrix,
+                model.reduced_df,
+                user_id,
+                user_index=model.user_index if USER_ANN_ENABLED else None,
+                item_mask=_genre_mask(model.matrix_genres, genres)
+            )
+            with span("user_based.scoring"):
+                return result_df.mean(axis=1).sort_values(ascending=False).head(top_n)
+        weighted_scores = result_cache.get_or_compute(("user_based", user_id, int(top_n), genres, model.version), compute)
 
         # For each recommended movie, show the raw (unnormalized) predicted rating as 'X.XX / 5'
         ids = []
         names = []
         scores = []
         raw_ratings = []
-        for rec_item_id, score in weighted_scores.items():
-            rec_item_name = find_item_name_using_id(state.reduced_df, item_id=rec_item_id)
-            ids.append(rec_item_id)
-            names.append(rec_item_name)
-            scores.append(f"{score:.2f}")
-            # Clamp to [0, 5] for display, but show decimals
-            display_rating = max(0, min(score, 5))
-            raw_ratings.append(f"{display_rating:.2f} / 5")
+        with span("user_based.name_lookup"):
+            for rec_item_id, score in weighted_scores.items():
+                rec_item_name = model.catalog.title(rec_item_id)
+                ids.append(rec_item_id)
+                names.append(rec_item_name)
+                scores.append(f"{score:.2f}")
+                # Clamp to [0, 5] for display, but show decimals
+                display_rating = max(0, min(score, 5))
+                raw_ratings.append(f"{display_rating:.2f} / 5")
 
         df = pd.DataFrame({
             "ID": ids,
@@ -243,8 +368,10 @@ def get_user_based_recommendations(user_id, top_n):
         return pd.DataFrame({"Error": [f"❌ {str(e)}"]})
 
 def get_system_info_handler():
+    if state.stats is None:
+        return _not_ready_message()
     gr.Info("📊 System statistics refreshed")
-    return get_system_info(state, USER_RATING_THRESHOLD, ITEM_RATED_THRESHOLD)
+    return get_system_info(state, USER_RATING_THRESHOLD, ITEM_RATED_THRESHOLD, result_cache.stats())
 
 # ============================================================================
 # NEW USER-BASED RECOMMENDATION FUNCTIONS
@@ -258,32 +385,41 @@ def get_similarity_badge(similarity_pct):
             return badge_info["text"], badge_info["color"]
     return SIMILARITY_BADGES["weak"]["text"], SIMILARITY_BADGES["weak"]["color"]
 
-def add_movie_and_show_similar(movie_id, rating):
-    """Add movie to profile and show similar movies in component slots"""
+@timed("handler.add_movie_and_show_similar")
+def add_movie_and_show_similar(movie_id, rating, user_ratings=None):
+    """Add movie to the session profile and show similar movies in component slots
+
+    Returns the component outputs followed by the updated profile for the session's gr.State.
+    """
+    model = state
+    user_ratings = dict(user_ratings or {})
     if not movie_id or not rating:
         gr.Warning("⚠️ Please select a movie and rating first")
-        outputs = [get_user_profile(state.user_ratings, state.reduced_df), get_profile_warning(state.user_ratings)]
+        outputs = [get_user_profile(user_ratings, model.catalog), get_profile_warning(user_ratings)]
         for _ in range(MAX_SIMILAR_MOVIES_TO_SHOW):
             outputs.append(gr.Row(visible=False))
             outputs.append("")
         outputs.extend([None] * MAX_SIMILAR_MOVIES_TO_SHOW)
+        outputs.append(user_ratings)
         return outputs
     
     try:
+        if model.user_item_matrix is None:
+            raise RuntimeError(_not_ready_message())
         movie_id = int(movie_id)
         rating = float(rating)
         
         # Add to profile
-        state.user_ratings[movie_id] = rating
-        movie_name = find_item_name_using_id(state.reduced_df, item_id=movie_id)
+        user_ratings[movie_id] = rating
+        movie_name = model.catalog.title(movie_id)
         
         # Get similar movies (max from constant)
-        selected_item = state.user_item_matrix.loc[:, movie_id]
-        correlated_items = state.user_item_matrix.corrwith(selected_item).sort_values(ascending=False)[1:MAX_SIMILAR_MOVIES_TO_SHOW+1]
+        with span("similar_movies.scoring"):
+            correlated_items = _cached_similar_items(model, movie_id, MAX_SIMILAR_MOVIES_TO_SHOW)
         
         gr.Info(f"✅ Added '{movie_name}' with {rating}⭐ rating to your profile")
-        profile = get_user_profile(state.user_ratings, state.reduced_df)
-        profile_warning = get_profile_warning(state.user_ratings)
+        profile = get_user_profile(user_ratings, model.catalog)
+        profile_warning = get_profile_warning(user_ratings)
         
         outputs = [profile, profile_warning]
         
@@ -291,221 +427,235 @@ def add_movie_and_show_similar(movie_id, rating):
         similar_list = list(correlated_items.items())
         ids = []
         
-        for i in range(MAX_SIMILAR_MOVIES_TO_SHOW):
-            if i < len(similar_list):
-                rec_item_id, corr_rate = similar_list[i]
-                rec_item_name = find_item_name_using_id(state.reduced_df, item_id=rec_item_id)
-                similarity_pct = corr_rate * 100
+        with span("similar_movies.html_rendering"):
+            for i in range(MAX_SIMILAR_MOVIES_TO_SHOW):
+                if i < len(similar_list):
+                    rec_item_id, corr_rate = similar_list[i]
+                    rec_item_name = model.catalog.title(rec_item_id)
+                    similarity_pct = corr_rate * 100
                 
-                # Skip if below threshold
-                if similarity_pct < MIN_SIMILARITY_THRESHOLD:
-                    continue
+                    # Skip if below threshold
+                    if similarity_pct < MIN_SIMILARITY_THRESHOLD:
+                        continue
                 
-                # Get badge and color from constants
-                badge, color = get_similarity_badge(similarity_pct)
+                    # Get badge and color from constants
+                    badge, color = get_similarity_badge(similarity_pct)
                 
-                # Create progress bar
-                progress_width = int(similarity_pct)
-                movie_html = f"""<div style='display: flex; align-items: center; justify-content: space-between; gap: 10px;'>
-                <span style='flex: 1; font-weight: 700; font-size: 15px;'>{rec_item_name}</span>
-                    <div style='display: flex; flex-direction: column; align-items: flex-end; min-width: 140px;'>
-                        <div style='display: flex; align-items: center; gap: 5px; margin-bottom: 2px;'>
-                            <span style='font-size: 0.75rem; color: #666;'>Match: {similarity_pct:.1f}%</span>
-                            <span style='font-size: 0.7rem; padding: 1px 6px; background: {color}; color: white; border-radius: 3px;'>{badge}</span>
-                        </div>
-                        <div style='width: 100px; height: 4px; background: #e5e7eb; border-radius: 2px; overflow: hidden;'>
-                            <div style='width: {progress_width}%; height: 100%; background: {color};'></div>
+                    # Create progress bar
+                    progress_width = int(similarity_pct)
+                    movie_html = f"""<div style='display: flex; align-items: center; justify-content: space-between; gap: 10px;'>
+                    <span style='flex: 1; font-weight: 700; font-size: 15px;'>{rec_item_name}</span>
+                        <div style='display: flex; flex-direction: column; align-items: flex-end; min-width: 140px;'>
+                            <div style='display: flex; align-items: center; gap: 5px; margin-bottom: 2px;'>
+                                <span style='font-size: 0.75rem; color: #666;'>Match: {similarity_pct:.1f}%</span>
+                                <span style='font-size: 0.7rem; padding: 1px 6px; background: {color}; color: white; border-radius: 3px;'>{badge}</span>
+                            </div>
+                            <div style='width: 100px; height: 4px; background: #e5e7eb; border-radius: 2px; overflow: hidden;'>
+                                <div style='width: {progress_width}%; height: 100%; background: {color};'></div>
+                            </div>
                         </div>
-                    </div>
-                </div>"""
+                    </div>"""
                 
-                outputs.append(gr.Row(visible=True))  # Show row
-                outputs.append(movie_html)  # Movie info with HTML
-                ids.append(int(rec_item_id))
-            else:
-                outputs.append(gr.Row(visible=False))  # Hide row
-                outputs.append("")  # Empty info
-                ids.append(None)
+                    outputs.append(gr.Row(visible=True))  # Show row
+                    outputs.append(movie_html)  # Movie info with HTML
+                    ids.append(int(rec_item_id))
+                else:
+                    outputs.append(gr.Row(visible=False))  # Hide row
+                    outputs.append("")  # Empty info
+                    ids.append(None)
         
         # Add IDs as state values
         outputs.extend(ids)
-        
+        outputs.append(user_ratings)
         return outputs
         
     except Exception as e:
         gr.Error(f"❌ Failed to add movie: {str(e)}")
-        outputs = [get_user_profile(state.user_ratings, state.reduced_df), get_profile_warning(state.user_ratings)]
+        outputs = [get_user_profile(user_ratings, model.catalog), get_profile_warning(user_ratings)]
         for _ in range(MAX_SIMILAR_MOVIES_TO_SHOW):
             outputs.append(gr.Row(visible=False))
             outputs.append("")
         outputs.extend([None] * MAX_SIMILAR_MOVIES_TO_SHOW)
+        outputs.append(user_ratings)
         return outputs
 
-def add_similar_movie(movie_id, rating):
-    """Add similar movie to profile and refresh similar movies list"""
+@timed("handler.add_similar_movie")
+def add_similar_movie(movie_id, rating, user_ratings=None):
+    """Add similar movie to the session profile and refresh similar movies list"""
+    model = state
+    user_ratings = dict(user_ratings or {})
     if movie_id is None or rating is None:
         gr.Warning("⚠️ No movie selected")
-        outputs = ["", get_user_profile(state.user_ratings, state.reduced_df)]
+        outputs = ["", get_user_profile(user_ratings, model.catalog)]
         for _ in range(MAX_SIMILAR_MOVIES_TO_SHOW):
             outputs.append(gr.Row(visible=False))
             outputs.append("")
         outputs.extend([None] * MAX_SIMILAR_MOVIES_TO_SHOW)
+        outputs.append(user_ratings)
         return outputs
     
     try:
+        if model.user_item_matrix is None:
+            raise RuntimeError(_not_ready_message())
         # Add rating
-        state.user_ratings[int(movie_id)] = float(rating)
-        
-        # Get fresh similar movies from all rated movies
-        all_similar = {}
-        for rated_movie_id in state.user_ratings.keys():
-            selected_item = state.user_item_matrix.loc[:, rated_movie_id]
-            correlated_items = state.user_item_matrix.corrwith(selected_item).sort_values(ascending=False)[1:50]
-            
-            for rec_id, corr in correlated_items.items():
-                if rec_id not in state.user_ratings:  # Skip already rated
-                    if rec_id not in all_similar:
-                        all_similar[rec_id] = corr
-                    else:
-                        all_similar[rec_id] = max(all_similar[rec_id], corr)
+        user_ratings[int(movie_id)] = float(rating)
         
-        # Sort and get top candidates
-        sorted_similar = sorted(all_similar.items(), key=lambda x: x[1], reverse=True)
-        
-        # Filter out items below threshold and get top movies
-        filtered_similar = [(id, corr) for id, corr in sorted_similar if corr * 100 >= MIN_SIMILARITY_THRESHOLD][:MAX_SIMILAR_MOVIES_TO_SHOW]
+        # Get fresh similar movies from all rated movies (one batched max over their neighbor lists)
+        with span("similar_movies.scoring"):
+            similar = result_cache.get_or_compute(
+                ("similar_to_profile", profile_key(user_ratings), MAX_SIMILAR_MOVIES_TO_SHOW, model.version),
+                lambda: aggregate_similar_items(
+                    model.user_item_matrix,
+                    user_ratings.keys(),
+                    MAX_SIMILAR_MOVIES_TO_SHOW,
+                    model.item_index,
+                    top_k=ITEM_NEIGHBOR_TOP_K,
+                    exclude_item_ids=user_ratings.keys()
+                )
+            )
+            # Filter out items below threshold
+            filtered_similar = [(id, corr) for id, corr in similar.items() if corr * 100 >= MIN_SIMILARITY_THRESHOLD]
         
-        movie_name = find_item_name_using_id(state.reduced_df, item_id=movie_id)
+        movie_name = model.catalog.title(movie_id)
         gr.Info(f"✅ Rated '{movie_name}' and refreshed recommendations")
-        profile = get_user_profile(state.user_ratings, state.reduced_df)
-        profile_warning = get_profile_warning(state.user_ratings)
+        profile = get_user_profile(user_ratings, model.catalog)
+        profile_warning = get_profile_warning(user_ratings)
         
         outputs = [profile, profile_warning]
         ids = []
         
-        for i in range(MAX_SIMILAR_MOVIES_TO_SHOW):
-            if i < len(filtered_similar):
-                rec_item_id, corr_rate = filtered_similar[i]
-                rec_item_name = find_item_name_using_id(state.reduced_df, item_id=rec_item_id)
-                similarity_pct = corr_rate * 100
+        with span("similar_movies.html_rendering"):
+            for i in range(MAX_SIMILAR_MOVIES_TO_SHOW):
+                if i < len(filtered_similar):
+                    rec_item_id, corr_rate = filtered_similar[i]
+                    rec_item_name = model.catalog.title(rec_item_id)
+                    similarity_pct = corr_rate * 100
                 
-                # Get badge and color from constants
-                badge, color = get_similarity_badge(similarity_pct)
+                    # Get badge and color from constants
+                    badge, color = get_similarity_badge(similarity_pct)
                 
-                # Create progress bar
-                progress_width = int(similarity_pct)
-                movie_html = f"""<div style='display: flex; align-items: center; justify-content: space-between; gap: 10px;'>
-                    <span style='flex: 1; font-weight: 700; font-size: 15px;'>{rec_item_name}</span>
-                    <div style='display: flex; flex-direction: column; align-items: flex-end; min-width: 140px;'>
-                        <div style='display: flex; align-items: center; gap: 5px; margin-bottom: 2px;'>
-                            <span style='font-size: 0.75rem; color: #666;'>Match: {similarity_pct:.1f}%</span>
-                            <span style='font-size: 0.7rem; padding: 1px 6px; background: {color}; color: white; border-radius: 3px;'>{badge}</span>
+                    # Create progress bar
+                    progress_width = int(similarity_pct)
+                    movie_html = f"""<div style='display: flex; align-items: center; justify-content: space-between; gap: 10px;'>
+                        <span style='flex: 1; font-weight: 700; font-size: 15px;'>{rec_item_name}</span>
+                        <div style='display: flex; flex-direction: column; align-items: flex-end; min-width: 140px;'>
+                            <div style='display: flex; align-items: center; gap: 5px; margin-bottom: 2px;'>
+                                <span style='font-size: 0.75rem; color: #666;'>Match: {similarity_pct:.1f}%</span>
+                                <span style='font-size: 0.7rem; padding: 1px 6px; background: {color}; color: white; border-radius: 3px;'>{badge}</span>
+                            </div>
+                            <div style='width: 100px; height: 4px; background: #e5e7eb; border-radius: 2px; overflow: hidden;'>
+                                <div style='width: {progress_width}%; height: 100%; background: {color};'></div>
+                            </div>
                         </div>
-                        <div style='width: 100px; height: 4px; background: #e5e7eb; border-radius: 2px; overflow: hidden;'>
-                            <div style='width: {progress_width}%; height: 100%; background: {color};'></div>
-                        </div>
-                    </div>
-                </div>"""
+                    </div>"""
                 
-                outputs.append(gr.Row(visible=True))
-                outputs.append(movie_html)
-                ids.append(int(rec_item_id))
-            else:
-                outputs.append(gr.Row(visible=False))
-                outputs.append("")
-                ids.append(None)
+                    outputs.append(gr.Row(visible=True))
+                    outputs.append(movie_html)
+                    ids.append(int(rec_item_id))
+                else:
+                    outputs.append(gr.Row(visible=False))
+                    outputs.append("")
+                    ids.append(None)
         
         outputs.extend(ids)
+        outputs.append(user_ratings)
         return outputs
         
     except Exception as e:
         gr.Error(f"❌ Failed to rate movie: {str(e)}")
-        outputs = [get_user_profile(state.user_ratings, state.reduced_df), get_profile_warning(state.user_ratings)]
+        outputs = [get_user_profile(user_ratings, model.catalog), get_profile_warning(user_ratings)]
         for _ in range(MAX_SIMILAR_MOVIES_TO_SHOW):
             outputs.append(gr.Row(visible=False))
             outputs.append("")
         outputs.extend([None] * MAX_SIMILAR_MOVIES_TO_SHOW)
+        outputs.append(user_ratings)
         return outputs
 
 def clear_user_profile_handler():
-    clear_user_profile(state)
+    model = state
+    user_ratings = clear_user_profile()
     gr.Info("🗑️ Profile cleared successfully")
-    outputs = [get_user_profile(state.user_ratings, state.reduced_df), get_profile_warning(state.user_ratings)]
+    outputs = [get_user_profile(user_ratings, model.catalog), get_profile_warning(user_ratings)]
     outputs.extend([gr.Row(visible=False)] * MAX_SIMILAR_MOVIES_TO_SHOW)
+    outputs.append(user_ratings)
     return outputs
 
-def get_profile_warning_handler():
-    return get_profile_warning(state.user_ratings)
+def get_profile_warning_handler(user_ratings):
+    return get_profile_warning(user_ratings)
+
+def get_user_profile_handler(user_ratings):
+    model = state
+    return get_user_profile(user_ratings, model.catalog)
 
-def get_user_profile_handler():
-    return get_user_profile(state.user_ratings, state.reduced_df)
+def _neighborhood_personalized_scores(model, user_ratings, top_n, item_mask=None):
+    """Correlation-weighted ratings of similar users for the profile (None if no similar users)"""
+    perc_threshold, corr_threshold = profile_similarity_thresholds(len(user_ratings))
+    # The profile is scored against the shared matrix as a query vector, no copy of the matrix
+    weighted_scores, _ = profile_based_recommendation(
+        model.user_item_matrix,
+        user_ratings,
+        perc_threshold_rated_same_products=perc_threshold,
+        corr_threshold=corr_threshold,
+        top_n=top_n * 2,
+        user_index=model.user_index if USER_ANN_ENABLED else None,
+        item_mask=item_mask
+    )
+    if weighted_scores.empty:
+        return None
+    return weighted_scores
 
-def generate_personalized_recommendations(top_n=10):
-    """Generate recommendations based on user's ratings"""
-    if len(state.user_ratings) < MIN_RATED_MOVIES_FOR_RECOMMENDATIONS:
-        gr.Warning(f"⚠️ Please rate at least {MIN_RATED_MOVIES_FOR_RECOMMENDATIONS} movies (currently {len(state.user_ratings)})")
-        return pd.DataFrame({"Message": [f"⚠️ Please rate at least {MIN_RATED_MOVIES_FOR_RECOMMENDATIONS} movies for better recommendations (currently {len(state.user_ratings)})"]})
+@timed("handler.generate_personalized_recommendations")
+def generate_personalized_recommendations(top_n=10, user_ratings=None, include_genres=None, exclude_genres=None):
+    """Generate recommendations based on the session's ratings, optionally restricted by genre"""
+    model = state
+    user_ratings = user_ratings or {}
+    if model.user_item_matrix is None:
+        gr.Warning(_not_ready_message())
+        return pd.DataFrame({"Message": [_not_ready_message()]})
+    if len(user_ratings) < MIN_RATED_MOVIES_FOR_RECOMMENDATIONS:
+        gr.Warning(f"⚠️ Please rate at least {MIN_RATED_MOVIES_FOR_RECOMMENDATIONS} movies (currently {len(user_ratings)})")
+        return pd.DataFrame({"Message": [f"⚠️ Please rate at least {MIN_RATED_MOVIES_FOR_RECOMMENDATIONS} movies for better recommendations (currently {len(user_ratings)})"]})
     
-    gr.Info(f"⏳ Generating personalized recommendations from your {len(state.user_ratings)} ratings...")
-    import pandas as pd
+    gr.Info(f"⏳ Generating personalized recommendations from your {len(user_ratings)} ratings...")
     try:
-        # Create fake user row
-        fake_user_id = -1  # Negative ID for fake user
-        user_row = pd.Series(index=state.user_item_matrix.columns, dtype=float)
-        for movie_id, rating in state.user_ratings.items():
-            if movie_id in user_row.index:
-                user_row[movie_id] = rating
-        temp_matrix = state.user_item_matrix.copy()
-        temp_matrix.loc[fake_user_id] = user_row
-        num_ratings = len(state.user_ratings)
-        if num_ratings <= RATING_COUNT_BREAKPOINTS["low"]:
-            perc_threshold = USER_SIMILARITY_OVERLAP_THRESHOLDS["low"]
-            corr_threshold = USER_CORRELATION_THRESHOLDS["low"]
-        elif num_ratings <= RATING_COUNT_BREAKPOINTS["medium"]:
-            perc_threshold = USER_SIMILARITY_OVERLAP_THRESHOLDS["medium"]
-            corr_threshold = USER_CORRELATION_THRESHOLDS["medium"]
-        else:
-            perc_threshold = USER_SIMILARITY_OVERLAP_THRESHOLDS["high"]
-            corr_threshold = USER_CORRELATION_THRESHOLDS["high"]
-        from src.core.recommender import user_based_recommendation
-        result_df, user_corr_dict = user_based_recommendation(
-            temp_matrix,
-            state.reduced_df,
-            fake_user_id,
-            perc_threshold_rated_same_products=perc_threshold,
-            corr_threshold=corr_threshold,
-            return_corrs=True
-        )
-        if result_df.empty:
+        top_n = int(top_n)
+        use_factors = PERSONALIZED_RECOMMENDER == "factorization" and model.factor_model is not None
+        genres = _genre_filters(include_genres, exclude_genres)
+
+        def compute():
+            with span("personalized.scoring"):
+                if use_factors:
+                    # Fold the profile into the factor model: one dot product over the catalog
+                    item_mask = _genre_mask(model.factor_genres, genres)
+                    return model.factor_model.recommend_for_ratings(user_ratings, top_n * 2, item_mask=item_mask)
+                item_mask = _genre_mask(model.matrix_genres, genres)
+                return _neighborhood_personalized_scores(model, user_ratings, top_n, item_mask)
+        # Identical profiles (in any rating order) share one cached result
+        key = ("personalized", use_factors, profile_key(user_ratings), top_n, genres, model.version)
+        weighted_scores = result_cache.get_or_compute(key, compute)
+        if weighted_scores is None or weighted_scores.empty:
             gr.Warning("⚠️ No recommendations found. Try rating more diverse movies")
             return pd.DataFrame({"Message": ["No recommendations found. Try rating more diverse movies."]})
-        weights = [user_corr_dict.get(uid, 0) if pd.notnull(user_corr_dict.get(uid, 0)) else 0 for uid in result_df.columns]
-        weights = pd.Series(weights, index=result_df.columns)
-        def weighted_avg(row):
-            if weights.sum() > 0:
-                return (row * weights).sum() / weights.sum()
-            else:
-                return 0
-        weighted_scores = result_df.apply(weighted_avg, axis=1).sort_values(ascending=False).head(top_n * 2)
-        print(f"Top 5 weighted scores: {weighted_scores.head().to_dict()}")
-        print("="*50)
+        debug(f"Top 5 weighted scores: {weighted_scores.head().to_dict()}")
+        debug("="*50)
 
         ids = []
         names = []
         match_info = []
         raw_ratings = []
-        for rec_item_id, score in weighted_scores.items():
-            rec_item_name = find_item_name_using_id(state.reduced_df, item_id=rec_item_id)
-            # Clamp to [0, 5] for display, no decimals
-            display_rating = max(0, min(score, 5))
-            match_pct = int(round((display_rating / 5) * 100))
-            if match_pct < MIN_SIMILARITY_THRESHOLD:
-                continue
-            badge, _ = get_similarity_badge(match_pct)
-            ids.append(rec_item_id)
-            names.append(rec_item_name)
-            raw_ratings.append(f"{display_rating:.1f} / 5")
-            match_info.append(f"{match_pct} % {badge}")
+        with span("personalized.name_lookup"):
+            for rec_item_id, score in weighted_scores.items():
+                rec_item_name = model.catalog.title(rec_item_id)
+                # Clamp to [0, 5] for display, no decimals
+                display_rating = max(0, min(score, 5))
+                match_pct = int(round((display_rating / 5) * 100))
+                if match_pct < MIN_SIMILARITY_THRESHOLD:
+                    continue
+                badge, _ = get_similarity_badge(match_pct)
+                ids.append(rec_item_id)
+                names.append(rec_item_name)
+                raw_ratings.append(f"{display_rating:.1f} / 5")
+                match_info.append(f"{match_pct} % {badge}")
         if len(ids) == 0:
             gr.Warning(f"⚠️ All recommendations were below {MIN_SIMILARITY_THRESHOLD}% match threshold. Try rating more movies")
             return pd.DataFrame({"Message": [f"All recommendations were below {MIN_SIMILARITY_THRESHOLD}% match threshold. Please rate more diverse movies."]})
@@ -515,7 +665,7 @@ def generate_personalized_recommendations(top_n=10):
             "Your Predicted Rating": raw_ratings,
             "Match (%)": match_info
         })
-        gr.Info(f"✨ Generated {len(df)} personalized recommendations based on your {len(state.user_ratings)} ratings")
+        gr.Info(f"✨ Generated {len(df)} personalized recommendations based on your {len(user_ratings)} ratings")
         return df
         
     except Exception as e:
@@ -2,7 +2,6 @@
 Profile management helpers for user ratings and profile display
 """
 import pandas as pd
-from src.core.recommender import find_item_name_using_id
 from src.utils.constants import MIN_RATED_MOVIES_FOR_RECOMMENDATIONS
 
 def get_profile_warning(user_ratings):
@@ -12,7 +11,7 @@ def get_profile_warning(user_ratings):
     else:
         return f"<p style='color: #f59e0b; margin-bottom: 10px;'>⚠️ You need at least {MIN_RATED_MOVIES_FOR_RECOMMENDATIONS} rated movies to get personalized recommendations (currently: {count})</p>"
 
-def get_user_profile(user_ratings, reduced_df):
+def get_user_profile(user_ratings, catalog):
     if not user_ratings:
         return pd.DataFrame({"Message": ["No ratings yet. Search and add movies!"]})
     ids = []
@@ -20,10 +19,10 @@ def get_user_profile(user_ratings, reduced_df):
     ratings = []
     for movie_id, rating in user_ratings.items():
         ids.append(movie_id)
-        names.append(find_item_name_using_id(reduced_df, item_id=movie_id))
+        names.append(catalog.title(movie_id))
         ratings.append(str(int(rating) * "⭐"))
     return pd.DataFrame({"ID": ids, "Movie": names, "Your Rating": ratings})
 
-def clear_user_profile(state):
-    state.user_ratings = {}
-    return state
+def clear_user_profile():
+    """Empty {movie_id: rating} profile for a session"""
+    return {}
@@ -1,38 +1,85 @@
 """
 System statistics helpers
 """
-def get_system_info(state, USER_RATING_THRESHOLD, ITEM_RATED_THRESHOLD):
-    if state.df is None or state.reduced_df is None or state.user_item_matrix is None:
+from datetime import datetime
+from src.utils.instrumentation import latency_summary, timing_enabled
+from src.utils.constants import TIMING_WINDOW, TIMING_THROUGHPUT_SECONDS
+
+def get_latency_info():
+    """Rolling latency percentiles and throughput per handler and stage"""
+    summary = latency_summary()
+    info = [f"\n⏱️ Latency (last {TIMING_WINDOW} calls per span, rate over {TIMING_THROUGHPUT_SECONDS}s):"]
+    if not summary:
+        info.append("   • No requests timed yet" if timing_enabled() else "   • Timing is disabled (TIMING_ENABLED)")
+        return info
+    info.append(f"   {'span':<46}{'calls':>7}{'/s':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, stats in summary.items():
+        info.append(f"   {name:<46}{stats['count']:>7}{stats['per_second']:>7.2f}"
+                    f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+    return info
+
+def get_cache_info(cache_stats):
+    """Size and hit rate of the result cache"""
+    return [
+        "\n🗄️ Result Cache:",
+        f"   • Entries: {cache_stats['entries']:,} ({cache_stats['bytes'] / 1024 ** 2:.1f} / {cache_stats['max_bytes'] / 1024 ** 2:.0f} MB)",
+        f"   • Hits: {cache_stats['hits']:,}, misses: {cache_stats['misses']:,}, coalesced: {cache_stats['coalesced']:,}",
+        f"   • Hit rate: {cache_stats['hit_rate'] * 100:.1f}%, evictions: {cache_stats['evictions']:,}",
+    ]
+
+def _format_histogram(histogram):
+    return ", ".join(f"{rating}⭐ {count:,}" for rating, count in histogram.items())
+
+def _format_degrees(degrees):
+    if not degrees.get("count"):
+        return "n/a"
+    return (f"min {degrees['min']:,}, median {degrees['median']:,.0f}, mean {degrees['mean']:,.1f}, "
+            f"p90 {degrees['p90']:,.0f}, p99 {degrees['p99']:,.0f}, max {degrees['max']:,}")
+
+def get_system_info(state, USER_RATING_THRESHOLD, ITEM_RATED_THRESHOLD, cache_stats=None):
+    """Render the System Stats panel from the build-time statistics (no data scan)"""
+    if state.stats is None:
         return "⚠️ Please initialize the system first!"
+    original, reduced, matrix = state.stats["original"], state.stats["reduced"], state.stats["matrix"]
     info = []
     info.append("=" * 80)
     info.append("📊 SYSTEM INFORMATION")
     info.append("=" * 80)
     info.append(f"\n🎬 Original Dataset:")
-    info.append(f"   • Total ratings: {len(state.df):,}")
-    info.append(f"   • Unique users: {state.df['user_id'].nunique():,}")
-    info.append(f"   • Unique movies: {state.df['item_id'].nunique():,}")
-    from datetime import datetime
-    min_ts = state.df['timestamp'].min()
-    max_ts = state.df['timestamp'].max()
+    info.append(f"   • Total ratings: {original['ratings']:,}")
+    info.append(f"   • Unique users: {original['users']:,}")
+    info.append(f"   • Unique movies: {original['movies']:,}")
+    min_ts = original['min_timestamp']
+    max_ts = original['max_timestamp']
     try:
         min_date = datetime.fromtimestamp(float(min_ts)).strftime('%Y-%m-%d')
         max_date = datetime.fromtimestamp(float(max_ts)).strftime('%Y-%m-%d')
         info.append(f"   • Date range: {min_date} to {max_date}")
     except Exception:
         info.append(f"   • Date range: {min_ts} to {max_ts}")
+    info.append(f"   • Rating histogram: {_format_histogram(original['rating_histogram'])}")
     info.append(f"\n🔍 After Filtering (threshold: {USER_RATING_THRESHOLD} ratings/user, {ITEM_RATED_THRESHOLD} ratings/movie):")
-    info.append(f"   • Filtered ratings: {len(state.reduced_df):,}")
-    info.append(f"   • Active users: {state.reduced_df['user_id'].nunique():,}")
-    info.append(f"   • Popular movies: {state.reduced_df['item_id'].nunique():,}")
+    info.append(f"   • Filtered ratings: {reduced['ratings']:,}")
+    info.append(f"   • Active users: {reduced['users']:,}")
+    info.append(f"   • Popular movies: {reduced['movies']:,}")
     info.append(f"\n🔢 User-Item Matrix:")
-    info.append(f"   • Dimensions: {state.user_item_matrix.shape[0]:,} users × {state.user_item_matrix.shape[1]:,} movies")
-    info.append(f"   • Total cells: {state.user_item_matrix.shape[0] * state.user_item_matrix.shape[1]:,}")
-    info.append(f"   • Sparsity: {(1 - state.user_item_matrix.notna().sum().sum() / (state.user_item_matrix.shape[0] * state.user_item_matrix.shape[1])) * 100:.2f}%")
+    info.append(f"   • Dimensions: {matrix['users']:,} users × {matrix['movies']:,} movies")
+    info.append(f"   • Total cells: {matrix['users'] * matrix['movies']:,}")
+    info.append(f"   • Stored ratings: {matrix['nnz']:,}")
+    info.append(f"   • Sparsity: {matrix['sparsity'] * 100:.2f}%")
+    info.append(f"   • Ratings per user: {_format_degrees(matrix['user_degrees'])}")
+    info.append(f"   • Ratings per movie: {_format_degrees(matrix['item_degrees'])}")
     info.append(f"\n📈 Statistics:")
-    info.append(f"   • Average rating: {state.reduced_df['rating'].mean():.2f}")
-    info.append(f"   • Median rating: {state.reduced_df['rating'].median():.1f}")
-    info.append(f"   • Rating std dev: {state.reduced_df['rating'].std():.2f}")
-    info.append(f"   • Data retention: {(len(state.reduced_df) / len(state.df)) * 100:.2f}%")
+    if reduced['ratings']:
+        info.append(f"   • Average rating: {reduced['rating_mean']:.2f}")
+        info.append(f"   • Median rating: {reduced['rating_median']:.1f}")
+    if reduced['rating_std'] is not None:
+        info.append(f"   • Rating std dev: {reduced['rating_std']:.2f}")
+    info.append(f"   • Rating histogram: {_format_histogram(reduced['rating_histogram'])}")
+    if original['ratings']:
+        info.append(f"   • Data retention: {(reduced['ratings'] / original['ratings']) * 100:.2f}%")
+    if cache_stats is not None:
+        info.extend(get_cache_info(cache_stats))
+    info.extend(get_latency_info())
     info.append("\n" + "=" * 80)
     return "\n".join(info)
@@ -1,4 +1,4 @@
 """Utility functions for data loading and preprocessing"""
-from .data_utils import load_dataset, dataframe_reduction
+from .data_utils import load_dataset, load_ratings, load_movies, dataframe_reduction
 
-__all__ = ['load_dataset', 'dataframe_reduction']
+__all__ = ['load_dataset', 'load_ratings', 'load_movies', 'dataframe_reduction']
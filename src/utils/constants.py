@@ -13,6 +13,26 @@ USER_RATING_THRESHOLD = 50
 ITEM_RATED_THRESHOLD = 1000
 
 
+# ===========================
+# DATA LOADING
+# ===========================
+# Number of ratings.csv rows parsed per chunk by the streaming loader
+RATINGS_CHUNK_SIZE = 1_000_000
+
+# Largest user/movie ID mapped to its row/column through a direct-address int32 table
+# (4 bytes per ID up to the largest one); larger or non-integer IDs use a hash index
+ID_MAP_MAX_TABLE_SIZE = 1 << 24
+
+
+# ===========================
+# INCREMENTAL INGESTION
+# ===========================
+# Rewrite the cached user-item matrix, item-neighbor index, user LSH index and factor
+# model once the ratings replayed on top of them at load time exceed this fraction of
+# the stored ratings
+INGEST_COMPACTION_RATIO = 0.05
+
+
 # ===========================
 # SEARCH & DISPLAY LIMITS
 # ===========================
@@ -32,6 +52,14 @@ MAX_SIMILAR_MOVIES_TO_SHOW = 5
 # Minimum number of rated movies required for personalized recommendations
 MIN_RATED_MOVIES_FOR_RECOMMENDATIONS = 5
 
+# Genres offered by the genre filters (the MovieLens genre vocabulary; the filters
+# themselves use the genres parsed from movies.csv; one no movie has matches nothing)
+MOVIE_GENRES = [
+    "Action", "Adventure", "Animation", "Children", "Comedy", "Crime", "Documentary",
+    "Drama", "Fantasy", "Film-Noir", "Horror", "IMAX", "Musical", "Mystery", "Romance",
+    "Sci-Fi", "Thriller", "War", "Western"
+]
+
 
 # ===========================
 # USER-BASED RECOMMENDATION ALGORITHM PARAMETERS
@@ -61,6 +89,16 @@ RATING_COUNT_BREAKPOINTS = {
 }
 
 
+# ===========================
+# ITEM-NEIGHBOR INDEX
+# ===========================
+# Number of most correlated movies stored per movie in the precomputed index
+ITEM_NEIGHBOR_TOP_K = 50
+
+# Number of movies correlated per block while building the index (bounds peak memory)
+ITEM_NEIGHBOR_BLOCK_SIZE = 256
+
+
 # ===========================
 # SIMILARITY BADGES & COLORS
 # ===========================
@@ -81,6 +119,111 @@ PROGRESS_STEPS = {
     "loading_dataset": 0.2,
     "filtering_data": 0.4,
     "creating_matrix": 0.7,
-    "saving_cache": 0.9,
+    "building_index": 0.75,
+    "building_user_index": 0.85,
+    "training_factors": 0.95,
+    "computing_stats": 0.98,
     "complete": 1.0
 }
+
+
+# ===========================
+# USER ANN INDEX
+# ===========================
+# Fetch user-based neighbor candidates from the LSH index instead of scanning every user
+USER_ANN_ENABLED = False
+
+# Users kept per query before exact Pearson re-ranking (accuracy/latency knob:
+# higher = closer to the exact path, lower = faster)
+USER_ANN_CANDIDATES = 1000
+
+# Users fetched from the index per kept candidate; the surplus absorbs users that
+# fail the overlap filter
+USER_ANN_POOL_FACTOR = 2
+
+# Number of LSH hash tables and sign bits per table (2**bits buckets per table,
+# aim for a few dozen users per bucket)
+USER_LSH_TABLES = 8
+USER_LSH_BITS = 10
+
+
+# ===========================
+# MATRIX FACTORIZATION
+# ===========================
+# Engine behind "Get My Recommendations": "factorization" (fold-in + one dot product
+# over the catalog) or "neighborhood" (user-based collaborative filtering)
+PERSONALIZED_RECOMMENDER = "factorization"
+
+# Latent factors per user/movie, ALS sweeps and L2 penalty (scaled by rating count)
+MF_FACTORS = 20
+MF_ITERATIONS = 10
+MF_REGULARIZATION = 0.05
+
+# Users/movies solved per batch during ALS (bounds peak memory)
+MF_BLOCK_SIZE = 4096
+
+
+# ===========================
+# SERVING
+# ===========================
+# Gradio worker threads handling events in parallel (profiles are per session and the
+# model is read-only, so handlers are safe to run concurrently)
+UI_CONCURRENCY_LIMIT = 8
+
+# Approximate memory held by the LRU cache of ranked results (item neighbors, user-based
+# and personalized scores); emptied whenever the model is rebuilt or reloaded
+RESULT_CACHE_MAX_BYTES = 64 * 1024 ** 2
+
+# Load or build the model in a background thread when app.py starts; each stage is
+# served as soon as it is ready (title search first, then item-based results, ...)
+WARM_START_ENABLED = True
+
+# Seconds between refreshes of the init button while the warm start is running
+WARM_START_POLL_SECONDS = 1.0
+
+
+# JSON HTTP service (serve.py)
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8000
+# Pending connections the socket queues before new ones are refused (the stdlib
+# default of 5 resets clients under bursts of concurrent requests)
+SERVICE_LISTEN_BACKLOG = 128
+
+# Requests arriving within this window are scored together in one vectorized call
+SERVICE_BATCH_WINDOW_SECONDS = 0.005
+SERVICE_MAX_BATCH_SIZE = 64
+
+# Largest top_n a request may ask for
+SERVICE_MAX_TOP_N = 100
+
+
+# ===========================
+# BATCH RECOMMENDATIONS
+# ===========================
+# Users scored per worker task by batch.py
+BATCH_CHUNK_SIZE = 64
+
+# Chunks in flight per worker (bounds memory held by unwritten results)
+BATCH_MAX_PENDING_CHUNKS = 4
+
+# Seconds between throughput reports
+BATCH_PROGRESS_SECONDS = 5
+
+
+# ===========================
+# INSTRUMENTATION
+# ===========================
+# Time hot-path stages and handlers (a no-op context manager per span when off)
+TIMING_ENABLED = True
+
+# Latest samples kept per span for the p50/p95/p99 latency panel
+TIMING_WINDOW = 2048
+
+# Calls per second are counted over this many recent seconds
+TIMING_THROUGHPUT_SECONDS = 60
+
+# Append every span as a JSON line ({"span", "ms", "ts"}) to this file; None = off
+TIMING_EXPORT_PATH = None
+
+# Step-by-step debug prints of the recommendation algorithms
+DEBUG_LOGGING = False
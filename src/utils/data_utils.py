@@ -1,14 +1,76 @@
 """
 Data loading and preprocessing utilities
 """
+import os
+import numpy as np
 import pandas as pd
+from src.utils.constants import RATINGS_CHUNK_SIZE
 
-def load_dataset():
-    """Load movies and ratings datasets and merge them"""
-    movies = pd.read_csv("data/movies.csv")
-    ratings = pd.read_csv("data/ratings.csv")
-    dataframe = ratings.merge(movies, how="left")
-    return dataframe
+# Compact on-disk -> in-memory dtypes for ratings.csv
+RATINGS_DTYPES = {"userId": np.int32, "movieId": np.int32, "rating": np.float32, "timestamp": np.int64}
+RATINGS_COLUMNS = {"userId": "user_id", "movieId": "item_id", "rating": "rating", "timestamp": "timestamp"}
+MOVIES_COLUMNS = {"movieId": "item_id", "title": "item_name", "genres": "genres"}
+
+def _add_counts(counts, ids):
+    """Accumulate per-ID occurrence counts of one chunk into a growing bincount array"""
+    chunk_counts = np.bincount(ids)
+    if len(chunk_counts) > len(counts):
+        counts = np.pad(counts, (0, len(chunk_counts) - len(counts)))
+    counts[:len(chunk_counts)] += chunk_counts
+    return counts
+
+def _counts_to_series(counts):
+    ids = np.flatnonzero(counts)
+    return pd.Series(counts[ids], index=ids, name="count")
+
+def load_ratings(path="data/ratings.csv", chunksize=RATINGS_CHUNK_SIZE):
+    """Stream ratings.csv in chunks with compact dtypes
+
+    Per-user and per-item rating counts are accumulated during the same pass, so the
+    reduction step does not need to rescan the ratings.
+    Returns (ratings, user_counts, item_counts).
+    """
+    columns = {name: [] for name in RATINGS_COLUMNS.values()}
+    user_counts = np.zeros(0, dtype=np.int64)
+    item_counts = np.zeros(0, dtype=np.int64)
+    for chunk in pd.read_csv(path, usecols=list(RATINGS_DTYPES), dtype=RATINGS_DTYPES, chunksize=chunksize):
+        for source, target in RATINGS_COLUMNS.items():
+            columns[target].append(chunk[source].to_numpy())
+        user_counts = _add_counts(user_counts, columns["user_id"][-1])
+        item_counts = _add_counts(item_counts, columns["item_id"][-1])
+    ratings = {}
+    for source, name in RATINGS_COLUMNS.items():
+        # Concatenate one column at a time so peak memory stays close to the final frame
+        chunks = columns.pop(name)
+        ratings[name] = np.concatenate(chunks) if chunks else np.array([], dtype=RATINGS_DTYPES[source])
+        del chunks
+    return pd.DataFrame(ratings, copy=False), _counts_to_series(user_counts), _counts_to_series(item_counts)
+
+def load_movies(path="data/movies.csv"):
+    """Load the per-movie metadata table (item_id, item_name, genres)"""
+    movies = pd.read_csv(path, usecols=list(MOVIES_COLUMNS), dtype={"movieId": np.int32})
+    return movies.rename(columns=MOVIES_COLUMNS)
+
+def load_dataset(chunksize=RATINGS_CHUNK_SIZE, data_dir="data"):
+    """Load ratings (streamed, typed) and movie metadata as separate tables
+
+    Titles and genres are kept once per movie instead of being merged onto every rating.
+    Returns (ratings, movies, user_counts, item_counts).
+    """
+    ratings, user_counts, item_counts = load_ratings(os.path.join(data_dir, "ratings.csv"), chunksize=chunksize)
+    movies = load_movies(os.path.join(data_dir, "movies.csv"))
+    return ratings, movies, user_counts, item_counts
+
+def ratings_frame(events):
+    """Typed ratings frame from a DataFrame or an iterable of (user_id, item_id, rating, timestamp)"""
+    if not isinstance(events, pd.DataFrame):
+        events = pd.DataFrame(list(events), columns=list(RATINGS_COLUMNS.values()))
+    missing = [name for name in RATINGS_COLUMNS.values() if name not in events]
+    if missing:
+        raise ValueError(f"Rating events are missing columns: {', '.join(missing)}")
+    return pd.DataFrame({
+        name: events[name].to_numpy(dtype=RATINGS_DTYPES[source]) for source, name in RATINGS_COLUMNS.items()
+    })
 
 def data_info(dataframe):
     """Display dataframe information"""
@@ -44,23 +106,93 @@ def data_stats(dataframe, user_col="user_id", item_col="item_id", user_rating_th
     print("Product count rated more than", item_rated_threshold, "times: ", m_more_than_threshold,"(", round((m_more_than_threshold / len(product_count))*100,2), " %)")
     print("*"*100)
 
-def dataframe_reduction(dataframe, user_col="user_id", item_col="item_id", user_rating_threshold=30, item_rated_threshold=1000):
-    """Reduce dataframe by removing users and items with low interaction counts"""
-    user_count = pd.DataFrame(dataframe[user_col].value_counts(), columns=["count"])
-    item_count = pd.DataFrame(dataframe[item_col].value_counts(), columns=["count"])
-    
-    items_to_be_removed = item_count[item_count["count"] < item_rated_threshold].index.to_list()
-    users_to_be_removed = user_count[user_count["count"] < user_rating_threshold].index.to_list()
-    
-    reduced_dataframe = dataframe[~dataframe[item_col].isin(items_to_be_removed)]
-    reduced_dataframe = reduced_dataframe[~reduced_dataframe[user_col].isin(users_to_be_removed)]
-    
-    before = len(user_count) * len(item_count)
-    after = len(reduced_dataframe[user_col].value_counts()) * len(reduced_dataframe[item_col].value_counts())
+def _integer_codes(ids, counts=None):
+    """Non-negative integer codes of an ID column and the number of codes
+
+    Non-negative integer IDs (as in MovieLens) are their own codes, so no factorize pass
+    is needed and precomputed per-ID counts can be reused; other IDs are factorized.
+    Returns (codes, n_codes, counts per code or None).
+    """
+    values = ids.to_numpy()
+    if np.issubdtype(values.dtype, np.integer) and (len(values) == 0 or values.min() >= 0):
+        n_codes = int(values.max()) + 1 if len(values) else 0
+        if counts is not None:
+            counts_by_code = np.zeros(n_codes, dtype=np.int64)
+            counts_by_code[counts.index.to_numpy()] = counts.to_numpy()
+            return values, n_codes, counts_by_code
+        return values, n_codes, None
+    codes, uniques = pd.factorize(values)
+    return codes, len(uniques), None
+
+def replaced_ratings(dataframe, user_ids, user_col="user_id", item_col="item_id", time_col="timestamp"):
+    """Row positions of ratings replaced by a newer rating of the same (user, item) pair
+
+    The newest rating has the latest timestamp (the later row on ties). Only the rows of
+    user_ids are searched, e.g. the users of the ingestion log, the only source of
+    re-ratings, so the cost follows their ratings rather than the dataset.
+    """
+    rows = np.flatnonzero(dataframe[user_col].isin(user_ids).to_numpy())
+    subset = dataframe.iloc[rows]
+    order = np.argsort(subset[time_col].to_numpy(), kind="stable")
+    replaced = subset.iloc[order].duplicated([user_col, item_col], keep="last").to_numpy()
+    return rows[order][replaced]
+
+def dataframe_reduction(dataframe, user_col="user_id", item_col="item_id", user_rating_threshold=30, item_rated_threshold=1000,
+                        user_counts=None, item_counts=None, drop_rows=None):
+    """Reduce dataframe to its k-core: every user with at least user_rating_threshold
+    ratings and every item with at least item_rated_threshold ratings
+
+    Dropping items lowers user counts and the reverse, so the filter repeats until no
+    user or item falls below its threshold. Counting is done with np.bincount on integer
+    codes over the shrinking set of kept row positions, and the frame is sliced once at
+    the end. user_counts/item_counts (ID -> number of ratings) can be passed in when
+    already known, e.g. from the streaming loader, to skip the first count.
+    drop_rows (row positions, e.g. from replaced_ratings()) are left out before filtering.
+    """
+    user_codes, n_users, user_count = _integer_codes(dataframe[user_col], user_counts)
+    item_codes, n_items, item_count = _integer_codes(dataframe[item_col], item_counts)
+    if user_count is None:
+        user_count = np.bincount(user_codes, minlength=n_users)
+    if item_count is None:
+        item_count = np.bincount(item_codes, minlength=n_items)
+
+    rows = np.arange(len(dataframe))
+    if drop_rows is not None and len(drop_rows):
+        kept = np.ones(len(dataframe), dtype=bool)
+        kept[drop_rows] = False
+        user_count = user_count - np.bincount(user_codes[~kept], minlength=n_users)
+        item_count = item_count - np.bincount(item_codes[~kept], minlength=n_items)
+        rows, user_codes, item_codes = rows[kept], user_codes[kept], item_codes[kept]
+        print(f"Dropped {len(dataframe) - len(rows):,} ratings replaced by a newer rating")
+    users_before = int(np.count_nonzero(user_count))
+    items_before = int(np.count_nonzero(item_count))
+
+    iteration = 0
+    while True:
+        dropped = (user_count < user_rating_threshold)[user_codes] | (item_count < item_rated_threshold)[item_codes]
+        if not dropped.any():
+            break
+        iteration += 1
+        user_count = user_count - np.bincount(user_codes[dropped], minlength=n_users)
+        item_count = item_count - np.bincount(item_codes[dropped], minlength=n_items)
+        kept = ~dropped
+        rows, user_codes, item_codes = rows[kept], user_codes[kept], item_codes[kept]
+        print(f"k-core iteration {iteration}: removed {int(dropped.sum()):,} ratings, "
+              f"{np.count_nonzero(user_count):,} users * {np.count_nonzero(item_count):,} items left")
+
+    users_after = int(np.count_nonzero(user_count))
+    items_after = int(np.count_nonzero(item_count))
+    reduced_dataframe = dataframe.take(rows)
+
+    before = users_before * items_before
+    after = users_after * items_after
     
-    print("Matrix Size BEFORE reduction:", len(user_count), "*", len(item_count),"=", before)
-    print("Matrix Size AFTER reduction:", len(reduced_dataframe[user_col].value_counts()), "*", len(reduced_dataframe[item_col].value_counts()),"=", after)
-    print("Matrix Size Reduction Rate:", round((before - after)/before, 2)*100, "%")
-    print("Information kept:", round(len(reduced_dataframe)/len(dataframe), 2)*100, "%")
+    print("Matrix Size BEFORE reduction:", users_before, "*", items_before, "=", before)
+    print("Matrix Size AFTER reduction:", users_after, "*", items_after, "=", after)
+    if before:
+        print("Matrix Size Reduction Rate:", round((before - after)/before, 2)*100, "%")
+    if len(dataframe):
+        print("Information kept:", round(len(reduced_dataframe)/len(dataframe), 2)*100, "%")
+    print(f"Converged after {iteration} iteration(s)")
     
     return reduced_dataframe
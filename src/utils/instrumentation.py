@@ -0,0 +1,131 @@
+"""
+Hot-path instrumentation
+Named timing spans with rolling latency percentiles, optional JSON-lines export,
+and debug output that costs nothing unless DEBUG_LOGGING is on
+"""
+import contextlib
+import functools
+import json
+import threading
+import time
+from collections import deque
+import numpy as np
+from src.utils.constants import (
+    DEBUG_LOGGING,
+    TIMING_ENABLED,
+    TIMING_WINDOW,
+    TIMING_THROUGHPUT_SECONDS,
+    TIMING_EXPORT_PATH
+)
+
+_config = {"enabled": TIMING_ENABLED, "debug": DEBUG_LOGGING, "export": None}
+_samples = {}  # span name -> deque of (end time, seconds)
+_lock = threading.Lock()
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def configure(enabled=None, debug_logging=None, export_path=None):
+    """Switch timing / debug output on or off and (re)open the JSON-lines export file"""
+    with _lock:
+        if enabled is not None:
+            _config["enabled"] = enabled
+        if debug_logging is not None:
+            _config["debug"] = debug_logging
+        if export_path is not None:
+            if _config["export"] is not None:
+                _config["export"].close()
+            _config["export"] = open(export_path, "a", buffering=1) if export_path else None
+
+
+def timing_enabled():
+    return _config["enabled"]
+
+
+def debug_enabled():
+    return _config["debug"]
+
+
+def debug(*args):
+    """print() that only runs with DEBUG_LOGGING on"""
+    if _config["debug"]:
+        print(*args)
+
+
+def record(name, seconds, end=None):
+    """Add one duration sample to the rolling window of a span"""
+    end = time.time() if end is None else end
+    samples = _samples.get(name)
+    if samples is None:
+        with _lock:
+            samples = _samples.setdefault(name, deque(maxlen=TIMING_WINDOW))
+    samples.append((end, seconds))
+    export = _config["export"]
+    if export is not None:
+        line = json.dumps({"span": name, "ms": round(seconds * 1000, 3), "ts": round(end, 3)})
+        with _lock:
+            export.write(line + "\n")
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+
+
+def span(name):
+    """Context manager timing a block as `name`; a shared no-op when timing is off"""
+    if not _config["enabled"]:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def timed(name):
+    """Decorator timing every call of a function (e.g. a UI handler) as `name`"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _config["enabled"]:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def latency_summary():
+    """{span name: count, p50/p95/p99 in ms and calls per second} over the rolling window"""
+    now = time.time()
+    summary = {}
+    for name, samples in sorted(_samples.items()):
+        window = np.array(list(samples))
+        if len(window) == 0:
+            continue
+        p50, p95, p99 = np.percentile(window[:, 1], [50, 95, 99]) * 1000
+        recent = int((window[:, 0] >= now - TIMING_THROUGHPUT_SECONDS).sum())
+        summary[name] = {
+            "count": len(window),
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "per_second": recent / TIMING_THROUGHPUT_SECONDS,
+        }
+    return summary
+
+
+def reset_timings():
+    with _lock:
+        _samples.clear()
+
+
+if TIMING_EXPORT_PATH:
+    configure(export_path=TIMING_EXPORT_PATH)
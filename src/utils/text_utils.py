@@ -0,0 +1,11 @@
+"""
+Text normalization helpers
+"""
+import unicodedata
+try:
+    from unidecode import unidecode
+    def normalize_str(s):
+        return unidecode(str(s)).casefold()
+except ImportError:
+    def normalize_str(s):
+        return unicodedata.normalize('NFKD', str(s)).encode('ASCII', 'ignore').decode('utf-8').casefold()
@@ -0,0 +1,39 @@
+"""
+Shared fixtures: a small seeded synthetic MovieLens dataset and the model built from it
+"""
+import shutil
+import pytest
+from benchmarks.synthetic import generate_movielens
+from src.core import pipeline
+from src.core.pipeline import build_in_memory
+
+USER_THRESHOLD = 20
+ITEM_THRESHOLD = 20
+
+
+@pytest.fixture(scope="session")
+def dataset_dir(tmp_path_factory):
+    """movies.csv / ratings.csv of 300 users and 600 movies"""
+    data_dir = tmp_path_factory.mktemp("movielens")
+    generate_movielens(str(data_dir), seed=0, users=300, movies=600, ratings=30_000)
+    return data_dir
+
+
+@pytest.fixture(scope="session")
+def artifacts(dataset_dir):
+    """Every stage built in memory; shared, so tests must not modify it"""
+    return build_in_memory(str(dataset_dir), USER_THRESHOLD, ITEM_THRESHOLD)
+
+
+@pytest.fixture
+def workdir(tmp_path, dataset_dir, monkeypatch):
+    """Empty project directory with the dataset in data/ and no dumps, for the cached pipeline
+
+    The user LSH stage is switched on, so every cached artifact is built.
+    """
+    shutil.copytree(dataset_dir, tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pipeline, "USER_RATING_THRESHOLD", USER_THRESHOLD)
+    monkeypatch.setattr(pipeline, "ITEM_RATED_THRESHOLD", ITEM_THRESHOLD)
+    monkeypatch.setattr(pipeline, "USER_ANN_ENABLED", True)
+    return tmp_path
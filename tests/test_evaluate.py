@@ -0,0 +1,18 @@
+from benchmarks.evaluate import evaluate
+from src.utils import instrumentation
+from src.utils.data_utils import load_dataset
+
+
+def test_evaluate_measures_engines_with_debug_logging_off(dataset_dir, capsys):
+    ratings, _, _, _ = load_dataset(data_dir=str(dataset_dir))
+    instrumentation.configure(debug_logging=True)
+    try:
+        results = evaluate(ratings, ["user_based", "popularity"], n_users=5, processes=1,
+                           user_threshold=20, item_threshold=20)
+        assert instrumentation.debug_enabled()
+    finally:
+        instrumentation.configure(debug_logging=False)
+
+    assert "user_based_recommendation START" not in capsys.readouterr().out
+    for metrics in results["engines"].values():
+        assert metrics["mean_ms"] > 0
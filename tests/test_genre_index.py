@@ -0,0 +1,43 @@
+import numpy as np
+from src.core.catalog import MovieCatalog
+from src.core.service import RecommendationService
+from src.ui import handlers
+
+
+def _catalog(artifacts):
+    return MovieCatalog.from_movies(artifacts.movies, artifacts.reduced_df)
+
+
+def test_aligned_mask_follows_the_genre_strings(artifacts):
+    catalog = _catalog(artifacts)
+    columns = artifacts.user_item_matrix.columns
+    aligned = catalog.genre_index.aligned(columns.to_numpy())
+
+    mask = aligned.item_mask(["Comedy", "Drama"], ["Horror"])
+
+    expected = [any(genre in catalog.genres_of(item_id).split("|") for genre in ("Comedy", "Drama"))
+                and "Horror" not in catalog.genres_of(item_id).split("|") for item_id in columns]
+    assert mask.tolist() == expected
+    assert np.array_equal(mask, catalog.genre_mask(columns, ["Comedy", "Drama"], ["Horror"]))
+    assert aligned.item_mask() is None
+
+
+def test_unknown_genres_match_nothing(artifacts):
+    aligned = _catalog(artifacts).genre_index.aligned(artifacts.user_item_matrix.columns)
+
+    assert not aligned.item_mask(["Not A Genre"]).any()
+    assert np.array_equal(aligned.item_mask(["Comedy", "Not A Genre"]), aligned.item_mask(["Comedy"]))
+    assert aligned.item_mask(exclude=["Not A Genre"]).all()
+
+
+def test_models_carry_their_own_aligned_genres(artifacts, monkeypatch):
+    catalog = _catalog(artifacts)
+    monkeypatch.setattr(handlers, "state", handlers.state)
+    model = handlers._publish(artifacts, catalog)
+    service = RecommendationService.from_artifacts(artifacts, catalog)
+
+    for aligned, item_ids in ((model.matrix_genres, artifacts.user_item_matrix.columns),
+                              (model.factor_genres, artifacts.factor_model.item_ids),
+                              (service.matrix_genres, artifacts.user_item_matrix.columns),
+                              (service.factor_genres, artifacts.factor_model.item_ids)):
+        assert np.array_equal(aligned.bits, catalog.genre_index.bits_for(item_ids))
@@ -0,0 +1,38 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from src.core.id_map import IdMap
+from src.utils.constants import ID_MAP_MAX_TABLE_SIZE
+
+
+@pytest.mark.parametrize("ids", [
+    np.array([-5, 3, 7, -1]),
+    np.array([2, ID_MAP_MAX_TABLE_SIZE + 10, 0]),
+    np.array(["tt0114709", "tt0113497", "tt0113228"]),
+])
+def test_hash_fallback_maps_ids_to_positions(ids):
+    id_map = IdMap(ids)
+
+    assert id_map.lookup is None and id_map.index is not None
+    assert [id_map.position(external_id) for external_id in ids] == list(range(len(ids)))
+    assert id_map.positions(np.concatenate([ids[::-1], ids[:1]])).tolist() == list(range(len(ids)))[::-1] + [0]
+    assert ids[0] in id_map and (99 if ids.dtype.kind == "U" else "unknown") not in id_map
+    with pytest.raises(KeyError):
+        id_map.position(123456789 if ids.dtype.kind == "U" else "unknown")
+    restored = pickle.loads(pickle.dumps(id_map))
+    assert restored.positions(ids).tolist() == list(range(len(ids)))
+
+
+def test_hash_fallback_is_safe_under_concurrent_lookups():
+    ids = np.arange(-2_000, 0) * 7
+    id_map = IdMap(ids)
+    expected = np.arange(len(ids))
+
+    def lookups(seed):
+        order = np.random.default_rng(seed).permutation(len(ids))
+        singles = [id_map.position(external_id) for external_id in ids[order[:200]]]
+        return singles == expected[order[:200]].tolist() and np.array_equal(id_map.positions(ids[order]), order)
+
+    with ThreadPoolExecutor(8) as pool:
+        assert all(pool.map(lookups, range(32)))
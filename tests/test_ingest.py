@@ -0,0 +1,172 @@
+import numpy as np
+import pytest
+from src.core import ingest, pipeline
+from src.core.cache_manager import artifact_meta
+from src.core.catalog import MovieCatalog
+from src.core.dataset_stats import compute_dataset_stats
+from src.core.ingest import ingest_ratings, INGESTED_ARTIFACTS
+from src.ui import handlers
+
+
+def _cell(matrix, user_id, item_id):
+    return matrix.csr[matrix.user_position(user_id), matrix.item_position(item_id)]
+
+
+def _rated_cell(artifacts):
+    """A stored (user_id, item_id, rating, timestamp) rated above half a star"""
+    reduced_df = artifacts.reduced_df
+    row = reduced_df[reduced_df["rating"] > 0.5].iloc[0]
+    return int(row["user_id"]), int(row["item_id"]), float(row["rating"]), int(row["timestamp"])
+
+
+@pytest.mark.parametrize("stage", ["reduced_df", "user_item_matrix"])
+def test_rerating_survives_rebuild(workdir, monkeypatch, stage):
+    artifacts = pipeline.build_or_load()
+    user_id, item_id, rating, timestamp = _rated_cell(artifacts)
+
+    updated, _, applied = ingest_ratings(artifacts, [(user_id, item_id, 0.5, timestamp + 1)])
+    assert applied == 1
+    assert _cell(updated.user_item_matrix, user_id, item_id) == 0.5
+
+    monkeypatch.setitem(pipeline.STAGE_VERSIONS, stage, pipeline.STAGE_VERSIONS[stage] + 1)
+    rebuilt = pipeline.build_or_load()
+    assert stage in rebuilt.rebuilt
+    assert _cell(rebuilt.user_item_matrix, user_id, item_id) == 0.5
+
+
+def test_older_rating_does_not_replace_newer_on_rebuild(workdir, monkeypatch):
+    artifacts = pipeline.build_or_load()
+    user_id, item_id, rating, timestamp = _rated_cell(artifacts)
+
+    # Within a batch the events apply in timestamp order, whatever their order in the batch
+    updated, _, _ = ingest_ratings(
+        artifacts, [(user_id, item_id, 1.0, timestamp + 2), (user_id, item_id, 0.5, timestamp + 1)]
+    )
+    assert _cell(updated.user_item_matrix, user_id, item_id) == 1.0
+
+    monkeypatch.setitem(pipeline.STAGE_VERSIONS, "reduced_df", pipeline.STAGE_VERSIONS["reduced_df"] + 1)
+    rebuilt = pipeline.build_or_load()
+    assert _cell(rebuilt.user_item_matrix, user_id, item_id) == 1.0
+    assert len(rebuilt.reduced_df) == len(updated.reduced_df) - 2
+
+
+def test_from_ratings_keeps_latest_timestamp():
+    from src.core.user_item_matrix import UserItemMatrix
+    matrix = UserItemMatrix.from_ratings([1, 1, 1, 2], [10, 10, 20, 10], [4.0, 2.0, 3.0, 5.0], [5, 3, 1, 1])
+    assert matrix.nnz == 3
+    assert _cell(matrix, 1, 10) == 4.0
+    np.testing.assert_array_equal(matrix.columns, [10, 20])
+
+
+def test_ingest_leaves_the_served_snapshot_untouched(workdir):
+    artifacts = pipeline.build_or_load()
+    catalog = MovieCatalog.from_movies(artifacts.movies, artifacts.reduced_df)
+    user_id, item_id, rating, timestamp = _rated_cell(artifacts)
+    matrix, item_index, factor_model = artifacts.user_item_matrix, artifacts.item_index, artifacts.factor_model
+    popularity = dict(catalog.popularity)
+
+    updated, updated_catalog, _ = ingest_ratings(artifacts, [(user_id, item_id, 0.5, timestamp + 1)], catalog)
+
+    assert artifacts.user_item_matrix is matrix and _cell(matrix, user_id, item_id) == rating
+    assert artifacts.item_index is item_index and artifacts.factor_model is factor_model
+    assert catalog.popularity == popularity
+    assert updated_catalog is not catalog
+    assert updated_catalog.popularity[item_id] == popularity[item_id] + 1
+    assert updated.factor_model is not factor_model
+
+
+def test_ingest_reranks_title_search(workdir):
+    artifacts = pipeline.build_or_load()
+    catalog = MovieCatalog.from_movies(artifacts.movies, artifacts.reduced_df)
+    least_rated = min(catalog.popularity, key=catalog.popularity.get)
+    title = catalog.title(least_rated)
+    events = [(int(user_id), least_rated, 4.0, 2_000_000_000) for user_id in artifacts.user_item_matrix.index]
+
+    _, updated_catalog, _ = ingest_ratings(artifacts, events, catalog)
+
+    assert updated_catalog.search_index.titles.index(title) < catalog.search_index.titles.index(title)
+
+
+def test_ingest_handler_publishes_a_new_snapshot(workdir, monkeypatch):
+    artifacts = pipeline.build_or_load()
+    catalog = MovieCatalog.from_movies(artifacts.movies, artifacts.reduced_df)
+    monkeypatch.setitem(handlers.status, "ready", True)
+    served = handlers._publish(artifacts, catalog)
+    handlers.result_cache.get_or_compute(("probe", served.version), lambda: 1)
+    user_id, item_id, rating, timestamp = _rated_cell(artifacts)
+
+    assert handlers.ingest_new_ratings([(user_id, item_id, 0.5, timestamp + 1)]) == 1
+
+    assert handlers.state is not served
+    assert handlers.state.version > served.version
+    assert len(handlers.result_cache) == 0
+    assert _cell(handlers.state.user_item_matrix, user_id, item_id) == 0.5
+    assert handlers.state.stats["original"]["ratings"] == served.stats["original"]["ratings"] + 1
+    assert _cell(served.user_item_matrix, user_id, item_id) == rating
+
+
+def _random_events(artifacts, n, seed=0):
+    matrix = artifacts.user_item_matrix
+    rng = np.random.default_rng(seed)
+    users = matrix.index[rng.integers(0, matrix.shape[0], n)]
+    items = matrix.columns[rng.integers(0, matrix.shape[1], n)]
+    return [(int(u), int(i), float(r), 2_000_000_000) for u, i, r in zip(users, items, rng.integers(1, 11, n) / 2)]
+
+
+def test_ingest_defers_cache_writes_and_replays_them_at_load(workdir):
+    artifacts = pipeline.build_or_load()
+    rows = len(artifacts.reduced_df)
+
+    updated, _, applied = ingest_ratings(artifacts, _random_events(artifacts, 10))
+    assert applied == 10
+    assert all(artifact_meta(name)["rows"] == rows for name in INGESTED_ARTIFACTS)
+
+    reloaded = pipeline.build_or_load()
+    assert reloaded.rebuilt == []
+    assert reloaded.stats == updated.stats
+    assert (reloaded.user_item_matrix.csr != updated.user_item_matrix.csr).nnz == 0
+    np.testing.assert_allclose(
+        reloaded.item_index.neighbor_scores, updated.item_index.neighbor_scores, atol=1e-6, equal_nan=True
+    )
+    np.testing.assert_array_equal(reloaded.user_index.keys, updated.user_index.keys)
+    np.testing.assert_allclose(reloaded.factor_model.user_factors, updated.factor_model.user_factors, atol=1e-6)
+
+
+def test_ingest_updates_the_dataset_stats(workdir):
+    artifacts = pipeline.build_or_load()
+    new_user = int(artifacts.df["user_id"].max()) + 1
+    new_movie = int(artifacts.df["item_id"].max()) + 1
+    events = _random_events(artifacts, 10) + [(new_user, new_movie, 5.0, 1), (new_user, new_movie, 4.5, 3_000_000_000)]
+
+    updated, _, _ = ingest_ratings(artifacts, events)
+
+    assert updated.stats == compute_dataset_stats(updated.df, updated.reduced_df, updated.user_item_matrix)
+    assert updated.stats["original"]["ratings"] == artifacts.stats["original"]["ratings"] + len(events)
+    assert updated.stats["original"]["users"] == artifacts.stats["original"]["users"] + 1
+    assert updated.stats["original"]["min_timestamp"] == 1
+    assert artifacts.stats["original"]["ratings"] == len(artifacts.df)
+
+
+def test_ingest_compacts_the_cache_when_due(workdir, monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_COMPACTION_RATIO", 0.0)
+    artifacts = pipeline.build_or_load()
+
+    updated, _, _ = ingest_ratings(artifacts, _random_events(artifacts, 10))
+
+    assert all(artifact_meta(name)["rows"] == len(updated.reduced_df) for name in INGESTED_ARTIFACTS)
+    reloaded = pipeline.build_or_load()
+    assert (reloaded.user_item_matrix.csr != updated.user_item_matrix.csr).nnz == 0
+
+
+def test_batch_workers_replay_ingested_ratings(workdir, monkeypatch):
+    from src.core import batch
+    monkeypatch.setattr(batch, "_worker_model", {})
+    monkeypatch.setattr(batch, "USER_ANN_ENABLED", True)
+    artifacts = pipeline.build_or_load()
+    updated, _, _ = ingest_ratings(artifacts, _random_events(artifacts, 10))
+
+    model = batch._load_worker_model()
+
+    assert (model["user_item_matrix"].csr != updated.user_item_matrix.csr).nnz == 0
+    np.testing.assert_array_equal(model["user_index"].keys, updated.user_index.keys)
+    np.testing.assert_allclose(model["factor_model"].user_factors, updated.factor_model.user_factors, atol=1e-6)
@@ -0,0 +1,17 @@
+import numpy as np
+from src.core.item_index import build_item_neighbor_index, update_item_neighbor_index
+
+
+def test_update_matches_rebuild(artifacts):
+    matrix = artifacts.user_item_matrix
+    rng = np.random.default_rng(0)
+    users = matrix.index[rng.integers(0, matrix.shape[0], 40)]
+    items = matrix.columns[rng.integers(0, matrix.shape[1], 40)]
+    updated_matrix = matrix.with_ratings(users, items, rng.integers(1, 11, 40) / 2)
+
+    updated = update_item_neighbor_index(artifacts.item_index, updated_matrix, items)
+    rebuilt = build_item_neighbor_index(updated_matrix)
+
+    # Lists match up to the order of equal scores
+    np.testing.assert_allclose(updated.neighbor_scores, rebuilt.neighbor_scores, atol=1e-6, equal_nan=True)
+    np.testing.assert_array_equal((updated.neighbor_idx >= 0).sum(axis=1), (rebuilt.neighbor_idx >= 0).sum(axis=1))
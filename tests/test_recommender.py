@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import pandas as pd
+from src.core.catalog import MovieCatalog
+from src.core.recommender import masked_pearson, find_similar_users, item_based_recommendation
+from src.utils import instrumentation
+
+
+@pytest.mark.filterwarnings("ignore:invalid value:RuntimeWarning")
+def test_masked_pearson_matches_pandas_corrwith(artifacts):
+    """Same correlations as the row-by-row pandas computation it replaced"""
+    matrix = artifacts.user_item_matrix
+    for user_id in matrix.index[:20]:
+        target = matrix.dense_rows([matrix.user_position(user_id)])[0]
+        rated_positions = np.flatnonzero(~np.isnan(target))
+        ratings = matrix.dense_rows(np.arange(matrix.shape[0]), rated_positions)
+        expected = pd.DataFrame(ratings).corrwith(pd.Series(target[rated_positions]), axis=1).to_numpy()
+
+        corr = masked_pearson(ratings, target[rated_positions])
+
+        np.testing.assert_array_equal(np.isnan(corr), np.isnan(expected))
+        np.testing.assert_allclose(corr, expected, rtol=1e-12, atol=1e-12, equal_nan=True)
+        # pandas leaves rounding noise around correlations that are exactly 0, which
+        # is the only place where a corr_threshold=0 filter may decide differently
+        differs = (corr >= 0) != (expected >= 0)
+        assert (corr[differs] == 0).all()
+
+
+def test_find_similar_users_excludes_target_and_sorts(artifacts):
+    matrix = artifacts.user_item_matrix
+    user_id = matrix.index[0]
+    target = matrix.dense_rows([matrix.user_position(user_id)])[0]
+
+    similar_users, _ = find_similar_users(matrix, target, 0.3, 0.1, exclude_user_id=user_id)
+
+    assert user_id not in similar_users.index
+    assert (similar_users >= 0.1).all()
+    assert similar_users.is_monotonic_decreasing
+
+
+def test_item_based_recommendation_logs_titles_only_when_debugging(artifacts, capsys):
+    catalog = MovieCatalog.from_movies(artifacts.movies, artifacts.reduced_df)
+    item_id = artifacts.user_item_matrix.columns[0]
+
+    scores = item_based_recommendation(artifacts.user_item_matrix, catalog, item_id, top_n=3)
+    assert len(scores) == 3 and capsys.readouterr().out == ""
+
+    instrumentation.configure(debug_logging=True)
+    try:
+        item_based_recommendation(artifacts.user_item_matrix, catalog, item_id, top_n=3)
+    finally:
+        instrumentation.configure(debug_logging=False)
+    out = capsys.readouterr().out
+    assert catalog.title(item_id) in out and all(catalog.title(other) in out for other in scores.index)
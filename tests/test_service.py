@@ -0,0 +1,85 @@
+import json
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.core.catalog import MovieCatalog
+from src.core.service import RecommendationService, create_server
+
+CONCURRENT_REQUESTS = 64
+
+
+@pytest.fixture(scope="module")
+def service(artifacts):
+    catalog = MovieCatalog.from_movies(artifacts.movies, artifacts.reduced_df)
+    return RecommendationService.from_artifacts(artifacts, catalog)
+
+
+@pytest.fixture(scope="module")
+def base_url(service):
+    server = create_server(service, "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _call(base_url, method, path, body=None):
+    data = None if body is None else json.dumps(body).encode()
+    request = urllib.request.Request(base_url + path, data=data, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _requests(artifacts):
+    matrix = artifacts.user_item_matrix
+    items = matrix.columns[:16].tolist()
+    users = matrix.index[:16].tolist()
+    requests = []
+    for n in range(CONCURRENT_REQUESTS):
+        kind = n % 4
+        if kind == 0:
+            genres = "&genres=Comedy,Drama" if n % 8 == 0 else ""
+            requests.append(("GET", f"/similar-items?item_id={items[n % 16]}&top_n={1 + n % 10}{genres}", None))
+        elif kind == 1:
+            requests.append(("GET", f"/user-recommendations?user_id={users[n % 16]}&top_n=5", None))
+        elif kind == 2:
+            requests.append(("GET", f"/user-recommendations?user_id={users[n % 16]}&top_n=5&method=neighborhood", None))
+        else:
+            ratings = {str(item_id): 5.0 - (n + i) % 4 for i, item_id in enumerate(items[n % 8:n % 8 + 5])}
+            requests.append(("POST", "/profile-recommendations", {"ratings": ratings, "top_n": 7}))
+    return requests
+
+
+def test_concurrent_requests_get_their_own_answers(service, base_url, artifacts):
+    requests = _requests(artifacts)
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        responses = list(pool.map(lambda request: _call(base_url, *request), requests))
+
+    for (method, path, body), (status, payload) in zip(requests, responses):
+        assert status == 200, (path, payload)
+        # Answered one at a time, without batching partners, every request gives the same result
+        assert (status, payload) == service.handle(method, path, body), path
+    batching = service.stats()["batching"]
+    assert batching["similar-items"]["requests"] >= CONCURRENT_REQUESTS // 4
+    assert all(stats["batches"] <= stats["requests"] for stats in batching.values())
+
+
+def test_similar_items_excludes_the_item_and_honors_top_n(base_url, artifacts):
+    item_id = int(artifacts.user_item_matrix.columns[0])
+    status, payload = _call(base_url, "GET", f"/similar-items?item_id={item_id}&top_n=5")
+    assert status == 200
+    assert len(payload["recommendations"]) == 5
+    assert item_id not in [entry["item_id"] for entry in payload["recommendations"]]
+
+
+def test_errors_are_json(base_url):
+    assert _call(base_url, "GET", "/similar-items?item_id=-5")[0] == 404
+    assert _call(base_url, "GET", "/user-recommendations")[0] == 400
+    assert _call(base_url, "GET", "/similar-items?item_id=1&top_n=0")[0] == 400
+    assert _call(base_url, "GET", "/nowhere")[0] == 404
@@ -0,0 +1,37 @@
+import sys
+import numpy as np
+from src.core import pipeline
+from src.core.cache_manager import artifact_exists
+from src.core.user_index import build_user_lsh_index, evaluate_user_index
+from src.core.user_item_matrix import UserItemMatrix
+
+
+def test_evaluate_user_index_reports_without_redirecting_stdout(artifacts, capsys):
+    matrix = artifacts.user_item_matrix
+    user_index = build_user_lsh_index(matrix)
+    capsys.readouterr()
+    stdout = sys.stdout
+
+    report = evaluate_user_index(matrix, user_index, matrix.index[:5], corr_threshold=0.1, verbose=False)
+
+    assert sys.stdout is stdout
+    assert capsys.readouterr().out == ""
+    assert 0.0 <= report["recall"] <= 1.0
+    assert report["exact_ms"] > 0 and report["ann_ms"] > 0
+
+
+def test_empty_matrix_gives_an_empty_index():
+    matrix = UserItemMatrix.from_ratings(np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0))
+
+    user_index = build_user_lsh_index(matrix)
+
+    assert user_index.n_users == 0 and user_index.order.shape == (user_index.tables, 0)
+
+
+def test_pipeline_skips_the_index_while_user_ann_is_off(workdir, monkeypatch):
+    monkeypatch.setattr(pipeline, "USER_ANN_ENABLED", False)
+
+    artifacts = pipeline.build_or_load()
+
+    assert artifacts.user_index is None
+    assert "user_index" not in artifacts.rebuilt and not artifact_exists("user_index")
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.core.user_item_matrix import UserItemMatrix
+
+
+@pytest.mark.parametrize("with_csc", [False, True])
+def test_with_ratings_matches_dense_update(with_csc):
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        n_users, n_items = rng.integers(1, 20, size=2)
+        dense = np.where(rng.random((n_users, n_items)) < 0.3, rng.integers(1, 11, (n_users, n_items)) / 2, np.nan)
+        matrix = UserItemMatrix.from_frame(pd.DataFrame(dense, index=np.arange(n_users) * 3, columns=np.arange(n_items) * 7))
+        if with_csc:
+            matrix.csc
+        n_events = rng.integers(1, 15)
+        users, items = rng.integers(0, n_users, n_events), rng.integers(0, n_items, n_events)
+        ratings = rng.integers(1, 11, n_events) / 2
+        expected = dense.copy()
+        expected[users, items] = ratings  # the last event of a cell wins
+
+        updated = matrix.with_ratings(matrix.index[users], matrix.columns[items], ratings)
+
+        np.testing.assert_array_equal(updated.to_frame().to_numpy(), expected)
+        assert updated.csr.has_sorted_indices
+        assert (updated._csc is not None) == with_csc
+        np.testing.assert_array_equal(updated.csc.toarray(), updated.csr.toarray())
+        assert updated.csc.has_sorted_indices
+        np.testing.assert_array_equal(matrix.to_frame().to_numpy(), dense)
+
+
+def test_with_ratings_rejects_unknown_ids():
+    matrix = UserItemMatrix.from_ratings([1, 2], [10, 20], [4.0, 3.0])
+    with pytest.raises(KeyError):
+        matrix.with_ratings([3], [10], [1.0])